@@ -17,7 +17,36 @@ class Settings(BaseSettings):
     TRACE_FUNCTIONS: bool = True
     TRACE_LOG_ARGS: bool = False
     TRACE_INCLUDE_PRIVATE: bool = False
+    ADMIN_API_KEY: str | None = None
+    # Comma list of stt,llm,embeddings,twilio (or "all") loaded in the background at startup
+    WARMUP_ON_STARTUP: str = ""
     DATABASE_URL: str
+    DATABASE_REPLICA_URL: str | None = None
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 10.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_WAIT_WARN_MS: float = 100.0
+    DB_USE_PGBOUNCER: bool = False
+    DB_STATEMENT_TIMEOUT_MS: int | None = None
+    PARTITION_MONTHS_AHEAD: int = 2
+    ARCHIVE_AFTER_DAYS: int = 90
+    ARCHIVE_TARGET: str = "local"  # local | azure
+    ARCHIVE_DIR: str = "archive"
+    VOICE_JOB_RETENTION_DAYS: int = 30
+    # inline (API BackgroundTasks) | db (needs app/scripts/run_voice_worker.py deployed; see docker-compose "queue" profile)
+    VOICE_QUEUE_BACKEND: str = "inline"
+    VOICE_WORKER_CONCURRENCY: int = 2
+    VOICE_WORKER_POLL_SECONDS: float = 1.0
+    # GET /voice/jobs/{id}/events: LISTEN needs a direct Postgres connection (not PgBouncer transaction pooling)
+    VOICE_EVENTS_LISTEN_URL: str | None = None  # defaults to DATABASE_URL
+    VOICE_EVENTS_KEEPALIVE_SECONDS: float = 15.0
+    VOICE_EVENTS_MAX_SECONDS: float = 600.0
+    VOICE_JOB_LEASE_SECONDS: int = 120
+    VOICE_JOB_MAX_ATTEMPTS: int = 3
+    VOICE_JOB_RETRY_BASE_SECONDS: float = 5.0
+    VOICE_JOB_RETRY_MAX_SECONDS: float = 300.0
     OPENAI_EMBED_MODEL: str
     OPENAI_API_KEY: str
 
@@ -25,6 +54,16 @@ class Settings(BaseSettings):
     TWILIO_AUTH_TOKEN: str | None = None
     TWILIO_WHATSAPP_NUMBER: str | None = None
     MENU_TEMPLATE_SID: str | None = None
+    # Outbound dispatcher (twilio_dispatch): per-sender token bucket, retries on 429/5xx.
+    # The rate is per process; divide Twilio's limit by the processes sending.
+    TWILIO_SEND_RATE_PER_SECOND: float = 20.0
+    TWILIO_SEND_BURST: int = 20
+    TWILIO_SEND_MAX_CONCURRENCY: int = 16
+    TWILIO_SEND_MAX_RETRIES: int = 3
+    TWILIO_SEND_RETRY_BASE_SECONDS: float = 0.5
+    TWILIO_SEND_RETRY_MAX_SECONDS: float = 8.0
+    TWILIO_SEND_TIMEOUT_SECONDS: float = 60.0
+    TWILIO_TYPING_DEDUPE_SECONDS: float = 20.0
 
     LLM_PROVIDER: str = "anthropic"
     USE_LLM: bool = True
@@ -33,14 +72,64 @@ class Settings(BaseSettings):
     ANTHROPIC_API_KEY: str | None = None
     ANTHROPIC_MODEL: str | None = None
 
+    SUMMARY_BACKGROUND: bool = True
+    SUMMARY_EVERY_N_USER_MESSAGES: int = 6
+    SUMMARY_MODEL: str | None = None
+    SUMMARY_MAX_TOKENS: int = 300
+    SUMMARY_BATCH_SIZE: int = 20
+    SUMMARY_WORKER_CONCURRENCY: int = 4
+    SUMMARY_WORKER_INTERVAL_SECONDS: float = 15.0
+    SUMMARY_CLAIM_SECONDS: int = 300
+
     DEBUG_RAG: bool = True
     RAG_TOP_K: int = 5
     RAG_SKIP_SHORT_CHARS: int = 15
     CONF_ENFORCE_CITATIONS: float = 0.55
 
+    # Voice note limits, enforced while streaming (upload and Twilio download) and from the container header
+    MAX_AUDIO_MB: int = 8
+    MAX_AUDIO_SECONDS: int = 180
+    AUDIO_STREAM_CHUNK_BYTES: int = 256 * 1024
+    WHISPER_MODEL_SIZE: str = "small"
+    WHISPER_DEVICE: str = "cpu"
+    WHISPER_COMPUTE_TYPE: str = "int8"
+    # Clips up to STT_SHORT_CLIP_SECONDS decode greedily, on WHISPER_SHORT_MODEL_SIZE if set
+    WHISPER_SHORT_MODEL_SIZE: str | None = None
+    STT_SHORT_CLIP_SECONDS: float = 8.0
+    STT_SHORT_BEAM_SIZE: int = 1
+    STT_BEAM_SIZE: int = 5
+    STT_HINT_FROM_HISTORY: bool = False
+    # Transcripts cached by sha256(audio + decode config): per-process LRU, then the stt_transcript_cache table
+    STT_CACHE_ENABLED: bool = True
+    STT_CACHE_LRU_SIZE: int = 512
+    STT_CACHE_RETENTION_DAYS: int = 30
+    # STT_POOL_PROCESSES > 0 moves transcription into that many processes, one model each
+    STT_POOL_PROCESSES: int = 0
+    STT_CPU_THREADS: int = 0  # per model; 0 = CTranslate2 default
+    STT_NUM_WORKERS: int = 1
+    STT_POOL_MAX_PENDING: int = 8
+    STT_POOL_SUBMIT_TIMEOUT_SECONDS: float = 30.0
+    # Batch short clips from concurrent jobs into one decode (in-process STT only)
+    STT_BATCHING: bool = False
+    STT_BATCH_MAX_SIZE: int = 8
+    STT_BATCH_WINDOW_MS: float = 30.0
+
+    AUDIO_CODEC_BACKEND: str = "auto"  # auto (PyAV in-process if installed) | ffmpeg (CLI subprocess)
+
+    # Where new audio/objects are written: "azure" or "local" (LOCAL_STORAGE_DIR, served from /media)
+    STORAGE_BACKEND: str = "azure"
+    LOCAL_STORAGE_DIR: str = "storage"
+    # Public origin for signed /media URLs (needed for Twilio to fetch local audio)
+    PUBLIC_BASE_URL: str = ""
+    STORAGE_SIGNING_KEY: str | None = None
     AZURE_STORAGE_CONNECTION_STRING: str | None = None
     AZURE_STORAGE_CONTAINER: str = "medi-audio"
     AZURE_BLOB_URL_TTL_SECONDS: int = 86400
+    # Blobs above the single-put size upload as parallel blocks
+    AZURE_BLOB_SINGLE_PUT_BYTES: int = 8 * 1024 * 1024
+    AZURE_BLOB_BLOCK_SIZE_BYTES: int = 4 * 1024 * 1024
+    AZURE_BLOB_MAX_CONCURRENCY: int = 4
+    AZURE_BLOB_SAS_CACHE_SIZE: int = 4096
 
     AZURE_SPEECH_KEY: str | None = None
     AZURE_SPEECH_REGION: str | None = None
@@ -51,10 +140,27 @@ class Settings(BaseSettings):
     AZURE_TTS_STYLE: str | None = None
     AZURE_TTS_RATE: str = "0%"
     AZURE_TTS_PITCH: str = "0%"
+    # lang=model.onnx pairs; the .onnx.json config must sit next to each model
+    PIPER_VOICES: str = "en=piper_models/en_US-hfc_female-medium.onnx"
+    PIPER_INTRA_OP_THREADS: int = 0  # 0 = onnxruntime default
     CHATTERBOX_DEVICE: str = "cpu"
     CHATTERBOX_EXAGGERATION: float = 0.3
     CHATTERBOX_CFG_WEIGHT: float = 0.3
     CHATTERBOX_TEMPERATURE: float = 0.3
+    CHATTERBOX_TORCH_THREADS: int = 0  # 0 = torch default (all cores)
+    CHATTERBOX_TORCH_INTEROP_THREADS: int = 0
+    CHATTERBOX_INFERENCE_MODE: bool = True
+    CHATTERBOX_TARGET_RMS_DBFS: float = 0.0  # e.g. -20 to normalize loudness; 0 = off
+    CHATTERBOX_OUTPUT_SAMPLE_RATE: int = 0  # 0 = keep the model's rate
+    TTS_CACHE_ENABLED: bool = True
+    TTS_CACHE_LRU_SIZE: int = 256
+    TTS_CATALOG_ENABLED: bool = True
+    # Long replies render sentence by sentence; the first segment is delivered as soon as it is ready
+    TTS_SEGMENTED: bool = False
+    TTS_SEGMENT_THRESHOLD_CHARS: int = 240
+    TTS_SEGMENT_MIN_CHARS: int = 40
+    TTS_SEGMENT_MAX_CHARS: int = 300
+    TTS_SEGMENT_CONCURRENCY: int = 4
 
 
 settings = Settings()
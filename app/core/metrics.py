@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import math
+import threading
+from collections import deque
+from typing import Any
+
+
+# In-process metrics: counters plus timing series with a bounded sample window
+# for percentiles. Per worker process; scrape each worker or aggregate in logs.
+
+_SAMPLE_WINDOW = 2048
+
+_lock = threading.Lock()
+_counters: dict[str, float] = {}
+_timings: dict[str, "_Series"] = {}
+
+
+class _Series:
+    __slots__ = ("count", "total", "max", "samples")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples: deque[float] = deque(maxlen=_SAMPLE_WINDOW)
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        self.samples.append(value)
+
+    def summary(self) -> dict[str, Any]:
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "avg": round(self.total / self.count, 3) if self.count else 0.0,
+            "max": round(self.max, 3),
+            "p50": round(percentile(ordered, 50), 3),
+            "p95": round(percentile(ordered, 95), 3),
+            "p99": round(percentile(ordered, 99), 3),
+        }
+
+
+def percentile(ordered: list[float], pct: float) -> float:
+    """Nearest-rank percentile over an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return float(ordered[rank])
+
+
+def incr(name: str, value: float = 1.0) -> None:
+    with _lock:
+        _counters[name] = _counters.get(name, 0.0) + value
+
+
+def observe(name: str, value: float) -> None:
+    """Record one timing/size sample (milliseconds for timings by convention)."""
+    with _lock:
+        series = _timings.get(name)
+        if series is None:
+            series = _timings[name] = _Series()
+        series.add(float(value))
+
+
+def snapshot() -> dict[str, Any]:
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "timings": {name: series.summary() for name, series in _timings.items()},
+        }
@@ -0,0 +1,84 @@
+import json
+import logging
+
+from app.core import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class BodySizeLimitMiddleware:
+    """
+    Reject request bodies over a per-path limit while they are still arriving.
+
+    A Content-Length above the limit is refused before anything is read;
+    chunked or lying bodies are cut off once the running byte count crosses
+    it. Either way the client gets 413 and the rest of the body is never
+    buffered (multipart parsing would otherwise spool it all first).
+
+    The cut-off sends the 413 from here and then tells the app the client
+    disconnected; raising out of receive would be caught by the form parser
+    and answered with its own 400. Anything the app sends afterwards is dropped.
+    """
+
+    def __init__(self, app, limits: dict[str, int]) -> None:
+        self.app = app
+        self.limits = limits
+
+    def _limit_for(self, path: str) -> int | None:
+        for prefix, limit in self.limits.items():
+            if path.startswith(prefix):
+                return limit
+        return None
+
+    async def _reject(self, send) -> None:
+        body = json.dumps({"detail": "request body too large"}).encode("utf-8")
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 413,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        limit = self._limit_for(scope.get("path", "")) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope.get("headers", []):
+            if name == b"content-length" and value.isdigit() and int(value) > limit:
+                metrics.incr("http.body_too_large")
+                await self._reject(send)
+                return
+
+        received = 0
+        started = False
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    rejected = True
+                    metrics.incr("http.body_too_large")
+                    logger.warning("request body over limit path=%s limit=%s", scope.get("path"), limit)
+                    if not started:
+                        await self._reject(send)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def tracking_send(message):
+            nonlocal started
+            if rejected:
+                return
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        await self.app(scope, limited_receive, tracking_send)
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+
+from app.core import metrics
+
+
+# Per-job stage timings. The worker opens a recorder around one job; code
+# deeper in the call (STT decode, RAG, TTS upload) adds to it with stage()
+# without the recorder being passed down, and does nothing when no job is
+# being recorded. The recorder lives in a ContextVar, so work handed to
+# other threads or processes (STT pool, segment executors) is not captured
+# there; the caller's own top-level stage still covers its wall time.
+#
+# Top-level stage names ("download", "stt", ...) do not overlap. Dotted
+# names ("stt.whisper", "tts.upload") are parts of their prefix's stage and
+# may overlap each other (tts.render includes tts.transcode).
+
+_current: ContextVar["StageTimer | None"] = ContextVar("medi_stage_timer", default=None)
+
+
+class StageTimer:
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.stages: dict[str, float] = {}
+        self.values: dict[str, Any] = {}
+
+    def add(self, name: str, elapsed_ms: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + float(elapsed_ms)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - started) * 1000.0)
+
+    def set(self, name: str, value: Any) -> None:
+        self.values[name] = value
+
+    def incr(self, name: str, value: float) -> None:
+        self.values[name] = self.values.get(name, 0) + value
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000.0
+
+    def as_dict(self) -> dict[str, Any]:
+        """JSON-ready: {"stages": {name: ms}, "total_ms": ..., **values}."""
+        out: dict[str, Any] = {
+            "stages": {name: round(ms, 1) for name, ms in self.stages.items()},
+            "total_ms": round(self.elapsed_ms(), 1),
+        }
+        for name, value in self.values.items():
+            out[name] = round(value, 3) if isinstance(value, float) else value
+        return out
+
+    def observe(self, prefix: str) -> None:
+        """Feed every stage into the in-process metrics as <prefix>.<stage>_ms."""
+        for name, ms in self.stages.items():
+            metrics.observe(f"{prefix}.{name}_ms", ms)
+        metrics.observe(f"{prefix}.total_ms", self.elapsed_ms())
+
+
+@contextmanager
+def recording() -> Iterator[StageTimer]:
+    """Make a fresh StageTimer current for the duration of the block."""
+    timer = StageTimer()
+    token = _current.set(timer)
+    try:
+        yield timer
+    finally:
+        _current.reset(token)
+
+
+def current() -> StageTimer | None:
+    return _current.get()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time the block into the current recorder, if any."""
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    with timer.stage(name):
+        yield
+
+
+def add_stage(name: str, elapsed_ms: float) -> None:
+    timer = _current.get()
+    if timer is not None:
+        timer.add(name, elapsed_ms)
+
+
+def set_value(name: str, value: Any) -> None:
+    timer = _current.get()
+    if timer is not None:
+        timer.set(name, value)
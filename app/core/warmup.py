@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+
+# Heavy resources are created lazily by their services; these hooks force
+# them up front (startup, readiness probe or /admin/warmup) instead of on the
+# first user request.
+
+
+def _warm_stt() -> None:
+    from app.core.config import settings
+
+    if settings.STT_POOL_PROCESSES > 0:
+        from app.services.stt_pool import get_stt_pool
+
+        get_stt_pool().warm_up()
+        return
+
+    from app.services.stt_service import get_whisper_model
+
+    get_whisper_model()
+    if settings.WHISPER_SHORT_MODEL_SIZE:
+        get_whisper_model(size=settings.WHISPER_SHORT_MODEL_SIZE)
+
+
+def _warm_llm() -> None:
+    from app.services.llm.anthropic_client import get_anthropic_client
+
+    get_anthropic_client()
+
+
+def _warm_embeddings() -> None:
+    from app.services.embeddings_service import get_openai_client
+
+    get_openai_client()
+
+
+def _warm_tts() -> None:
+    from app.services.tts_piper import PiperTTS
+
+    # Piper: load each voice's onnxruntime session. Chatterbox: load the model
+    # and run one dummy generation. Nothing to do for Azure.
+    tts = PiperTTS()
+    for language in tts.piper_models:
+        if tts._backend_for(language) == "piper":
+            tts._get_piper_voice(tts.piper_models[language])
+    if tts._backend_for(None) == "chatterbox":
+        tts.warm_up_chatterbox()
+
+
+def _warm_twilio() -> None:
+    from app.services.twilio_dispatch import get_dispatcher
+
+    get_dispatcher()
+
+
+WARMUP_HOOKS: dict[str, Callable[[], None]] = {
+    "stt": _warm_stt,
+    "llm": _warm_llm,
+    "embeddings": _warm_embeddings,
+    "tts": _warm_tts,
+    "twilio": _warm_twilio,
+}
+
+
+def parse_components(value: str | None) -> list[str]:
+    names = [v.strip().lower() for v in (value or "").split(",") if v.strip()]
+    if "all" in names:
+        return list(WARMUP_HOOKS)
+    return [n for n in names if n in WARMUP_HOOKS]
+
+
+# Components scheduled by warm_up_in_background that have not finished yet,
+# and the latest result per component; read by the /ready probe.
+_pending: set[str] = set()
+_last_results: dict[str, dict] = {}
+
+
+def readiness() -> dict:
+    pending = sorted(_pending)
+    return {"ready": not pending, "pending": pending, "components": dict(_last_results)}
+
+
+def warm_up(components: Iterable[str]) -> dict[str, dict]:
+    """Run the named warm-up hooks; returns per-component elapsed ms or error."""
+    results: dict[str, dict] = {}
+    for name in components:
+        hook = WARMUP_HOOKS.get(name)
+        if hook is None:
+            results[name] = {"ok": False, "error": "unknown component"}
+            continue
+        started = time.perf_counter()
+        try:
+            hook()
+            results[name] = {"ok": True, "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 1)}
+        except Exception as exc:
+            logger.exception("warm-up failed component=%s", name)
+            results[name] = {"ok": False, "error": str(exc)}
+        _last_results[name] = results[name]
+        _pending.discard(name)
+    logger.info("warm-up done %s", results)
+    return results
+
+
+def warm_up_in_background(components: Iterable[str]) -> threading.Thread | None:
+    names = list(components)
+    if not names:
+        return None
+    _pending.update(names)
+    thread = threading.Thread(target=warm_up, args=(names,), name="medi-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -1,32 +0,0 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from app.config import settings
-from app.models import Base
-
-# Create engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20
-)
-
-# Create SessionLocal
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-# Dependency for FastAPI
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# Initialize database (create tables)
-def init_db():
-    """Create all database tables"""
-    Base.metadata.create_all(bind=engine)
-    print("✅ Database tables created successfully!")
-
-if __name__ == "__main__":
-    init_db()
\ No newline at end of file
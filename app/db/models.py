@@ -1,6 +1,7 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import String, DateTime, ForeignKey, Text, Column
+from sqlalchemy import String, DateTime, ForeignKey, Index, Integer, Text, Column
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 from app.db.base import Base
@@ -24,10 +25,18 @@ class Conversation(Base):
 
     id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id: Mapped[str] = mapped_column(String, ForeignKey("users.id"), index=True)
-    status: Mapped[str] = mapped_column(String(20), default="active")  # active/closed
+    status: Mapped[str] = mapped_column(String(20), default="active")  # active/closed/archived
     created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow)
     summary: Mapped[str | None] = mapped_column(Text, default="", nullable=True)
     summary_updated_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    # Maintained by chat_repo.save_message in the same statement as the message insert.
+    message_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    user_msgs_since_summary: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    # Lease held by the summary worker that picked the conversation up.
+    summary_claimed_until: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    # Set when the archiver moves a closed conversation's messages to cold storage.
+    archived_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    archive_path: Mapped[str | None] = mapped_column(Text, nullable=True)
 
     user: Mapped["User"] = relationship(back_populates="conversations")
     messages: Mapped[list["Message"]] = relationship(back_populates="conversation")
@@ -35,6 +44,10 @@ class Conversation(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Keyset pagination and "latest message" lookups walk this index.
+        Index("ix_messages_conversation_created_id", "conversation_id", "created_at", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     conversation_id: Mapped[str] = mapped_column(String, ForeignKey("conversations.id"), index=True)
@@ -55,14 +68,46 @@ class VoiceJob(Base):
     twilio_media_url = Column(Text, nullable=True)
     audio_blob_path = Column(String, nullable=True)
     twilio_message_sid = Column(String, nullable=True)  # stores inbound MessageSid
+    preferred_language = Column(String, nullable=True)
 
-    status = Column(String, nullable=False, default="queued")  # queued|processing|done|failed
+    status = Column(String, nullable=False, default="queued")  # queued|processing|done|failed|dead
     transcript = Column(Text, nullable=True)
+    transcript_language = Column(String, nullable=True)
     reply_text = Column(Text, nullable=True)
+    reply_language = Column(String, nullable=True)
     reply_audio_url = Column(Text, nullable=True)
     reply_audio_mime = Column(String, nullable=True)
     reply_audio_path = Column(String, nullable=True)
+    # Storage paths of reply segments in play order, appended as each is ready (segmented TTS).
+    reply_audio_segments = Column(JSONB, nullable=True)
     error = Column(Text, nullable=True)
+    # Set before a WhatsApp reply is sent and kept unless Twilio definitely rejected it,
+    # so a retried attempt never sends the reply twice.
+    delivered_at = Column(DateTime(timezone=True), nullable=True)
+    # Per-stage ms plus audio_s/rtf/bytes for the last attempt (see app.core.stage_timer).
+    timings = Column(JSONB, nullable=True)
+
+    # Queue bookkeeping: a worker owns a processing job until lease_expires_at,
+    # extended by heartbeats; failed attempts are retried from available_at.
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    available_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    locked_by = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+
+class TranscriptCache(Base):
+    """STT results keyed by sha256 of the audio bytes plus the decode config (see stt_cache)."""
+
+    __tablename__ = "stt_transcript_cache"
+
+    key = Column(String(64), primary_key=True)
+    transcript = Column(Text, nullable=False)
+    language = Column(String, nullable=True)
+    # How long the original decode + transcription took; each hit saves about this much.
+    elapsed_ms = Column(Integer, nullable=False, default=0)
+    hits = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_hit_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,199 @@
+import logging
+import re
+from datetime import date, datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+# Tables range-partitioned by month on created_at, with the indexes each needs
+# once partitioned (the PK must include the partition key).
+PARTITIONED_TABLES: dict[str, list[str]] = {
+    "messages": [
+        "CREATE INDEX IF NOT EXISTS ix_messages_conversation_id ON messages (conversation_id)",
+        "CREATE INDEX IF NOT EXISTS ix_messages_conversation_created_id "
+        "ON messages (conversation_id, created_at, id)",
+        "ALTER TABLE messages ADD CONSTRAINT messages_conversation_id_fkey "
+        "FOREIGN KEY (conversation_id) REFERENCES conversations (id)",
+    ],
+    "voice_jobs": [
+        "CREATE INDEX IF NOT EXISTS ix_voice_jobs_status_created ON voice_jobs (status, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_voice_jobs_claimable ON voice_jobs (available_at) WHERE status = 'queued'",
+        "CREATE INDEX IF NOT EXISTS ix_voice_jobs_lease ON voice_jobs (lease_expires_at) WHERE status = 'processing'",
+    ],
+}
+
+_PARTITION_NAME = re.compile(r"_p(\d{4})(\d{2})$")
+
+
+def _month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def _add_months(value: date, months: int) -> date:
+    index = value.year * 12 + (value.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month.year:04d}{month.month:02d}"
+
+
+def is_partitioned(conn: Connection, table: str) -> bool:
+    row = conn.execute(
+        text(
+            """
+            SELECT 1
+            FROM pg_partitioned_table p
+            JOIN pg_class c ON c.oid = p.partrelid
+            WHERE c.relname = :t AND c.relnamespace = 'public'::regnamespace
+            """
+        ),
+        {"t": table},
+    ).fetchone()
+    return row is not None
+
+
+def list_partitions(conn: Connection, table: str) -> list[tuple[str, date]]:
+    """Monthly partitions of `table` as (name, month_start), oldest first. Skips the default partition."""
+    rows = conn.execute(
+        text(
+            """
+            SELECT child.relname
+            FROM pg_inherits i
+            JOIN pg_class parent ON parent.oid = i.inhparent
+            JOIN pg_class child ON child.oid = i.inhrelid
+            WHERE parent.relname = :t
+            """
+        ),
+        {"t": table},
+    ).fetchall()
+    out: list[tuple[str, date]] = []
+    for (name,) in rows:
+        m = _PARTITION_NAME.search(name)
+        if m:
+            out.append((name, date(int(m.group(1)), int(m.group(2)), 1)))
+    return sorted(out, key=lambda item: item[1])
+
+
+def _relation_exists(conn: Connection, name: str) -> bool:
+    return conn.execute(text("SELECT to_regclass(:n)"), {"n": f'public."{name}"'}).scalar() is not None
+
+
+def create_month_partition(conn: Connection, table: str, month: date) -> None:
+    """
+    Create the partition for `month`. Rows for that month that already landed
+    in the default partition (partitions were not topped up in time) are moved
+    into it first; otherwise Postgres refuses the new partition because the
+    default would then violate its constraint.
+    """
+    start = _month_start(month)
+    end = _add_months(start, 1)
+    name = partition_name(table, start)
+    bounds = f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    if _relation_exists(conn, name):
+        return
+
+    default = f"{table}_default"
+    in_range = f"created_at >= '{start.isoformat()}' AND created_at < '{end.isoformat()}'"
+    if _relation_exists(conn, default) and conn.execute(
+        text(f'SELECT 1 FROM "{default}" WHERE {in_range} LIMIT 1')
+    ).fetchone():
+        conn.execute(text(f'CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS)'))
+        moved = conn.execute(
+            text(
+                f'WITH moved AS (DELETE FROM "{default}" WHERE {in_range} RETURNING *) '
+                f'INSERT INTO "{name}" SELECT * FROM moved'
+            )
+        ).rowcount
+        conn.execute(text(f'ALTER TABLE "{table}" ATTACH PARTITION "{name}" {bounds}'))
+        logger.warning("moved rows out of default partition table=%s partition=%s rows=%s", table, name, moved)
+        return
+
+    conn.execute(text(f'CREATE TABLE "{name}" PARTITION OF "{table}" {bounds}'))
+
+
+def ensure_month_partitions(conn: Connection, table: str, months_ahead: int = 2) -> None:
+    """Create partitions for the current month and `months_ahead` after it, plus a default catch-all."""
+    current = _month_start(datetime.now(timezone.utc).date())
+    for offset in range(0, months_ahead + 1):
+        create_month_partition(conn, table, _add_months(current, offset))
+    conn.execute(text(f'CREATE TABLE IF NOT EXISTS "{table}_default" PARTITION OF "{table}" DEFAULT'))
+
+
+def ensure_partitions(engine: Engine, months_ahead: int = 2) -> None:
+    """
+    Startup/cron hook: top up future partitions for every table already
+    partitioned. Each table is its own transaction and failures are logged,
+    not raised, so a partitioning problem never keeps the app from booting
+    (rows keep landing in the default partition until it is fixed).
+    """
+    for table in PARTITIONED_TABLES:
+        try:
+            with engine.begin() as conn:
+                if is_partitioned(conn, table):
+                    ensure_month_partitions(conn, table, months_ahead=months_ahead)
+        except Exception:
+            logger.exception("partition top-up failed table=%s", table)
+
+
+def convert_to_partitioned(engine: Engine, table: str, months_ahead: int = 2, lock_timeout_s: int = 10) -> bool:
+    """
+    One-off migration of a plain table to monthly range partitions on created_at.
+    Copies rows in a single transaction under an exclusive lock; run it in a
+    maintenance window. Returns False if the table is already partitioned.
+    """
+    if table not in PARTITIONED_TABLES:
+        raise ValueError(f"{table} is not configured for partitioning")
+
+    legacy = f"{table}_legacy"
+    with engine.begin() as conn:
+        if is_partitioned(conn, table):
+            return False
+
+        # Fail fast rather than queue behind live traffic and block everything after us.
+        conn.execute(text(f"SET LOCAL lock_timeout = '{int(lock_timeout_s)}s'"))
+        conn.execute(text(f'LOCK TABLE "{table}" IN ACCESS EXCLUSIVE MODE'))
+        oldest = conn.execute(text(f'SELECT MIN(created_at) FROM "{table}"')).scalar()
+
+        conn.execute(text(f'ALTER TABLE "{table}" RENAME TO "{legacy}"'))
+        conn.execute(text(f'ALTER TABLE "{legacy}" DROP CONSTRAINT IF EXISTS "{table}_pkey"'))
+        conn.execute(
+            text(f'CREATE TABLE "{table}" (LIKE "{legacy}" INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)')
+        )
+        conn.execute(text(f'ALTER TABLE "{table}" ADD PRIMARY KEY (id, created_at)'))
+
+        current = _month_start(datetime.now(timezone.utc).date())
+        month = _month_start(oldest.date()) if oldest else current
+        while month <= current:
+            create_month_partition(conn, table, month)
+            month = _add_months(month, 1)
+        ensure_month_partitions(conn, table, months_ahead=months_ahead)
+
+        copied = conn.execute(text(f'INSERT INTO "{table}" SELECT * FROM "{legacy}"')).rowcount
+        conn.execute(text(f'DROP TABLE "{legacy}"'))
+        for stmt in PARTITIONED_TABLES[table]:
+            conn.execute(text(stmt))
+
+    logger.info("partitioned table=%s rows=%s oldest=%s", table, copied, oldest)
+    return True
+
+
+def drop_partitions_before(conn: Connection, table: str, cutoff: date, *, only_empty: bool = True) -> list[str]:
+    """
+    Drop monthly partitions that end on or before `cutoff`. With only_empty,
+    partitions that still hold rows are kept (messages of open conversations).
+    """
+    dropped: list[str] = []
+    for name, month in list_partitions(conn, table):
+        if _add_months(month, 1) > cutoff:
+            continue
+        if only_empty and conn.execute(text(f'SELECT 1 FROM "{name}" LIMIT 1')).fetchone():
+            continue
+        conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+        conn.execute(text(f'DROP TABLE "{name}"'))
+        dropped.append(name)
+    if dropped:
+        logger.info("dropped partitions table=%s partitions=%s", table, dropped)
+    return dropped
@@ -1,16 +1,93 @@
 from sqlalchemy import text
 from sqlalchemy.engine import Engine
 
+from app.core.config import settings
+
 
 def ensure_runtime_schema(engine: Engine) -> None:
     """
     Apply additive schema patches required by newer code paths.
     Safe to run repeatedly.
     """
+    summary_every_n = max(1, int(settings.SUMMARY_EVERY_N_USER_MESSAGES))
+    summary_due_index = f"ix_conversations_summary_due_{summary_every_n}"
     statements = [
         "ALTER TABLE voice_jobs ADD COLUMN IF NOT EXISTS reply_audio_url TEXT",
         "ALTER TABLE voice_jobs ADD COLUMN IF NOT EXISTS reply_audio_mime VARCHAR",
         "ALTER TABLE voice_jobs ADD COLUMN IF NOT EXISTS reply_audio_path VARCHAR",
+        "ALTER TABLE voice_jobs ADD COLUMN IF NOT EXISTS reply_audio_segments JSONB",
+        "ALTER TABLE voice_jobs ADD COLUMN IF NOT EXISTS preferred_language VARCHAR",
+        "ALTER TABLE voice_jobs ADD COLUMN IF NOT EXISTS transcript_language VARCHAR",
+        "ALTER TABLE voice_jobs ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE voice_jobs ADD COLUMN IF NOT EXISTS available_at TIMESTAMPTZ NOT NULL DEFAULT now()",
+        "ALTER TABLE voice_jobs ADD COLUMN IF NOT EXISTS locked_by VARCHAR",
+        "ALTER TABLE voice_jobs ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMPTZ",
+        "ALTER TABLE voice_jobs ADD COLUMN IF NOT EXISTS timings JSONB",
+        "ALTER TABLE voice_jobs ADD COLUMN IF NOT EXISTS reply_language VARCHAR",
+        "ALTER TABLE voice_jobs ADD COLUMN IF NOT EXISTS delivered_at TIMESTAMPTZ",
+        "ALTER TABLE conversations ADD COLUMN IF NOT EXISTS archived_at TIMESTAMP",
+        "ALTER TABLE conversations ADD COLUMN IF NOT EXISTS archive_path TEXT",
+        "ALTER TABLE conversations ADD COLUMN IF NOT EXISTS summary_claimed_until TIMESTAMP",
+        # Conversation counters: backfilled once, when the columns are first added.
+        """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = 'conversations' AND column_name = 'message_count'
+            ) THEN
+                ALTER TABLE conversations ADD COLUMN message_count INTEGER NOT NULL DEFAULT 0;
+                UPDATE conversations c
+                SET message_count = m.n
+                FROM (SELECT conversation_id, COUNT(*) AS n FROM messages GROUP BY conversation_id) m
+                WHERE m.conversation_id = c.id;
+            END IF;
+        END $$
+        """,
+        """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = 'conversations' AND column_name = 'user_msgs_since_summary'
+            ) THEN
+                ALTER TABLE conversations ADD COLUMN user_msgs_since_summary INTEGER NOT NULL DEFAULT 0;
+                UPDATE conversations c
+                SET user_msgs_since_summary = (
+                    SELECT COUNT(*) FROM messages m
+                    WHERE m.conversation_id = c.id
+                      AND m.role = 'user'
+                      AND (c.summary_updated_at IS NULL OR m.created_at > c.summary_updated_at)
+                );
+            END IF;
+        END $$
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_messages_conversation_created_id "
+        "ON messages (conversation_id, created_at, id)",
+        # Small partial index the summary worker polls for due conversations. The
+        # predicate follows SUMMARY_EVERY_N_USER_MESSAGES and the name carries it,
+        # so changing the setting builds a new index and drops the old ones.
+        f"CREATE INDEX IF NOT EXISTS {summary_due_index} "
+        f"ON conversations (user_msgs_since_summary) WHERE user_msgs_since_summary >= {summary_every_n}",
+        f"""
+        DO $$
+        DECLARE idx record;
+        BEGIN
+            FOR idx IN
+                SELECT indexname FROM pg_indexes
+                WHERE tablename = 'conversations'
+                  AND indexname LIKE 'ix\\_conversations\\_summary\\_due%'
+                  AND indexname <> '{summary_due_index}'
+            LOOP
+                EXECUTE format('DROP INDEX IF EXISTS %I', idx.indexname);
+            END LOOP;
+        END $$
+        """,
+        # Voice queue: claim scans only queued rows; stale recovery only processing ones.
+        "CREATE INDEX IF NOT EXISTS ix_voice_jobs_claimable ON voice_jobs (available_at) WHERE status = 'queued'",
+        "CREATE INDEX IF NOT EXISTS ix_voice_jobs_lease ON voice_jobs (lease_expires_at) WHERE status = 'processing'",
+        # Stage timing report scans a created_at window of timed jobs.
+        "CREATE INDEX IF NOT EXISTS ix_voice_jobs_timed ON voice_jobs (created_at) WHERE timings IS NOT NULL",
     ]
 
     with engine.begin() as conn:
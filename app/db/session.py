@@ -1,10 +1,92 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import logging
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
+
+from app.core import metrics
 from app.core.config import settings
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+logger = logging.getLogger(__name__)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    metric_prefix = "db.pool"
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metric_prefix = self.metric_prefix
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            metrics.incr(f"{self.metric_prefix}.checkout_timeouts")
+            raise
+        except Exception:
+            # Overflow connects happen inside _do_get, so a refused or failed
+            # connect lands here too; keep it apart from pool exhaustion.
+            metrics.incr(f"{self.metric_prefix}.checkout_errors")
+            raise
+        finally:
+            wait_ms = (time.perf_counter() - started) * 1000.0
+            metrics.observe(f"{self.metric_prefix}.checkout_wait_ms", wait_ms)
+            if wait_ms >= settings.DB_POOL_WAIT_WARN_MS:
+                logger.warning(
+                    "db pool checkout waited %.1fms (%s) %s",
+                    wait_ms,
+                    self.metric_prefix,
+                    self.status(),
+                )
+
+
+def _engine_kwargs() -> dict:
+    connect_args: dict = {"application_name": settings.APP_NAME}
+    if settings.DB_USE_PGBOUNCER:
+        # PgBouncer (transaction pooling) owns the pool and rejects startup
+        # "options", so keep no idle connections here and send none.
+        return {"poolclass": NullPool, "pool_pre_ping": False, "connect_args": connect_args}
+
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        connect_args["options"] = f"-c statement_timeout={int(settings.DB_STATEMENT_TIMEOUT_MS)}"
+
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "connect_args": connect_args,
+    }
+
+
+def _make_engine(url: str, metric_prefix: str) -> Engine:
+    if not url.startswith("postgresql"):
+        return create_engine(url, pool_pre_ping=True)
+    eng = create_engine(url, **_engine_kwargs())
+    if isinstance(eng.pool, TimedQueuePool):
+        eng.pool.metric_prefix = metric_prefix
+    return eng
+
+
+engine = _make_engine(settings.DATABASE_URL, "db.pool")
+
+# Optional read replica for read-only paths (history, voice job status, retrieval).
+replica_engine = (
+    _make_engine(settings.DATABASE_REPLICA_URL, "db.replica_pool") if settings.DATABASE_REPLICA_URL else None
+)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine or engine)
+
 
 def get_db():
     db = SessionLocal()
@@ -12,3 +94,35 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_read_db():
+    """Dependency for read-only endpoints; uses the replica when configured."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@contextmanager
+def read_session(fallback: Session | None = None):
+    """
+    Session for a read-only step inside a request. Without a replica the
+    caller's own session is reused instead of checking out a second connection.
+    """
+    if replica_engine is None and fallback is not None:
+        yield fallback
+        return
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def pool_status() -> dict:
+    out = {"primary": engine.pool.status()}
+    if replica_engine is not None:
+        out["replica"] = replica_engine.pool.status()
+    return out
@@ -1,28 +1,52 @@
 # app/main.py
 
+import hashlib
+import hmac
+import logging
+from datetime import datetime
+
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import BackgroundTasks, Depends, FastAPI, File, Form, HTTPException, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import BackgroundTasks, Depends, FastAPI, File, Form, Header, HTTPException, Query, Request, Response, UploadFile
 from sqlalchemy.orm import Session
 
+from app.core import metrics
 from app.core.config import settings
 from app.core.observability import configure_logging, trace_call
+from app.core.request_limits import BodySizeLimitMiddleware
+from app.core.warmup import parse_components, readiness, warm_up, warm_up_in_background
 from app.db.base import Base
+from app.db.partitioning import ensure_partitions
 from app.db.schema_patch import ensure_runtime_schema
-from app.db.session import engine, get_db
+from app.db.session import SessionLocal, engine, get_db, get_read_db, pool_status
 
 # registers models
 from app.db import models  # noqa: F401
 
 from app.routes.schemas import ChatHistoryResponse, ChatRequest, ChatResponse
+from app.routes.media import router as media_router
 from app.routes.twilio_webhook import router as twilio_router
-from app.services.azure_blob import upload_audio_bytes
+from app.services.audio_sniff import SNIFF_BYTES, AudioRejected, check_audio_head, max_audio_bytes
+from app.services.azure_blob import close_async_blob_client
+from app.services.storage import upload_stream
 from app.services.chat_service import handle_incoming_message
-from app.services.history_repo import get_chat_history, get_latest_active_conversation_id
-from app.services.voice_jobs import create_voice_job, get_voice_job_public_dict
+from app.services.export_service import ENTITIES, ExportFilters, ExportStats, iter_gzip, iter_ndjson
+from app.services.stt_cache import cache_stats as stt_cache_stats
+from app.services.summary_worker import start_summary_worker, stop_summary_worker
+from app.services.history_repo import (
+    get_chat_history,
+    get_chat_history_page,
+    get_history_head,
+    get_latest_active_conversation_id,
+)
+from app.services.twilio_dispatch import close_dispatcher as close_twilio_dispatcher
+from app.services.voice_job_events import stream_job_events
+from app.services.voice_jobs import create_voice_job, get_voice_job_public_dict, queue_depth, stage_timing_report
 from app.services.voice_worker import process_voice_job
 
 
 configure_logging(settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title=settings.APP_NAME)
 
@@ -34,7 +58,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Multipart framing on top of the audio itself stays well under 64 KB.
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    limits={"/voice/process": settings.MAX_AUDIO_MB * 1024 * 1024 + 64 * 1024},
+)
+
 app.include_router(twilio_router)
+app.include_router(media_router)
 
 
 @app.on_event("startup")
@@ -42,6 +73,21 @@ app.include_router(twilio_router)
 def on_startup():
     Base.metadata.create_all(bind=engine)
     ensure_runtime_schema(engine)
+    ensure_partitions(engine, months_ahead=settings.PARTITION_MONTHS_AHEAD)
+    start_summary_worker()
+    warm_up_in_background(parse_components(settings.WARMUP_ON_STARTUP))
+
+
+@app.on_event("shutdown")
+@trace_call
+def on_shutdown():
+    stop_summary_worker()
+    close_twilio_dispatcher()
+
+
+@app.on_event("shutdown")
+async def close_blob_clients():
+    await close_async_blob_client()
 
 
 @app.get("/health")
@@ -50,6 +96,13 @@ def health():
     return {"ok": True, "app": settings.APP_NAME, "env": settings.ENV}
 
 
+@app.get("/ready")
+def ready():
+    """Readiness probe: 503 until the startup warm-up (WARMUP_ON_STARTUP) has finished."""
+    status = readiness()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+
 @app.post("/chat", response_model=ChatResponse)
 @trace_call
 def chat(payload: ChatRequest, db: Session = Depends(get_db)):
@@ -63,27 +116,130 @@ def chat(payload: ChatRequest, db: Session = Depends(get_db)):
     return result
 
 
-@app.get("/conversations/{conversation_id}/messages", response_model=ChatHistoryResponse)
-@trace_call
-def read_chat_history(conversation_id: str, limit: int = 50, offset: int = 0, db: Session = Depends(get_db)):
-    rows = get_chat_history(db, conversation_id=conversation_id, limit=limit, offset=offset)
+def _history_etag(conversation_id: str, latest_message_id: str | None, *params) -> str:
+    raw = "|".join(str(p) for p in (conversation_id, latest_message_id, *params))
+    return 'W/"' + hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20] + '"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {tag.strip() for tag in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def _history_response(
+    request: Request,
+    response: Response,
+    db: Session,
+    conversation_id: str,
+    *,
+    limit: int,
+    before: str | None,
+    after: str | None,
+    newest_first: bool,
+):
+    total, latest_id = get_history_head(db, conversation_id)
+    etag = _history_etag(conversation_id, latest_id, limit, before, after, newest_first)
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    try:
+        page = get_chat_history_page(
+            db,
+            conversation_id=conversation_id,
+            limit=limit,
+            before=before,
+            after=after,
+            newest_first=newest_first,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    response.headers["ETag"] = etag
     return {
         "conversation_id": conversation_id,
-        "messages": [{"role": m.role, "content": m.content, "created_at": m.created_at} for m in rows],
+        "messages": [{"role": r.role, "content": r.content, "created_at": r.created_at} for r in page.rows],
+        "total": total,
+        "has_more": page.has_more,
+        "prev_cursor": page.prev_cursor,
+        "next_cursor": page.next_cursor,
     }
 
 
+@app.get("/conversations/{conversation_id}/messages", response_model=ChatHistoryResponse)
+@trace_call
+def read_chat_history(
+    conversation_id: str,
+    request: Request,
+    response: Response,
+    limit: int = 50,
+    before: str | None = None,
+    after: str | None = None,
+    offset: int = 0,
+    db: Session = Depends(get_read_db),
+):
+    if offset and not (before or after):
+        # Deprecated OFFSET paging, kept for older clients.
+        rows = get_chat_history(db, conversation_id=conversation_id, limit=limit, offset=offset)
+        return {
+            "conversation_id": conversation_id,
+            "messages": [{"role": m.role, "content": m.content, "created_at": m.created_at} for m in rows],
+            "total": get_history_head(db, conversation_id)[0],
+        }
+
+    return _history_response(
+        request,
+        response,
+        db,
+        conversation_id,
+        limit=limit,
+        before=before,
+        after=after,
+        newest_first=False,
+    )
+
+
 @app.get("/users/{user_uuid}/latest-messages", response_model=ChatHistoryResponse)
 @trace_call
-def read_latest_chat(user_uuid: str, limit: int = 50, db: Session = Depends(get_db)):
+def read_latest_chat(
+    user_uuid: str,
+    request: Request,
+    response: Response,
+    limit: int = 50,
+    before: str | None = None,
+    after: str | None = None,
+    db: Session = Depends(get_read_db),
+):
     convo_id = get_latest_active_conversation_id(db, user_id=user_uuid)
     if not convo_id:
         raise HTTPException(status_code=404, detail="No active conversation found")
-    rows = get_chat_history(db, conversation_id=convo_id, limit=limit, offset=0)
-    return {
-        "conversation_id": convo_id,
-        "messages": [{"role": m.role, "content": m.content, "created_at": m.created_at} for m in rows],
-    }
+    return _history_response(
+        request,
+        response,
+        db,
+        convo_id,
+        limit=limit,
+        before=before,
+        after=after,
+        newest_first=True,
+    )
+
+
+async def _iter_upload(audio: UploadFile, head: bytes, chunk_size: int):
+    """Yield the upload in chunks (first chunk already read), stopping once it passes MAX_AUDIO_MB."""
+    limit = max_audio_bytes()
+    total = len(head)
+    yield head
+    while True:
+        chunk = await audio.read(chunk_size)
+        if not chunk:
+            return
+        total += len(chunk)
+        if total > limit:
+            raise AudioRejected("Audio too large")
+        yield chunk
 
 
 @app.post("/voice/process")
@@ -92,22 +248,26 @@ async def web_voice_upload(
     background_tasks: BackgroundTasks,
     user_id: str = Form(...),
     audio: UploadFile = File(...),
-    language: str = Form("en"),
+    language: str | None = Form(None),
     db: Session = Depends(get_db),
 ):
     if not (audio.content_type or "").startswith("audio/"):
         raise HTTPException(status_code=400, detail="audio file required")
 
-    data = await audio.read()
-    if not data:
+    chunk_size = max(SNIFF_BYTES, int(settings.AUDIO_STREAM_CHUNK_BYTES))
+    head = await audio.read(chunk_size)
+    if not head:
         raise HTTPException(status_code=400, detail="empty audio")
-
-    blob_path = upload_audio_bytes(
-        data=data,
-        content_type=audio.content_type or "application/octet-stream",
-        filename=audio.filename or "voice",
-        prefix="input",
-    )
+    try:
+        check_audio_head(head[:SNIFF_BYTES], audio.size)
+        blob_path = await upload_stream(
+            _iter_upload(audio, head, chunk_size),
+            content_type=audio.content_type or "application/octet-stream",
+            filename=audio.filename or "voice",
+            prefix="input",
+        )
+    except AudioRejected as exc:
+        raise HTTPException(status_code=413, detail=str(exc))
 
     job_id = create_voice_job(
         db=db,
@@ -116,12 +276,15 @@ async def web_voice_upload(
         twilio_media_url=None,
         audio_blob_path=blob_path,
         twilio_message_sid=None,
+        # Only a language the client chose; None lets Whisper detect it (or STT_HINT_FROM_HISTORY apply).
+        preferred_language=language or None,
     )
 
-    background_tasks.add_task(
-        process_voice_job,
-        {"job_id": job_id, "preferred_language": language or "en"},
-    )
+    if settings.VOICE_QUEUE_BACKEND == "inline":
+        background_tasks.add_task(
+            process_voice_job,
+            {"job_id": job_id, "preferred_language": language or None},
+        )
 
     return {"job_id": job_id, "status": "queued"}
 
@@ -129,8 +292,83 @@ async def web_voice_upload(
 @app.get("/voice/jobs/{job_id}")
 @trace_call
 def voice_job_status(job_id: str, db: Session = Depends(get_db)):
+    # Primary: clients poll right after the webhook enqueues, before a replica has the row.
     job = get_voice_job_public_dict(db, job_id)
     if not job:
         raise HTTPException(status_code=404, detail="not found")
     return job
 
+
+@app.get("/voice/jobs/{job_id}/events")
+def voice_job_events(job_id: str):
+    """Server-sent events with the job's state on every transition; replaces polling the status route."""
+    return StreamingResponse(
+        stream_job_events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def require_admin(x_admin_key: str | None = Header(None)) -> None:
+    expected = settings.ADMIN_API_KEY
+    if not expected:
+        raise HTTPException(status_code=403, detail="admin endpoints disabled")
+    if not x_admin_key or not hmac.compare_digest(x_admin_key, expected):
+        raise HTTPException(status_code=401, detail="invalid admin key")
+
+
+@app.get("/admin/metrics", dependencies=[Depends(require_admin)])
+def admin_metrics(db: Session = Depends(get_read_db)):
+    return {
+        "db_pool": pool_status(),
+        "voice_queue": queue_depth(db),
+        "stt_cache": stt_cache_stats(db),
+        **metrics.snapshot(),
+    }
+
+
+@app.get("/admin/voice-timings", dependencies=[Depends(require_admin)])
+def admin_voice_timings(
+    hours: float = Query(24.0, gt=0, le=24 * 90),
+    source: str | None = None,
+    status: str | None = None,
+    db: Session = Depends(get_read_db),
+):
+    """Per-stage latency percentiles of voice jobs created in the last `hours`."""
+    return stage_timing_report(db, hours=hours, source=source, status=status)
+
+
+@app.post("/admin/warmup", dependencies=[Depends(require_admin)])
+def admin_warmup(components: str = "all"):
+    return warm_up(parse_components(components))
+
+
+@app.get("/admin/export", dependencies=[Depends(require_admin)])
+@trace_call
+def admin_export(
+    since: datetime | None = None,
+    until: datetime | None = None,
+    source: str | None = None,
+    entities: str = ",".join(ENTITIES),
+    gzip: bool = True,
+):
+    selected = tuple(e.strip() for e in entities.split(",") if e.strip())
+    if not selected or set(selected) - set(ENTITIES):
+        raise HTTPException(status_code=400, detail=f"entities must be a subset of {','.join(ENTITIES)}")
+
+    filters = ExportFilters(since=since, until=until, source=source)
+
+    def _stream():
+        # Own session: the request-scoped one may be closed before streaming ends.
+        db = SessionLocal()
+        stats = ExportStats()
+        try:
+            yield from iter_ndjson(db, filters, entities=selected, stats=stats)
+        finally:
+            db.close()
+            logger.info("admin export finished %s", stats.as_dict())
+
+    body = iter_gzip(_stream()) if gzip else _stream()
+    headers = {"Content-Disposition": 'attachment; filename="medi-export.ndjson' + ('.gz"' if gzip else '"')}
+    media_type = "application/gzip" if gzip else "application/x-ndjson"
+    return StreamingResponse(body, media_type=media_type, headers=headers)
@@ -0,0 +1,40 @@
+import logging
+import time
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+
+from app.services.storage import local_backend, media_type_for, verify_media_signature
+
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+@router.get("/media/{key:path}")
+def local_media(key: str, exp: int, sig: str):
+    """
+    Serve a local-storage object behind a signed, expiring URL (see
+    LocalStorage.read_url). FileResponse answers Range requests and uses the
+    server's zero-copy file send when it offers one.
+    """
+    try:
+        valid = verify_media_signature(key, exp, sig)
+    except RuntimeError:
+        raise HTTPException(status_code=404, detail="not found")
+    if not valid:
+        raise HTTPException(status_code=403, detail="invalid or expired link")
+
+    try:
+        path = local_backend().path_for(key)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="not found")
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="not found")
+
+    # Audio keys are content hashes, so clients may cache until the link expires.
+    return FileResponse(
+        path,
+        media_type=media_type_for(key),
+        headers={"Cache-Control": f"private, max-age={max(0, exp - int(time.time()))}"},
+    )
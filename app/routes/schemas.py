@@ -23,3 +23,7 @@ class MessageOut(BaseModel):
 class ChatHistoryResponse(BaseModel):
     conversation_id: str
     messages: list[MessageOut]
+    total: int | None = None
+    has_more: bool = False
+    prev_cursor: str | None = Field(default=None, description="Pass as `before` for older messages.")
+    next_cursor: str | None = Field(default=None, description="Pass as `after` for newer messages.")
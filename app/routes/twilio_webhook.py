@@ -5,6 +5,7 @@ from fastapi.responses import Response
 from sqlalchemy.orm import Session
 from twilio.twiml.messaging_response import MessagingResponse
 
+from app.core.config import settings
 from app.core.observability import trace_call
 from app.db.session import get_db
 from app.services.chat_service import handle_incoming_message
@@ -75,12 +76,14 @@ def twilio_webhook(
             twilio_media_url=MediaUrl0,
             audio_blob_path=None,
             twilio_message_sid=MessageSid,
+            preferred_language=preferred_language,
         )
 
-        background_tasks.add_task(
-            process_voice_job,
-            {"job_id": job_id, "preferred_language": preferred_language},
-        )
+        if settings.VOICE_QUEUE_BACKEND == "inline":
+            background_tasks.add_task(
+                process_voice_job,
+                {"job_id": job_id, "preferred_language": preferred_language},
+            )
         logger.info(
             "twilio webhook voice-path: queued voice job job_id=%s preferred_language=%s",
             job_id,
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import argparse
+import io
+import sys
+import time
+import wave
+from pathlib import Path
+
+# Allow running this file directly: `python app/scripts/bench_audio_buffer.py`
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import numpy as np
+
+from app.core.metrics import percentile
+from app.services.audio_buffer import render_wav
+
+SAMPLE_RATE = 24000
+TRIM_THRESHOLD = 0.005
+TRIM_PAD_MS = 180
+
+
+def _synthetic_clip(seconds: float) -> np.ndarray:
+    """Tone bursts with 0.5 s of silence either side, like a TTS utterance."""
+    n = int(seconds * SAMPLE_RATE)
+    t = np.arange(n, dtype=np.float32) / SAMPLE_RATE
+    clip = 0.3 * np.sin(2 * np.pi * 220.0 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3.0 * t))
+    silence = np.zeros(SAMPLE_RATE // 2, dtype=np.float32)
+    return np.concatenate([silence, clip.astype(np.float32), silence])
+
+
+def _previous_path(arr: np.ndarray) -> bytes:
+    """The pre-audio_buffer implementation: clip, full-array trim scan, scale, astype, wave module."""
+    arr = np.clip(arr, -1.0, 1.0)
+    active = np.flatnonzero(np.abs(arr) > TRIM_THRESHOLD)
+    pad = int(SAMPLE_RATE * TRIM_PAD_MS / 1000.0)
+    arr = arr[max(0, int(active[0]) - pad) : min(arr.shape[0], int(active[-1]) + pad + 1)]
+    pcm = (arr * 32767.0).astype(np.int16).tobytes()
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(SAMPLE_RATE)
+        wf.writeframes(pcm)
+    return buf.getvalue()
+
+
+def _timed(fn, iterations: int) -> list[float]:
+    fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return sorted(samples)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Float samples -> trimmed PCM16 WAV, previous path vs audio_buffer.")
+    parser.add_argument("--seconds", type=float, nargs="*", default=[1, 5, 20, 60, 120])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--normalize-dbfs", type=float, default=None, help="also apply RMS normalization")
+    args = parser.parse_args(argv)
+
+    print(f"{'clip s':>7} {'variant':>14} {'p50 ms':>9} {'p95 ms':>9}")
+    for seconds in args.seconds:
+        clip = _synthetic_clip(seconds)
+        if bytes(render_wav(clip, SAMPLE_RATE, trim_threshold=TRIM_THRESHOLD, trim_pad_ms=TRIM_PAD_MS)) != _previous_path(clip):
+            print(f"{seconds:>7g} output mismatch between variants")
+        variants = [
+            ("previous", lambda: _previous_path(clip)),
+            (
+                "audio_buffer",
+                lambda: render_wav(
+                    clip,
+                    SAMPLE_RATE,
+                    trim_threshold=TRIM_THRESHOLD,
+                    trim_pad_ms=TRIM_PAD_MS,
+                    target_rms_dbfs=args.normalize_dbfs,
+                ),
+            ),
+        ]
+        for name, fn in variants:
+            samples = _timed(fn, args.iterations)
+            print(f"{seconds:>7g} {name:>14} {percentile(samples, 50):>9.2f} {percentile(samples, 95):>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
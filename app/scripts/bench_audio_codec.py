@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import argparse
+import io
+import shutil
+import sys
+import time
+import wave
+from pathlib import Path
+
+# Allow running this file directly: `python app/scripts/bench_audio_codec.py`
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.core.metrics import percentile
+from app.services.audio_codec import (
+    av_available,
+    av_decode_to_pcm_f32,
+    av_encode_wav,
+    ffmpeg_decode_to_pcm_f32,
+    ffmpeg_encode_wav,
+)
+
+
+def _timed(fn, iterations: int) -> list[float]:
+    fn()  # warm-up
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return sorted(samples)
+
+
+def _pcm_to_wav(pcm_f32: bytes, sample_rate: int) -> bytes:
+    import numpy as np
+
+    pcm16 = (np.clip(np.frombuffer(pcm_f32, dtype=np.float32), -1.0, 1.0) * 32767.0).astype(np.int16)
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(pcm16.tobytes())
+    return buf.getvalue()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Compare in-process (PyAV) and ffmpeg CLI audio decode/encode.")
+    parser.add_argument("audio", type=Path, help="sample voice note (ogg/opus/mp3/wav)")
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    data = args.audio.read_bytes()
+    backends = []
+    if av_available():
+        backends.append(("av", av_decode_to_pcm_f32, av_encode_wav))
+    if shutil.which("ffmpeg"):
+        backends.append(("ffmpeg", ffmpeg_decode_to_pcm_f32, ffmpeg_encode_wav))
+    if not backends:
+        raise SystemExit("neither PyAV nor the ffmpeg CLI is available")
+
+    decode = backends[0][1]
+    wav = _pcm_to_wav(decode(data, sample_rate=24000), 24000)
+
+    print(f"input {args.audio.name}: {len(data)} bytes, {args.iterations} iterations")
+    print(f"{'backend':>8} {'operation':>12} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    for name, decode_fn, encode_fn in backends:
+        cases = [
+            ("decode", lambda: decode_fn(data, sample_rate=16000)),
+            ("encode-ogg", lambda: encode_fn(wav, "ogg")),
+            ("encode-mp3", lambda: encode_fn(wav, "mp3")),
+        ]
+        for op, fn in cases:
+            samples = _timed(fn, args.iterations)
+            print(
+                f"{name:>8} {op:>12} {percentile(samples, 50):>9.2f} "
+                f"{percentile(samples, 95):>9.2f} {samples[-1]:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Allow running this file directly: `python app/scripts/bench_stt_pool.py`
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.core.metrics import percentile
+from app.services.stt_pool import SttPool
+
+
+def candidate_splits(cores: int) -> list[tuple[int, int]]:
+    """Every (processes, cpu_threads) pair that uses all cores without oversubscribing."""
+    return [(p, cores // p) for p in range(1, cores + 1) if cores % p == 0]
+
+
+def run_split(processes: int, threads: int, clips: list[bytes], requests: int, concurrency: int) -> dict:
+    pool = SttPool(processes=processes, cpu_threads=threads, max_pending=max(concurrency, processes))
+    try:
+        pool.warm_up()
+        latencies: list[float] = []
+
+        def one(i: int) -> None:
+            started = time.perf_counter()
+            pool.transcribe(clips[i % len(clips)])
+            latencies.append((time.perf_counter() - started) * 1000.0)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as clients:
+            list(clients.map(one, range(requests)))
+        elapsed = time.perf_counter() - started
+    finally:
+        pool.shutdown()
+
+    ordered = sorted(latencies)
+    return {
+        "processes": processes,
+        "threads": threads,
+        "throughput": requests / elapsed,
+        "p50": percentile(ordered, 50),
+        "p95": percentile(ordered, 95),
+        "p99": percentile(ordered, 99),
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Pick the STT pool processes x cpu_threads split for this host.")
+    parser.add_argument("audio", nargs="+", type=Path, help="sample voice notes (ogg/mp3/wav)")
+    parser.add_argument("--cores", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--requests", type=int, default=24)
+    parser.add_argument("--concurrency", type=int, default=8, help="simultaneous voice notes")
+    args = parser.parse_args(argv)
+
+    clips = [p.read_bytes() for p in args.audio]
+    results = []
+    print(f"{'procs':>5} {'threads':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for processes, threads in candidate_splits(args.cores):
+        r = run_split(processes, threads, clips, args.requests, args.concurrency)
+        results.append(r)
+        print(
+            f"{r['processes']:>5} {r['threads']:>7} {r['throughput']:>8.2f} "
+            f"{r['p50']:>9.0f} {r['p95']:>9.0f} {r['p99']:>9.0f}",
+            flush=True,
+        )
+
+    best = max(results, key=lambda r: (round(r["throughput"], 1), -r["p95"]))
+    print(f"\nbest: STT_POOL_PROCESSES={best['processes']} STT_CPU_THREADS={best['threads']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Allow running this file directly: `python app/scripts/bench_tts.py`
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.core.metrics import percentile
+from app.services.audio_codec import decode_to_pcm_f32
+from app.services.tts_piper import PiperTTS, _piper_available
+
+SAMPLE_TEXTS = [
+    "Hello, I am MEDI.",
+    "Please describe your symptoms and how long you have had them.",
+    "If you have chest pain, trouble breathing or severe bleeding, call your local emergency number now. "
+    "Otherwise, I can help you find the nearest clinic and explain what to expect at your visit.",
+]
+
+
+def _audio_seconds(encoded: bytes) -> float:
+    return len(decode_to_pcm_f32(encoded, sample_rate=16000)) / 4 / 16000.0
+
+
+def _backends(tts: PiperTTS, language: str) -> dict:
+    out = {}
+    if tts.use_azure:
+        out["azure"] = lambda text: tts._synthesize_azure(text, "web", language=language)
+    model = tts.piper_models.get(language)
+    if model and _piper_available(model):
+        out["piper"] = lambda text: tts._synthesize_piper(text, "web", language=language)
+    out["chatterbox"] = lambda text: tts._synthesize_chatterbox(text, "web")
+    return out
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Real-time factor (synthesis time / audio duration) per TTS backend.")
+    parser.add_argument("--backend", action="append", help="azure, piper or chatterbox (default: all available)")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    tts = PiperTTS()
+    backends = _backends(tts, args.language)
+    names = args.backend or list(backends)
+
+    print(f"{'backend':>10} {'chars':>6} {'audio s':>8} {'p50 ms':>9} {'p95 ms':>9} {'rtf p50':>8}")
+    for name in names:
+        fn = backends.get(name)
+        if fn is None:
+            print(f"{name:>10} unavailable")
+            continue
+        fn(SAMPLE_TEXTS[0])  # load model / open connection
+        for text in SAMPLE_TEXTS:
+            samples = []
+            audio_s = 0.0
+            for _ in range(args.iterations):
+                started = time.perf_counter()
+                encoded = fn(text)
+                samples.append((time.perf_counter() - started) * 1000.0)
+                audio_s = _audio_seconds(encoded)
+            samples.sort()
+            p50 = percentile(samples, 50)
+            rtf = (p50 / 1000.0) / audio_s if audio_s else float("nan")
+            print(
+                f"{name:>10} {len(text):>6} {audio_s:>8.2f} {p50:>9.1f} "
+                f"{percentile(samples, 95):>9.1f} {rtf:>8.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
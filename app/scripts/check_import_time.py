@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# `python -X importtime` lines: "import time: <self us> | <cumulative us> | <module>"
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(module: str) -> tuple[int, list[tuple[int, str]]]:
+    """Return (cumulative us for `module`, top-level imports sorted by cumulative us)."""
+    env = dict(os.environ)
+    # Settings require these; values are irrelevant for an import-only run.
+    env.setdefault("DATABASE_URL", "postgresql+psycopg2://u:p@localhost:5432/medi")
+    env.setdefault("OPENAI_EMBED_MODEL", "text-embedding-3-small")
+    env.setdefault("OPENAI_API_KEY", "unused")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=str(PROJECT_ROOT),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{proc.stderr[-4000:]}")
+
+    total = 0
+    heavy: list[tuple[int, str]] = []
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if not m:
+            continue
+        cumulative, indent, name = int(m.group(2)), len(m.group(3)), m.group(4)
+        if name == module:
+            total = cumulative
+        elif indent <= 2:
+            heavy.append((cumulative, name))
+    heavy.sort(reverse=True)
+    return total, heavy
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Fail if importing a module exceeds an import-time budget.")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "1500")))
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    total_us, heavy = measure(args.module)
+    total_ms = total_us / 1000.0
+    print(f"{args.module}: {total_ms:.1f}ms (budget {args.budget_ms:.0f}ms)")
+    for cumulative, name in heavy[: args.top]:
+        print(f"  {cumulative / 1000.0:8.1f}ms  {name}")
+
+    if total_ms > args.budget_ms:
+        raise SystemExit(f"import budget exceeded: {total_ms:.1f}ms > {args.budget_ms:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
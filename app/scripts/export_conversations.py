@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Allow running this file directly: `python app/scripts/export_conversations.py`
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.db.session import SessionLocal
+from app.services.export_service import (
+    DEFAULT_BATCH_SIZE,
+    ENTITIES,
+    ExportFilters,
+    write_ndjson,
+    write_parquet,
+)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Export users, conversations and messages for analytics.")
+    parser.add_argument("--format", choices=["ndjson", "parquet"], default="ndjson")
+    parser.add_argument(
+        "--out",
+        default="-",
+        help="NDJSON: file path ('.gz' suffix compresses) or '-' for stdout. Parquet: output directory.",
+    )
+    parser.add_argument("--since", type=datetime.fromisoformat, help="created_at >= (ISO 8601)")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="created_at < (ISO 8601)")
+    parser.add_argument("--source", choices=["whatsapp", "web"])
+    parser.add_argument("--entities", default=",".join(ENTITIES), help="comma separated subset of users,conversations,messages")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    entities = tuple(e.strip() for e in args.entities.split(",") if e.strip())
+    unknown = set(entities) - set(ENTITIES)
+    if unknown:
+        raise SystemExit(f"Unknown entities: {', '.join(sorted(unknown))}")
+
+    filters = ExportFilters(since=args.since, until=args.until, source=args.source)
+    db = SessionLocal()
+    try:
+        if args.format == "parquet":
+            if args.out == "-":
+                raise SystemExit("--out must be a directory for parquet")
+            stats = write_parquet(db, Path(args.out), filters, entities=entities, batch_size=args.batch_size)
+        elif args.out == "-":
+            stats = write_ndjson(db, sys.stdout.buffer, filters, entities=entities, batch_size=args.batch_size)
+        else:
+            with open(args.out, "wb") as fh:
+                stats = write_ndjson(
+                    db,
+                    fh,
+                    filters,
+                    entities=entities,
+                    batch_size=args.batch_size,
+                    compress=args.out.endswith(".gz"),
+                )
+    finally:
+        db.close()
+
+    rows = " | ".join(f"{k}: {v}" for k, v in stats.rows.items() if k in entities)
+    print(f"Exported {rows} | {stats.total} rows in {stats.elapsed_s:.1f}s ({stats.rows_per_s:.0f} rows/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
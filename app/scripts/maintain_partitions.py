@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+# Allow running this file directly: `python app/scripts/maintain_partitions.py`
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.core.config import settings
+from app.db.partitioning import PARTITIONED_TABLES, convert_to_partitioned, ensure_partitions
+from app.db.session import SessionLocal, engine
+from app.services.archive_service import run_archiver
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Partition maintenance and archival for messages/voice_jobs.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    convert = sub.add_parser("convert", help="one-off: convert plain tables to monthly partitions")
+    convert.add_argument("--tables", default=",".join(PARTITIONED_TABLES))
+
+    sub.add_parser("ensure", help="create upcoming monthly partitions")
+
+    archive = sub.add_parser("archive", help="archive closed conversations and purge old voice jobs")
+    archive.add_argument("--after-days", type=int, default=settings.ARCHIVE_AFTER_DAYS)
+    archive.add_argument("--voice-job-days", type=int, default=settings.VOICE_JOB_RETENTION_DAYS)
+    archive.add_argument("--batch-size", type=int, default=200)
+    archive.add_argument("--max-batches", type=int, default=None)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        for table in [t.strip() for t in args.tables.split(",") if t.strip()]:
+            changed = convert_to_partitioned(engine, table, months_ahead=settings.PARTITION_MONTHS_AHEAD)
+            print(f"{table}: {'converted' if changed else 'already partitioned'}")
+        return
+
+    if args.command == "ensure":
+        ensure_partitions(engine, months_ahead=settings.PARTITION_MONTHS_AHEAD)
+        print("Partitions ensured")
+        return
+
+    db = SessionLocal()
+    try:
+        result = run_archiver(
+            db,
+            after_days=args.after_days,
+            voice_job_days=args.voice_job_days,
+            batch_size=args.batch_size,
+            max_batches=args.max_batches,
+        )
+    finally:
+        db.close()
+    print(
+        f"Archived conversations: {result.conversations} | messages: {result.messages} | "
+        f"voice jobs deleted: {result.voice_jobs_deleted} | transcripts purged: {result.transcripts_purged} | files: {len(result.files)} | "
+        f"dropped partitions: {', '.join(result.dropped_partitions) or '-'}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from collections import Counter
+from pathlib import Path
+
+# Allow running this file directly: `python app/scripts/prerender_tts_catalog.py`
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.core.config import settings
+from app.core.observability import configure_logging
+from app.services.storage import default_storage_path
+from app.services.tts_catalog import MANIFEST_KEY, build_tts_catalog
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Deploy step: pre-render every rule-based reply (all languages, web + whatsapp) and upload the manifest."
+    )
+    parser.parse_args(argv)
+
+    configure_logging(settings.LOG_LEVEL)
+    manifest = build_tts_catalog()
+    entries = manifest["entries"].values()
+    by_language = Counter(e["language"] for e in entries)
+    print(f"rendered {len(manifest['entries'])} clips -> {default_storage_path(MANIFEST_KEY)}")
+    for language, count in sorted(by_language.items()):
+        print(f"  {language}: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import argparse
+import signal
+import sys
+import threading
+from pathlib import Path
+
+# Allow running this file directly: `python app/scripts/run_voice_worker.py`
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.core.config import settings
+from app.core.observability import configure_logging
+from app.core.warmup import parse_components, warm_up
+from app.services.stt_pool import shutdown_stt_pool
+from app.services.voice_queue_worker import default_worker_id, run_voice_worker
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Process queued voice jobs (scale by running more of these).")
+    parser.add_argument("--concurrency", type=int, default=settings.VOICE_WORKER_CONCURRENCY)
+    parser.add_argument("--poll-seconds", type=float, default=settings.VOICE_WORKER_POLL_SECONDS)
+    parser.add_argument("--worker-id", default=default_worker_id())
+    parser.add_argument("--warmup", default="stt,twilio", help="components to load before claiming jobs")
+    args = parser.parse_args(argv)
+
+    configure_logging(settings.LOG_LEVEL)
+    warm_up(parse_components(args.warmup))
+
+    stop = threading.Event()
+
+    def _shutdown(signum, _frame):
+        print(f"signal {signum}: finishing in-flight jobs", flush=True)
+        stop.set()
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+
+    try:
+        run_voice_worker(
+            stop,
+            worker_id=args.worker_id,
+            concurrency=args.concurrency,
+            poll_seconds=args.poll_seconds,
+        )
+    finally:
+        shutdown_stt_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.observability import instrument_module_functions
+from app.db.models import Conversation, Message, VoiceJob
+from app.db.partitioning import drop_partitions_before, is_partitioned
+from app.services.stt_cache import purge_transcript_cache
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ArchiveResult:
+    conversations: int = 0
+    messages: int = 0
+    voice_jobs_deleted: int = 0
+    transcripts_purged: int = 0
+    files: list[str] = field(default_factory=list)
+    dropped_partitions: list[str] = field(default_factory=list)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def find_archivable_conversations(db: Session, cutoff: datetime, limit: int) -> list[str]:
+    """Closed conversations with no message newer than the cutoff."""
+    recent = (
+        select(Message.id)
+        .where(Message.conversation_id == Conversation.id, Message.created_at >= cutoff)
+        .exists()
+    )
+    rows = db.execute(
+        select(Conversation.id)
+        .where(
+            Conversation.status == "closed",
+            Conversation.archived_at.is_(None),
+            Conversation.created_at < cutoff,
+            ~recent,
+        )
+        .order_by(Conversation.created_at.asc())
+        .limit(limit)
+    ).all()
+    return [r[0] for r in rows]
+
+
+def _write_archive(payload: bytes, name: str) -> str:
+    if settings.ARCHIVE_TARGET == "azure":
+        from app.services.azure_blob import upload_audio_bytes
+
+        return upload_audio_bytes(
+            data=payload,
+            content_type="application/gzip",
+            filename=name,
+            prefix="archive",
+        )
+
+    out_dir = Path(settings.ARCHIVE_DIR)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    path = out_dir / name
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_bytes(payload)
+    tmp.replace(path)
+    return str(path)
+
+
+def archive_conversation_batch(db: Session, conversation_ids: list[str]) -> tuple[int, str | None]:
+    """
+    Export the batch's messages to one gzipped NDJSON file, then delete them
+    from the hot table and mark the conversations archived. The file is
+    written before anything is deleted.
+    """
+    if not conversation_ids:
+        return 0, None
+
+    buf = io.BytesIO()
+    count = 0
+    with gzip.GzipFile(fileobj=buf, mode="wb") as gz:
+        stmt = (
+            select(Message.id, Message.conversation_id, Message.role, Message.content, Message.created_at)
+            .where(Message.conversation_id.in_(conversation_ids))
+            .order_by(Message.conversation_id, Message.created_at, Message.id)
+            .execution_options(yield_per=2000)
+        )
+        for partition in db.execute(stmt).mappings().partitions():
+            for row in partition:
+                gz.write((json.dumps(dict(row), default=_json_default, ensure_ascii=False) + "\n").encode("utf-8"))
+                count += 1
+
+    name = f"messages-{datetime.utcnow():%Y%m%dT%H%M%S}-{conversation_ids[0][:8]}.ndjson.gz"
+    location = _write_archive(buf.getvalue(), name)
+
+    db.execute(delete(Message).where(Message.conversation_id.in_(conversation_ids)))
+    db.execute(
+        update(Conversation)
+        .where(Conversation.id.in_(conversation_ids))
+        .values(status="archived", archived_at=datetime.utcnow(), archive_path=location)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    logger.info("archived conversations=%s messages=%s location=%s", len(conversation_ids), count, location)
+    return count, location
+
+
+def purge_voice_jobs(db: Session, cutoff: datetime) -> int:
+    """Finished voice jobs are transient; delete those older than the cutoff."""
+    result = db.execute(
+        delete(VoiceJob).where(VoiceJob.created_at < cutoff, VoiceJob.status.in_(("done", "failed", "dead")))
+    )
+    db.commit()
+    return int(result.rowcount or 0)
+
+
+def run_archiver(
+    db: Session,
+    *,
+    after_days: int | None = None,
+    voice_job_days: int | None = None,
+    batch_size: int = 200,
+    max_batches: int | None = None,
+) -> ArchiveResult:
+    after_days = int(after_days if after_days is not None else settings.ARCHIVE_AFTER_DAYS)
+    voice_job_days = int(voice_job_days if voice_job_days is not None else settings.VOICE_JOB_RETENTION_DAYS)
+    now = datetime.utcnow()
+    cutoff = now - timedelta(days=after_days)
+    result = ArchiveResult()
+
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = find_archivable_conversations(db, cutoff, limit=batch_size)
+        if not ids:
+            break
+        count, location = archive_conversation_batch(db, ids)
+        result.conversations += len(ids)
+        result.messages += count
+        if location:
+            result.files.append(location)
+        batches += 1
+
+    result.voice_jobs_deleted = purge_voice_jobs(db, now - timedelta(days=voice_job_days))
+    result.transcripts_purged = purge_transcript_cache(db)
+
+    # Empty month partitions older than the windows can go entirely.
+    conn = db.connection()
+    partition_cutoffs = {
+        "messages": cutoff.date(),
+        "voice_jobs": (now - timedelta(days=voice_job_days)).date(),
+    }
+    for table, table_cutoff in partition_cutoffs.items():
+        if is_partitioned(conn, table):
+            result.dropped_partitions += drop_partitions_before(conn, table, date(table_cutoff.year, table_cutoff.month, 1))
+    db.commit()
+
+    logger.info(
+        "archiver done conversations=%s messages=%s voice_jobs_deleted=%s transcripts_purged=%s dropped=%s",
+        result.conversations,
+        result.messages,
+        result.voice_jobs_deleted,
+        result.transcripts_purged,
+        result.dropped_partitions,
+    )
+    return result
+
+
+instrument_module_functions(globals(), include_private=False)
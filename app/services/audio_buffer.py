@@ -0,0 +1,171 @@
+import logging
+import struct
+import threading
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+WAV_HEADER_BYTES = 44
+# Samples converted per step; the float scratch for one chunk stays in L2 cache.
+_CHUNK = 1 << 16
+_scratch = threading.local()
+
+
+def _chunk_scratch() -> np.ndarray:
+    buf = getattr(_scratch, "buf", None)
+    if buf is None:
+        buf = np.empty(_CHUNK, dtype=np.float32)
+        _scratch.buf = buf
+    return buf
+
+
+def as_float32_mono(samples) -> np.ndarray:
+    """
+    Flat float32 view of a torch tensor, ndarray or sequence. No copy is made
+    when the input is already contiguous float32 on the CPU.
+    """
+    try:
+        import torch
+
+        if isinstance(samples, torch.Tensor):
+            samples = samples.detach().cpu().numpy()
+    except ImportError:
+        pass
+    arr = np.asarray(samples, dtype=np.float32)
+    return arr.reshape(-1)
+
+
+def _first_above(arr: np.ndarray, threshold: float) -> int:
+    """Index of the first |sample| > threshold, scanning block by block from the start; -1 if none."""
+    for start in range(0, arr.shape[0], _CHUNK):
+        block = arr[start : start + _CHUNK]
+        hits = np.flatnonzero((block > threshold) | (block < -threshold))
+        if hits.size:
+            return start + int(hits[0])
+    return -1
+
+
+def _last_above(arr: np.ndarray, threshold: float) -> int:
+    for end in range(arr.shape[0], 0, -_CHUNK):
+        start = max(0, end - _CHUNK)
+        block = arr[start:end]
+        hits = np.flatnonzero((block > threshold) | (block < -threshold))
+        if hits.size:
+            return start + int(hits[-1])
+    return -1
+
+
+def trim_silence(arr: np.ndarray, sample_rate: int, threshold: float, pad_ms: int) -> np.ndarray:
+    """
+    View of arr without leading/trailing samples below threshold, keeping
+    pad_ms either side. Only the silent ends are scanned, not the whole clip.
+    """
+    if arr.size == 0:
+        return arr
+    threshold = max(float(threshold), 1e-6)
+    first = _first_above(arr, threshold)
+    if first < 0:
+        logger.warning("silence trim found no active samples, keeping original audio")
+        return arr
+    last = _last_above(arr, threshold)
+    pad = max(0, int(sample_rate * (pad_ms / 1000.0)))
+    return arr[max(0, first - pad) : min(arr.shape[0], last + pad + 1)]
+
+
+def normalize_rms(arr: np.ndarray, target_dbfs: float, max_gain_db: float = 20.0) -> np.ndarray:
+    """
+    Scale arr in place towards target RMS (dBFS), limited by max_gain_db and
+    so the peak never exceeds full scale. Returns arr.
+    """
+    if arr.size == 0:
+        return arr
+    rms = float(np.sqrt(np.dot(arr, arr) / arr.size))
+    peak = max(float(arr.max()), -float(arr.min()))
+    if rms <= 1e-9 or peak <= 1e-9:
+        return arr
+    gain = min(10.0 ** ((target_dbfs - 20.0 * np.log10(rms)) / 20.0), 10.0 ** (max_gain_db / 20.0), 1.0 / peak)
+    if abs(gain - 1.0) > 1e-3:
+        arr *= np.float32(gain)
+    return arr
+
+
+def resample_linear(arr: np.ndarray, src_rate: int, dst_rate: int) -> np.ndarray:
+    """Linear-interpolation resample into one preallocated output array."""
+    if src_rate == dst_rate or arr.size == 0:
+        return arr
+    n_out = int(round(arr.shape[0] * dst_rate / float(src_rate)))
+    out = np.empty(n_out, dtype=np.float32)
+    positions = np.arange(n_out, dtype=np.float64)
+    positions *= src_rate / float(dst_rate)
+    out[:] = np.interp(positions, np.arange(arr.shape[0], dtype=np.float64), arr)
+    return out
+
+
+def write_wav_header(buf: bytearray, n_samples: int, sample_rate: int) -> None:
+    """Canonical 44-byte PCM16 mono RIFF header at the start of buf."""
+    data_bytes = n_samples * 2
+    struct.pack_into(
+        "<4sI4s4sIHHIIHH4sI",
+        buf,
+        0,
+        b"RIFF",
+        36 + data_bytes,
+        b"WAVE",
+        b"fmt ",
+        16,
+        1,  # PCM
+        1,  # mono
+        int(sample_rate),
+        int(sample_rate) * 2,
+        2,
+        16,
+        b"data",
+        data_bytes,
+    )
+
+
+def float_to_wav(arr: np.ndarray, sample_rate: int) -> bytearray:
+    """
+    Float32 [-1, 1] samples to a PCM16 WAV in a single bytearray: the header
+    is packed in place and samples are clipped, scaled and cast chunk by chunk
+    straight into the data section.
+    """
+    n = int(arr.shape[0])
+    out = bytearray(WAV_HEADER_BYTES + n * 2)
+    write_wav_header(out, n, sample_rate)
+    pcm = np.frombuffer(out, dtype="<i2", count=n, offset=WAV_HEADER_BYTES)
+    scratch = _chunk_scratch()
+    for start in range(0, n, _CHUNK):
+        end = min(n, start + _CHUNK)
+        work = scratch[: end - start]
+        np.clip(arr[start:end], -1.0, 1.0, out=work)
+        work *= 32767.0
+        np.copyto(pcm[start:end], work, casting="unsafe")
+    return out
+
+
+def render_wav(
+    samples,
+    sample_rate: int,
+    *,
+    trim_threshold: float | None = None,
+    trim_pad_ms: int = 0,
+    target_rms_dbfs: float | None = None,
+    out_sample_rate: int | None = None,
+) -> bytearray:
+    """Model output (tensor/array) to WAV bytes: trim, normalize, resample, then PCM16."""
+    arr = as_float32_mono(samples)
+    if trim_threshold is not None:
+        arr = trim_silence(arr, sample_rate, trim_threshold, trim_pad_ms)
+    if target_rms_dbfs is not None:
+        if not arr.flags.writeable or not arr.flags.owndata:
+            # Do not scale the caller's tensor memory; one copy of the trimmed span.
+            arr = arr.copy()
+        normalize_rms(arr, target_rms_dbfs)
+    rate = int(sample_rate)
+    if out_sample_rate and int(out_sample_rate) != rate:
+        arr = resample_linear(arr, rate, int(out_sample_rate))
+        rate = int(out_sample_rate)
+    return float_to_wav(arr, rate)
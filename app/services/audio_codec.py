@@ -0,0 +1,280 @@
+import io
+import logging
+import subprocess
+import threading
+import wave
+from typing import Literal
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+EncodeFormat = Literal["mp3", "ogg"]
+
+# Output codec settings shared by both backends (match the previous ffmpeg CLI flags).
+_ENCODERS = {
+    "mp3": {"codec": "libmp3lame", "format": "mp3", "bit_rate": 64000},
+    "ogg": {"codec": "libopus", "format": "ogg", "bit_rate": 24000},
+}
+
+
+# Optional: in-process libav bindings. Without them every call uses the ffmpeg CLI.
+# Imported on first use (loading libav costs ~75 ms), so importing the app stays cheap.
+_av = None
+_av_checked = False
+_av_lock = threading.Lock()
+
+
+def _load_av():
+    global _av, _av_checked
+    if not _av_checked:
+        with _av_lock:
+            if not _av_checked:
+                try:
+                    import av
+                except Exception:
+                    av = None
+                _av = av
+                _av_checked = True
+    return _av
+
+
+def av_available() -> bool:
+    return _load_av() is not None
+
+
+def _require_av():
+    av = _load_av()
+    if av is None:
+        raise RuntimeError("PyAV not installed; in-process audio codec unavailable")
+    return av
+
+
+def _use_av() -> bool:
+    return settings.AUDIO_CODEC_BACKEND != "ffmpeg" and av_available()
+
+
+# --- PyAV (in-process) ---
+
+
+def av_decode_to_pcm_f32(audio_bytes: bytes, sample_rate: int = 16000, max_seconds: float | None = None) -> bytes:
+    """
+    Decode any container libav understands to mono float32 PCM at sample_rate.
+    Packets are demuxed from a view over the input, so the source bytes are never copied.
+    """
+    av = _require_av()
+    max_samples = int(max_seconds * sample_rate) if max_seconds else None
+    resampler = av.AudioResampler(format="flt", layout="mono", rate=sample_rate)
+    out = bytearray()
+    written = 0
+
+    with av.open(io.BytesIO(audio_bytes), mode="r") as container:
+        stream = container.streams.audio[0]
+        stream.thread_type = "AUTO"
+        done = False
+        for frame in container.decode(stream):
+            for resampled in resampler.resample(frame):
+                chunk = memoryview(resampled.planes[0])[: resampled.samples * 4]
+                if max_samples is not None and written + resampled.samples >= max_samples:
+                    out += chunk[: (max_samples - written) * 4]
+                    written = max_samples
+                    done = True
+                    break
+                out += chunk
+                written += resampled.samples
+            if done:
+                break
+        if not done:
+            for resampled in resampler.resample(None):
+                out += memoryview(resampled.planes[0])[: resampled.samples * 4]
+
+    return bytes(out)
+
+
+def av_encode_wav(wav_bytes: bytes, fmt: EncodeFormat) -> bytes:
+    """Encode WAV bytes to MP3 or Ogg/Opus in-process."""
+    av = _require_av()
+    spec = _ENCODERS[fmt]
+    buf = io.BytesIO()
+
+    with av.open(io.BytesIO(wav_bytes), mode="r") as source, av.open(buf, mode="w", format=spec["format"]) as sink:
+        in_stream = source.streams.audio[0]
+        # Opus only runs at 48/24/16/12/8 kHz; keep the source rate when allowed.
+        rate = in_stream.rate if fmt == "mp3" or in_stream.rate in (8000, 12000, 16000, 24000, 48000) else 48000
+        out_stream = sink.add_stream(spec["codec"], rate=rate)
+        out_stream.layout = "mono"
+        out_stream.bit_rate = spec["bit_rate"]
+        # The encoder resamples and re-frames (Opus needs fixed-size frames) internally.
+        for frame in source.decode(in_stream):
+            frame.pts = None
+            for packet in out_stream.encode(frame):
+                sink.mux(packet)
+        for packet in out_stream.encode(None):
+            sink.mux(packet)
+
+    return buf.getvalue()
+
+
+def av_encode_pcm_s16(pcm: bytes, sample_rate: int, fmt: EncodeFormat) -> bytes:
+    """Encode raw mono int16 PCM straight from memory, with no WAV container in between."""
+    av = _require_av()
+    import numpy as np
+
+    spec = _ENCODERS[fmt]
+    samples = np.frombuffer(pcm, dtype=np.int16).reshape(1, -1)
+    frame = av.AudioFrame.from_ndarray(samples, format="s16", layout="mono")
+    frame.sample_rate = sample_rate
+
+    buf = io.BytesIO()
+    with av.open(buf, mode="w", format=spec["format"]) as sink:
+        rate = sample_rate if fmt == "mp3" or sample_rate in (8000, 12000, 16000, 24000, 48000) else 48000
+        out_stream = sink.add_stream(spec["codec"], rate=rate)
+        out_stream.layout = "mono"
+        out_stream.bit_rate = spec["bit_rate"]
+        for packet in out_stream.encode(frame):
+            sink.mux(packet)
+        for packet in out_stream.encode(None):
+            sink.mux(packet)
+    return buf.getvalue()
+
+
+def pcm_s16_to_wav(pcm: bytes, sample_rate: int) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(int(sample_rate))
+        wf.writeframes(pcm)
+    return buf.getvalue()
+
+
+# --- MP3 joining ---
+
+# Layer III bitrates (kbps) by bitrate index, and sample rates by version.
+_MP3_BITRATES = {
+    "1": (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    "2": (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def _mp3_info_frame_length(data: bytes, offset: int) -> int:
+    """Length of the Xing/Info/VBRI frame at offset, or 0 if the frame there is audio."""
+    header = data[offset : offset + 4]
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return 0
+    version = (header[1] >> 3) & 0x03
+    layer = (header[1] >> 1) & 0x03
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x03
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return 0
+    mpeg1 = version == 3
+    mono = (header[3] >> 6) == 3
+    bitrate = _MP3_BITRATES["1" if mpeg1 else "2"][bitrate_index] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+    padding = (header[2] >> 1) & 0x01
+    length = (144 if mpeg1 else 72) * bitrate // sample_rate + padding
+    side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+    tag = data[offset + 4 + side_info : offset + 8 + side_info]
+    if tag in (b"Xing", b"Info") or data[offset + 36 : offset + 40] == b"VBRI":
+        return length
+    return 0
+
+
+def strip_mp3_tags(data: bytes) -> bytes:
+    """
+    Bare MPEG audio frames: drop the ID3v2 header, the encoder's Xing/Info frame
+    (its frame count would describe only this clip) and a trailing ID3v1 tag.
+    """
+    start = 0
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        start = 10 + size + (10 if data[5] & 0x10 else 0)
+    start += _mp3_info_frame_length(data, start)
+    end = len(data)
+    if end - start >= 128 and data[end - 128 : end - 125] == b"TAG":
+        end -= 128
+    return data[start:end]
+
+
+def join_mp3(parts: list[bytes]) -> bytes:
+    """
+    One playable MP3 from separately encoded clips. Per-clip ID3 and Info
+    frames in the middle of a stream stop decoders at the first boundary, so
+    only the frames are kept; players then size the CBR stream from its length.
+    """
+    return b"".join(strip_mp3_tags(part) for part in parts)
+
+
+# --- ffmpeg CLI (fallback) ---
+
+
+def ffmpeg_decode_to_pcm_f32(audio_bytes: bytes, sample_rate: int = 16000, max_seconds: float | None = None) -> bytes:
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", "pipe:0"]
+    if max_seconds:
+        cmd += ["-t", str(max_seconds)]
+    cmd += ["-ac", "1", "-ar", str(sample_rate), "-f", "f32le", "pipe:1"]
+    proc = subprocess.run(cmd, input=audio_bytes, capture_output=True)
+    if proc.returncode != 0:
+        stderr = proc.stderr.decode("utf-8", errors="ignore")
+        raise RuntimeError(f"ffmpeg failed: {stderr[:2000]}")
+    return proc.stdout
+
+
+def ffmpeg_encode_wav(wav_bytes: bytes, fmt: EncodeFormat) -> bytes:
+    if fmt == "mp3":
+        codec_args = ["-codec:a", "libmp3lame", "-q:a", "4", "-f", "mp3"]
+    else:
+        codec_args = ["-c:a", "libopus", "-b:a", "24k", "-vbr", "on", "-application", "voip", "-f", "ogg"]
+    cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-i", "pipe:0", *codec_args, "pipe:1"]
+    proc = subprocess.run(cmd, input=wav_bytes, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+    if proc.returncode != 0 or not proc.stdout:
+        err = proc.stderr.decode("utf-8", errors="ignore")
+        raise RuntimeError(f"ffmpeg failed: {err}")
+    return proc.stdout
+
+
+# --- Public entry points ---
+
+
+def decode_to_pcm_f32(audio_bytes: bytes, sample_rate: int = 16000, max_seconds: float | None = None) -> bytes:
+    """Mono float32 PCM; in-process when PyAV is available, ffmpeg CLI otherwise or on error."""
+    if _use_av():
+        try:
+            pcm = av_decode_to_pcm_f32(audio_bytes, sample_rate=sample_rate, max_seconds=max_seconds)
+            metrics.incr("audio_codec.decode.av")
+            return pcm
+        except Exception as exc:
+            logger.warning("in-process decode failed, falling back to ffmpeg error=%s", exc)
+    metrics.incr("audio_codec.decode.ffmpeg")
+    return ffmpeg_decode_to_pcm_f32(audio_bytes, sample_rate=sample_rate, max_seconds=max_seconds)
+
+
+def encode_wav(wav_bytes: bytes, fmt: EncodeFormat) -> bytes:
+    """WAV to MP3 (web) or Ogg/Opus (WhatsApp); in-process when possible."""
+    if _use_av():
+        try:
+            data = av_encode_wav(wav_bytes, fmt)
+            if data:
+                metrics.incr("audio_codec.encode.av")
+                return data
+        except Exception as exc:
+            logger.warning("in-process encode failed, falling back to ffmpeg fmt=%s error=%s", fmt, exc)
+    metrics.incr("audio_codec.encode.ffmpeg")
+    return ffmpeg_encode_wav(wav_bytes, fmt)
+
+
+def encode_pcm_s16(pcm: bytes, sample_rate: int, fmt: EncodeFormat) -> bytes:
+    """Mono int16 PCM to MP3/Ogg-Opus; in-process when possible, else via a WAV and the ffmpeg CLI."""
+    if _use_av():
+        try:
+            data = av_encode_pcm_s16(pcm, sample_rate, fmt)
+            if data:
+                metrics.incr("audio_codec.encode.av")
+                return data
+        except Exception as exc:
+            logger.warning("in-process PCM encode failed, falling back to ffmpeg fmt=%s error=%s", fmt, exc)
+    metrics.incr("audio_codec.encode.ffmpeg")
+    return ffmpeg_encode_wav(pcm_s16_to_wav(pcm, sample_rate), fmt)
@@ -0,0 +1,153 @@
+import logging
+import struct
+from dataclasses import dataclass
+
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Enough for the WAV fmt/data headers, an MP3 Xing/Info frame, the WebM Info
+# element and a front-loaded MP4 mvhd box.
+SNIFF_BYTES = 4096
+
+_MP3_BITRATES_V1_L3 = [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 0]
+_MP3_BITRATES_V2_L3 = [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160, 0]
+_MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+
+class AudioRejected(ValueError):
+    """Audio refused before decoding (too large, too long)."""
+
+
+@dataclass
+class AudioProbe:
+    container: str | None
+    duration_s: float | None = None
+
+
+def _wav_duration(head: bytes, total_size: int | None) -> float | None:
+    pos = 12
+    byte_rate = 0
+    while pos + 8 <= len(head):
+        chunk_id, size = head[pos : pos + 4], struct.unpack_from("<I", head, pos + 4)[0]
+        if chunk_id == b"fmt " and pos + 20 <= len(head):
+            byte_rate = struct.unpack_from("<I", head, pos + 16)[0]
+        elif chunk_id == b"data":
+            if not byte_rate:
+                return None
+            if size in (0, 0xFFFFFFFF) and total_size:
+                size = total_size - pos - 8  # streamed WAV without a final size
+            return size / float(byte_rate)
+        pos += 8 + size + (size & 1)
+    return None
+
+
+def _mp3_duration(head: bytes, total_size: int | None) -> float | None:
+    pos = 0
+    if head[:3] == b"ID3" and len(head) >= 10:
+        tag = ((head[6] & 0x7F) << 21) | ((head[7] & 0x7F) << 14) | ((head[8] & 0x7F) << 7) | (head[9] & 0x7F)
+        pos = 10 + tag
+    while pos + 4 <= len(head) and not (head[pos] == 0xFF and head[pos + 1] & 0xE0 == 0xE0):
+        pos += 1
+    if pos + 4 > len(head):
+        return None
+    b1, b2, b3 = head[pos + 1], head[pos + 2], head[pos + 3]
+    version = (b1 >> 3) & 0x03  # 3 = MPEG1, 2 = MPEG2, 0 = MPEG2.5
+    if version not in _MP3_SAMPLE_RATES or (b1 >> 1) & 0x03 != 1 or (b2 >> 2) & 0x03 == 3:
+        return None  # not layer III or reserved sample rate
+    sample_rate = _MP3_SAMPLE_RATES[version][(b2 >> 2) & 0x03]
+    bitrate = (_MP3_BITRATES_V1_L3 if version == 3 else _MP3_BITRATES_V2_L3)[b2 >> 4] * 1000
+    mono = (b3 >> 6) == 3
+    samples_per_frame = 1152 if version == 3 else 576
+
+    # Xing/Info header (VBR, and CBR from LAME) carries the frame count.
+    side_info = (17 if mono else 32) if version == 3 else (9 if mono else 17)
+    xing = pos + 4 + side_info
+    if head[xing : xing + 4] in (b"Xing", b"Info") and xing + 12 <= len(head):
+        flags = struct.unpack_from(">I", head, xing + 4)[0]
+        if flags & 0x1:
+            frames = struct.unpack_from(">I", head, xing + 8)[0]
+            return frames * samples_per_frame / float(sample_rate)
+    if bitrate and total_size:
+        return (total_size - pos) * 8.0 / bitrate
+    return None
+
+
+def _read_ebml_float(head: bytes, element_id: bytes) -> float | None:
+    idx = head.find(element_id)
+    if idx < 0 or idx + len(element_id) >= len(head):
+        return None
+    size_byte = head[idx + len(element_id)]
+    start = idx + len(element_id) + 1
+    if size_byte == 0x84 and start + 4 <= len(head):
+        return struct.unpack_from(">f", head, start)[0]
+    if size_byte == 0x88 and start + 8 <= len(head):
+        return struct.unpack_from(">d", head, start)[0]
+    return None
+
+
+def _webm_duration(head: bytes) -> float | None:
+    duration = _read_ebml_float(head, b"\x44\x89")
+    if duration is None:
+        return None
+    scale = 1_000_000  # TimecodeScale default, in ns
+    idx = head.find(b"\x2a\xd7\xb1")
+    if idx >= 0 and idx + 4 <= len(head):
+        length = head[idx + 3] & 0x0F if head[idx + 3] & 0xF0 == 0x80 else 0
+        if length and idx + 4 + length <= len(head):
+            scale = int.from_bytes(head[idx + 4 : idx + 4 + length], "big")
+    return duration * scale / 1e9
+
+
+def _mp4_duration(head: bytes) -> float | None:
+    idx = head.find(b"mvhd")
+    if idx < 0:
+        return None
+    body = idx + 4
+    if body >= len(head):
+        return None
+    if head[body] == 1 and body + 32 <= len(head):
+        timescale, duration = struct.unpack_from(">IQ", head, body + 20)
+    elif body + 20 <= len(head):
+        timescale, duration = struct.unpack_from(">II", head, body + 12)
+    else:
+        return None
+    return duration / float(timescale) if timescale else None
+
+
+def probe_audio(head: bytes, total_size: int | None = None) -> AudioProbe:
+    """
+    Container and, where the header carries it, duration from the first bytes
+    of a file. Ogg/Opus has no duration in its header, so it reports None and
+    is only bounded by the decoder's max_seconds.
+    """
+    try:
+        if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+            return AudioProbe("wav", _wav_duration(head, total_size))
+        if head[:4] == b"OggS":
+            return AudioProbe("ogg")
+        if head[:4] == b"\x1a\x45\xdf\xa3":
+            return AudioProbe("webm", _webm_duration(head))
+        if head[4:8] == b"ftyp":
+            return AudioProbe("mp4", _mp4_duration(head))
+        if head[:3] == b"ID3" or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+            return AudioProbe("mp3", _mp3_duration(head, total_size))
+    except Exception as exc:
+        logger.warning("audio probe failed error=%s", exc)
+    return AudioProbe(None)
+
+
+def max_audio_bytes() -> int:
+    return int(settings.MAX_AUDIO_MB) * 1024 * 1024
+
+
+def check_audio_head(head: bytes, total_size: int | None = None) -> AudioProbe:
+    """Raise AudioRejected when the declared size or the header's duration is over the limits."""
+    if total_size is not None and total_size > max_audio_bytes():
+        raise AudioRejected("Audio too large")
+    probe = probe_audio(head, total_size)
+    # A little slack: container durations are often rounded up.
+    if probe.duration_s is not None and probe.duration_s > float(settings.MAX_AUDIO_SECONDS) + 1.0:
+        raise AudioRejected(f"Audio too long ({probe.duration_s:.0f}s > {settings.MAX_AUDIO_SECONDS}s)")
+    return probe
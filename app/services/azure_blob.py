@@ -1,8 +1,14 @@
+import asyncio
 import logging
 import os
+import threading
+import time
 import uuid
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 
+from app.core.config import settings
 from app.core.observability import instrument_module_functions
 
 # Azure is required for voice storage
@@ -19,8 +25,29 @@ except Exception:
     ContentSettings = None
     generate_blob_sas = None
 
+# Optional: async client for the async request paths (needs aiohttp).
+try:
+    from azure.storage.blob.aio import BlobServiceClient as AsyncBlobServiceClient
+except Exception:
+    AsyncBlobServiceClient = None
+
 logger = logging.getLogger(__name__)
 
+# One client per process: it owns the HTTP connection pool, so reusing it
+# keeps TLS connections to the storage account warm across uploads.
+_client = None
+_client_conn: str | None = None
+_client_lock = threading.Lock()
+# Containers already created/verified by this process.
+_ready_containers: set[str] = set()
+
+_async_client = None
+_async_client_loop = None
+
+# blob path -> (SAS URL, monotonic expiry), reused until it is past half its lifetime.
+_sas_cache: "OrderedDict[tuple[str, str, int], tuple[str, float]]" = OrderedDict()
+_sas_lock = threading.Lock()
+
 
 def _require_azure_sdk() -> None:
     if BlobServiceClient is None or ContentSettings is None:
@@ -43,20 +70,50 @@ def _container_name() -> str:
     )
 
 
+def _client_options() -> dict:
+    return {
+        "max_single_put_size": int(settings.AZURE_BLOB_SINGLE_PUT_BYTES),
+        "max_block_size": int(settings.AZURE_BLOB_BLOCK_SIZE_BYTES),
+    }
+
+
 def _blob_service_client():
+    global _client, _client_conn
     _require_azure_sdk()
-    return BlobServiceClient.from_connection_string(_connection_string())
+    conn = _connection_string()
+    if _client is None or _client_conn != conn:
+        with _client_lock:
+            if _client is None or _client_conn != conn:
+                _client = BlobServiceClient.from_connection_string(conn, **_client_options())
+                _client_conn = conn
+                _ready_containers.clear()
+                logger.info("azure blob client created container=%s", _container_name())
+    return _client
 
 
 def _ensure_container(client):
-    container_client = client.get_container_client(_container_name())
-    try:
-        container_client.create_container()
-    except Exception:
-        pass
+    """Create the container on first use in this process; later calls skip the round trip."""
+    name = _container_name()
+    container_client = client.get_container_client(name)
+    if name not in _ready_containers:
+        try:
+            container_client.create_container()
+        except Exception:
+            pass  # usually 409: already exists
+        _ready_containers.add(name)
     return container_client
 
 
+def _upload_kwargs(data, content_type: str) -> dict:
+    # Payloads above AZURE_BLOB_SINGLE_PUT_BYTES go up as parallel blocks.
+    return {
+        "overwrite": True,
+        "content_settings": ContentSettings(content_type=content_type),
+        "max_concurrency": max(1, int(settings.AZURE_BLOB_MAX_CONCURRENCY)),
+        "length": len(data),
+    }
+
+
 def _extract_blob_path(storage_path: str) -> str:
     if not storage_path:
         raise ValueError("Empty storage_path")
@@ -92,16 +149,21 @@ def upload_audio_bytes(
     uid = uuid.uuid4().hex
     safe_prefix = (prefix or "voices").strip().strip("/") or "voices"
     blob_path = f"{safe_prefix}/{uid}/{safe_name}"
+    return put_blob(blob_path, data, content_type)
+
+
+def put_blob(blob_path: str, data: bytes, content_type: str) -> str:
+    """
+    Upload to an exact blob path (overwrites). Returns "azure:<blob_path>".
+    """
+    _require_azure_sdk()
+    blob_path = blob_path.lstrip("/")
 
     client = _blob_service_client()
     container_client = _ensure_container(client)
     blob = container_client.get_blob_client(blob_path)
     logger.info("azure blob upload start path=%s bytes=%s type=%s", blob_path, len(data), content_type)
-    blob.upload_blob(
-        data,
-        overwrite=True,
-        content_settings=ContentSettings(content_type=content_type),
-    )
+    blob.upload_blob(data, **_upload_kwargs(data, content_type))
     logger.info("azure blob upload done path=%s", blob_path)
     return f"azure:{blob_path}"
 
@@ -116,11 +178,18 @@ def download_audio_bytes(storage_path: str) -> bytes:
     client = _blob_service_client()
     container_client = client.get_container_client(_container_name())
     blob = container_client.get_blob_client(blob_path)
-    data = blob.download_blob().readall()
+    data = blob.download_blob(max_concurrency=max(1, int(settings.AZURE_BLOB_MAX_CONCURRENCY))).readall()
     logger.info("azure blob download done path=%s bytes=%s", blob_path, len(data))
     return data
 
 
+def blob_exists(storage_path: str) -> bool:
+    _require_azure_sdk()
+    blob_path = _extract_blob_path(storage_path)
+    client = _blob_service_client()
+    return bool(client.get_container_client(_container_name()).get_blob_client(blob_path).exists())
+
+
 def delete_audio(storage_path: str | None) -> None:
     """
     Best-effort cleanup for temporary uploaded audio blobs.
@@ -139,9 +208,10 @@ def delete_audio(storage_path: str | None) -> None:
         logger.warning("azure blob delete skipped path=%s error=%s", storage_path, exc)
 
 
-def _connection_parts() -> dict[str, str]:
+@lru_cache(maxsize=4)
+def _parse_connection_string(conn: str) -> dict[str, str]:
     parts: dict[str, str] = {}
-    for chunk in _connection_string().split(";"):
+    for chunk in conn.split(";"):
         if "=" not in chunk:
             continue
         key, value = chunk.split("=", 1)
@@ -149,15 +219,35 @@ def _connection_parts() -> dict[str, str]:
     return parts
 
 
+def _connection_parts() -> dict[str, str]:
+    # Parsed once per connection string; callers must not mutate the result.
+    return _parse_connection_string(_connection_string())
+
+
 def build_blob_read_url(storage_path: str, expiry_seconds: int | None = None) -> str:
     """
-    Builds a time-limited SAS read URL for Twilio/web playback.
+    Builds a time-limited SAS read URL for Twilio/web playback. URLs are
+    cached per blob and TTL and handed out again while more than half of their
+    lifetime remains, so repeated status reads do not re-sign.
     """
     _require_azure_sdk()
     if generate_blob_sas is None or BlobSasPermissions is None:
         raise RuntimeError("SAS helpers are unavailable from azure-storage-blob")
 
     blob_path = _extract_blob_path(storage_path)
+    ttl = expiry_seconds
+    if ttl is None:
+        ttl = int((os.getenv("AZURE_BLOB_URL_TTL_SECONDS") or "86400").strip() or "86400")
+    ttl = max(60, ttl)
+
+    cache_key = (_container_name(), blob_path, ttl)
+    now = time.monotonic()
+    with _sas_lock:
+        cached = _sas_cache.get(cache_key)
+        if cached is not None and cached[1] - now > ttl / 2.0:
+            _sas_cache.move_to_end(cache_key)
+            return cached[0]
+
     parts = _connection_parts()
 
     account_name = parts.get("AccountName")
@@ -172,11 +262,6 @@ def build_blob_read_url(storage_path: str, expiry_seconds: int | None = None) ->
         or f"https://{account_name}.blob.core.windows.net"
     ).rstrip("/")
 
-    ttl = expiry_seconds
-    if ttl is None:
-        ttl = int((os.getenv("AZURE_BLOB_URL_TTL_SECONDS") or "86400").strip() or "86400")
-    ttl = max(60, ttl)
-
     sas = generate_blob_sas(
         account_name=account_name,
         account_key=account_key,
@@ -187,8 +272,159 @@ def build_blob_read_url(storage_path: str, expiry_seconds: int | None = None) ->
     )
 
     url = f"{blob_endpoint}/{_container_name()}/{blob_path}?{sas}"
+    with _sas_lock:
+        _sas_cache[cache_key] = (url, now + ttl)
+        _sas_cache.move_to_end(cache_key)
+        while len(_sas_cache) > max(0, int(settings.AZURE_BLOB_SAS_CACHE_SIZE)):
+            _sas_cache.popitem(last=False)
     logger.info("azure blob read url generated path=%s ttl_seconds=%s", blob_path, ttl)
     return url
 
 
+# --- async variants (azure.storage.blob.aio) ---
+
+
+def _require_async_sdk() -> None:
+    _require_azure_sdk()
+    if AsyncBlobServiceClient is None:
+        raise RuntimeError("azure.storage.blob.aio unavailable (install aiohttp)")
+
+
+def _async_blob_service_client():
+    """Async client bound to the running event loop (its aiohttp session cannot cross loops)."""
+    global _async_client, _async_client_loop
+    _require_async_sdk()
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client_loop is not loop:
+        _async_client = AsyncBlobServiceClient.from_connection_string(_connection_string(), **_client_options())
+        _async_client_loop = loop
+    return _async_client
+
+
+async def _ensure_container_async(client):
+    name = _container_name()
+    container_client = client.get_container_client(name)
+    if name not in _ready_containers:
+        try:
+            await container_client.create_container()
+        except Exception:
+            pass
+        _ready_containers.add(name)
+    return container_client
+
+
+async def put_blob_async(blob_path: str, data: bytes, content_type: str) -> str:
+    blob_path = blob_path.lstrip("/")
+    container_client = await _ensure_container_async(_async_blob_service_client())
+    blob = container_client.get_blob_client(blob_path)
+    logger.info("azure blob upload start path=%s bytes=%s type=%s", blob_path, len(data), content_type)
+    await blob.upload_blob(data, **_upload_kwargs(data, content_type))
+    logger.info("azure blob upload done path=%s", blob_path)
+    return f"azure:{blob_path}"
+
+
+async def upload_audio_bytes_async(
+    data: bytes,
+    content_type: str,
+    filename: str,
+    *,
+    prefix: str = "voices",
+) -> str:
+    """Async upload_audio_bytes for request handlers; falls back to a thread without the aio SDK."""
+    if AsyncBlobServiceClient is None:
+        return await asyncio.to_thread(upload_audio_bytes, data, content_type, filename, prefix=prefix)
+    _require_async_sdk()
+    safe_name = (filename or "voice").replace("/", "_").replace("\\", "_")
+    safe_prefix = (prefix or "voices").strip().strip("/") or "voices"
+    return await put_blob_async(f"{safe_prefix}/{uuid.uuid4().hex}/{safe_name}", data, content_type)
+
+
+async def upload_stream_async(
+    chunks,
+    content_type: str,
+    filename: str,
+    *,
+    prefix: str = "voices",
+) -> str:
+    """
+    Upload from an async iterator of byte chunks without holding the whole
+    file: chunks are regrouped into AZURE_BLOB_BLOCK_SIZE_BYTES blocks, each
+    staged as it fills, then committed. A body that fits in one block goes up
+    as a single put. If the iterator raises, nothing is committed (Azure
+    discards uncommitted blocks) and the exception propagates.
+    """
+    _require_azure_sdk()
+    safe_name = (filename or "voice").replace("/", "_").replace("\\", "_")
+    safe_prefix = (prefix or "voices").strip().strip("/") or "voices"
+    blob_path = f"{safe_prefix}/{uuid.uuid4().hex}/{safe_name}"
+    block_size = max(64 * 1024, int(settings.AZURE_BLOB_BLOCK_SIZE_BYTES))
+    content_settings = ContentSettings(content_type=content_type)
+
+    if AsyncBlobServiceClient is not None:
+        container_client = await _ensure_container_async(_async_blob_service_client())
+        blob = container_client.get_blob_client(blob_path)
+
+        async def stage(block_id: str, data: bytes) -> None:
+            await blob.stage_block(block_id, data, length=len(data))
+
+        async def put(data: bytes) -> None:
+            await blob.upload_blob(data, overwrite=True, content_settings=content_settings)
+
+        async def commit(ids: list[str]) -> None:
+            await blob.commit_block_list(ids, content_settings=content_settings)
+    else:
+        blob = _ensure_container(_blob_service_client()).get_blob_client(blob_path)
+
+        async def stage(block_id: str, data: bytes) -> None:
+            await asyncio.to_thread(blob.stage_block, block_id, data, length=len(data))
+
+        async def put(data: bytes) -> None:
+            await asyncio.to_thread(blob.upload_blob, data, overwrite=True, content_settings=content_settings)
+
+        async def commit(ids: list[str]) -> None:
+            await asyncio.to_thread(blob.commit_block_list, ids, content_settings=content_settings)
+
+    buffer = bytearray()
+    block_ids: list[str] = []
+    total = 0
+    async for chunk in chunks:
+        buffer += chunk
+        total += len(chunk)
+        while len(buffer) >= block_size:
+            block_id = f"{len(block_ids):08d}"  # equal length; the SDK base64-encodes it
+            await stage(block_id, bytes(buffer[:block_size]))
+            block_ids.append(block_id)
+            del buffer[:block_size]
+
+    if not block_ids:
+        await put(bytes(buffer))
+    else:
+        if buffer:
+            block_id = f"{len(block_ids):08d}"
+            await stage(block_id, bytes(buffer))
+            block_ids.append(block_id)
+        await commit(block_ids)
+    logger.info("azure blob streamed upload done path=%s bytes=%s blocks=%s", blob_path, total, len(block_ids))
+    return f"azure:{blob_path}"
+
+
+async def download_audio_bytes_async(storage_path: str) -> bytes:
+    if AsyncBlobServiceClient is None:
+        return await asyncio.to_thread(download_audio_bytes, storage_path)
+    blob_path = _extract_blob_path(storage_path)
+    client = _async_blob_service_client()
+    blob = client.get_container_client(_container_name()).get_blob_client(blob_path)
+    downloader = await blob.download_blob(max_concurrency=max(1, int(settings.AZURE_BLOB_MAX_CONCURRENCY)))
+    data = await downloader.readall()
+    logger.info("azure blob download done path=%s bytes=%s", blob_path, len(data))
+    return data
+
+
+async def close_async_blob_client() -> None:
+    global _async_client, _async_client_loop
+    client, _async_client, _async_client_loop = _async_client, None, None
+    if client is not None:
+        await client.close()
+
+
 instrument_module_functions(globals(), include_private=True)
@@ -1,7 +1,17 @@
+from dataclasses import dataclass
+from sqlalchemy import insert, update
 from sqlalchemy.orm import Session
-from app.db.models import User, Conversation, Message
+from app.db.models import User, Conversation, Message, utcnow
 import uuid
-from sqlalchemy.orm import Session
+
+
+@dataclass
+class SavedMessage:
+    id: str
+    conversation_id: str
+    message_count: int             # conversation total after this insert
+    user_msgs_since_summary: int   # user turns not yet folded into the summary
+
 
 def get_or_create_user(db: Session, source: str, external_id: str) -> User:
     user = db.query(User).filter(User.external_id == external_id).first()
@@ -33,12 +43,43 @@ def get_or_create_active_conversation(db: Session, user_id: str) -> Conversation
     db.refresh(convo)
     return convo
 
-def save_message(db: Session, conversation_id: str, role: str, content: str) -> Message:
-    msg = Message(conversation_id=conversation_id, role=role, content=content)
-    db.add(msg)
+def save_message(db: Session, conversation_id: str, role: str, content: str) -> SavedMessage:
+    """
+    Insert a message and bump the conversation counters in one statement
+    (INSERT ... RETURNING as a CTE feeding the UPDATE), so the summary
+    trigger and history totals never need a COUNT over messages.
+    """
+    msg_id = str(uuid.uuid4())
+    ins = (
+        insert(Message)
+        .values(
+            id=msg_id,
+            conversation_id=conversation_id,
+            role=role,
+            content=content,
+            created_at=utcnow(),
+        )
+        .returning(Message.id)
+        .cte("ins")
+    )
+    stmt = (
+        update(Conversation)
+        .where(Conversation.id == conversation_id)
+        .values(
+            message_count=Conversation.message_count + 1,
+            user_msgs_since_summary=Conversation.user_msgs_since_summary + (1 if role == "user" else 0),
+        )
+        .returning(Conversation.message_count, Conversation.user_msgs_since_summary)
+        .add_cte(ins)
+    )
+    row = db.execute(stmt, execution_options={"synchronize_session": False}).one()
     db.commit()
-    db.refresh(msg)
-    return msg
+    return SavedMessage(
+        id=msg_id,
+        conversation_id=conversation_id,
+        message_count=int(row[0] or 0),
+        user_msgs_since_summary=int(row[1] or 0),
+    )
 
 def close_conversation(db: Session, conversation_id: str) -> Conversation | None:
     convo = db.query(Conversation).filter(Conversation.id == conversation_id).first()
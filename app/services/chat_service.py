@@ -8,10 +8,11 @@ from typing import Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import text as sql_text
 
-from anthropic import Anthropic
-
+from app.core import stage_timer
 from app.core.config import settings
 from app.core.observability import instrument_module_functions
+from app.db.session import read_session
+from app.services.llm.anthropic_client import get_anthropic_client
 from app.services.safety_service import (
     check_crisis,
     check_medical,
@@ -188,6 +189,19 @@ def _rb_text(language: str, key: str) -> str:
     return value
 
 
+def rule_based_reply_catalog() -> dict[str, dict[str, str]]:
+    """
+    Every fixed rule-based reply, exactly as handle_incoming_message sends it:
+    {language: {name: text}}. Used to pre-render voice replies.
+    """
+    catalog: dict[str, dict[str, str]] = {}
+    for lang in _RULE_BASED_I18N:
+        replies = {key: _rb_text(lang, key) for key in _RULE_BASED_I18N["en"] if key != "reset"}
+        replies["reset"] = _rb_text(lang, "reset") + "\n\n" + _rb_text(lang, "menu")
+        catalog[lang] = replies
+    return catalog
+
+
 def is_reset_cmd(t: str) -> bool:
     return t in {
         "reset",
@@ -356,7 +370,7 @@ def _claude_reply(
     if not ANTHROPIC_API_KEY:
         raise RuntimeError("ANTHROPIC_API_KEY not set in environment")
 
-    client = Anthropic(api_key=ANTHROPIC_API_KEY)
+    client = get_anthropic_client()
 
     summary_block = ""
     if summary_text.strip():
@@ -558,7 +572,8 @@ def handle_incoming_message(
             # 4) retrieve top-k knowledge chunks (topic-aware)
             chunks: list[dict] = []
             if len(incoming) >= RAG_SKIP_SHORT_CHARS:
-                chunks = retrieve_chunks(db, incoming, k=RAG_TOP_K, topic=topic)
+                with read_session(fallback=db) as rdb, stage_timer.stage("chat.rag"):
+                    chunks = retrieve_chunks(rdb, incoming, k=RAG_TOP_K, topic=topic)
             else:
                 chunks = []
 
@@ -598,15 +613,16 @@ def handle_incoming_message(
                 }
 
             # 6) call Claude with summary + retrieved grounding
-            reply = _claude_reply(
-                history,
-                retrieved_text=retrieved_text,
-                summary_text=summary_text,
-                valid_ids=valid_ids,
-                enforce_citations=enforce_citations,
-                topic=topic,
-                response_language=response_language,
-            )
+            with stage_timer.stage("chat.llm"):
+                reply = _claude_reply(
+                    history,
+                    retrieved_text=retrieved_text,
+                    summary_text=summary_text,
+                    valid_ids=valid_ids,
+                    enforce_citations=enforce_citations,
+                    topic=topic,
+                    response_language=response_language,
+                )
 
             used_kb = _detect_used_kb(reply)
             citations = _extract_citation_ids(reply)
@@ -630,10 +646,10 @@ def handle_incoming_message(
     if check_medical(incoming):
         reply = medical_disclaimer(reply)
 
-    save_message(db, convo.id, "assistant", reply)
+    saved = save_message(db, convo.id, "assistant", reply)
 
     # update running summary every N user messages
-    maybe_update_summary(db, convo.id)
+    maybe_update_summary(db, convo.id, user_msgs_since_summary=saved.user_msgs_since_summary)
 
     response = {"conversation_id": convo.id, "reply": reply, "language": response_language}
 
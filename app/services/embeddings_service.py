@@ -1,14 +1,27 @@
 from __future__ import annotations
-from app.core.config import settings
 
+import threading
 
-import os
-from openai import OpenAI
+from app.core.config import settings
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
 MODEL = settings.OPENAI_EMBED_MODEL
 
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_openai_client():
+    """Shared OpenAI client, created on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+
+                _client = OpenAI(api_key=settings.OPENAI_API_KEY)
+    return _client
+
 
 def embed_query(text: str) -> list[float]:
-    resp = client.embeddings.create(model=MODEL, input=[text])
+    resp = get_openai_client().embeddings.create(model=MODEL, input=[text])
     return resp.data[0].embedding
@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import time
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Iterator
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.observability import instrument_module_functions
+from app.db.models import Conversation, Message, User
+
+# Optional: only needed for Parquet output
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+ENTITIES = ("users", "conversations", "messages")
+DEFAULT_BATCH_SIZE = 2000
+
+
+@dataclass
+class ExportFilters:
+    since: datetime | None = None
+    until: datetime | None = None
+    source: str | None = None  # "whatsapp" | "web"
+
+
+@dataclass
+class ExportStats:
+    started: float = field(default_factory=time.perf_counter)
+    rows: dict[str, int] = field(default_factory=lambda: {e: 0 for e in ENTITIES})
+
+    @property
+    def total(self) -> int:
+        return sum(self.rows.values())
+
+    @property
+    def elapsed_s(self) -> float:
+        return max(time.perf_counter() - self.started, 1e-9)
+
+    @property
+    def rows_per_s(self) -> float:
+        return self.total / self.elapsed_s
+
+    def as_dict(self) -> dict:
+        return {
+            "rows": dict(self.rows),
+            "total": self.total,
+            "elapsed_s": round(self.elapsed_s, 3),
+            "rows_per_s": round(self.rows_per_s, 1),
+        }
+
+
+def _require_pyarrow() -> None:
+    if pa is None or pq is None:
+        raise RuntimeError("pyarrow not installed; Parquet export unavailable")
+
+
+def _statement(entity: str, filters: ExportFilters):
+    if entity == "users":
+        stmt = select(User.id, User.source, User.external_id, User.created_at)
+        ts = User.created_at
+        if filters.source:
+            stmt = stmt.where(User.source == filters.source)
+        order = (User.created_at, User.id)
+    elif entity == "conversations":
+        stmt = select(
+            Conversation.id,
+            Conversation.user_id,
+            Conversation.status,
+            Conversation.created_at,
+            Conversation.message_count,
+            Conversation.summary,
+            Conversation.summary_updated_at,
+        )
+        ts = Conversation.created_at
+        if filters.source:
+            stmt = stmt.join(User, User.id == Conversation.user_id).where(User.source == filters.source)
+        order = (Conversation.created_at, Conversation.id)
+    elif entity == "messages":
+        stmt = select(
+            Message.id,
+            Message.conversation_id,
+            Message.role,
+            Message.content,
+            Message.created_at,
+        )
+        ts = Message.created_at
+        if filters.source:
+            stmt = (
+                stmt.join(Conversation, Conversation.id == Message.conversation_id)
+                .join(User, User.id == Conversation.user_id)
+                .where(User.source == filters.source)
+            )
+        order = (Message.created_at, Message.id)
+    else:
+        raise ValueError(f"Unknown export entity: {entity}")
+
+    if filters.since:
+        stmt = stmt.where(ts >= filters.since)
+    if filters.until:
+        stmt = stmt.where(ts < filters.until)
+    return stmt.order_by(*order)
+
+
+def iter_entity_batches(
+    db: Session,
+    entity: str,
+    filters: ExportFilters,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Iterator[list[dict]]:
+    """
+    Stream one entity as lists of plain dicts.
+
+    yield_per turns on a server-side (named) cursor, so memory stays at one
+    batch no matter how large the table is. Columns only, no ORM objects.
+    """
+    stmt = _statement(entity, filters).execution_options(yield_per=batch_size)
+    result = db.execute(stmt)
+    for partition in result.mappings().partitions():
+        yield [dict(row) for row in partition]
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def iter_ndjson(
+    db: Session,
+    filters: ExportFilters,
+    entities: tuple[str, ...] = ENTITIES,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    stats: ExportStats | None = None,
+) -> Iterator[bytes]:
+    """
+    NDJSON lines tagged with their entity: {"type": "message", ...}.
+    Yields one encoded chunk per batch.
+    """
+    stats = stats or ExportStats()
+    for entity in entities:
+        kind = entity[:-1]
+        for batch in iter_entity_batches(db, entity, filters, batch_size=batch_size):
+            lines = [json.dumps({"type": kind, **row}, default=_json_default, ensure_ascii=False) for row in batch]
+            stats.rows[entity] += len(batch)
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+        logger.info("export entity done entity=%s rows=%s rows_per_s=%.1f", entity, stats.rows[entity], stats.rows_per_s)
+
+
+def iter_gzip(chunks: Iterator[bytes], level: int = 6) -> Iterator[bytes]:
+    """Incrementally gzip a byte stream (for HTTP responses)."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def write_ndjson(
+    db: Session,
+    out: IO[bytes],
+    filters: ExportFilters,
+    entities: tuple[str, ...] = ENTITIES,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    compress: bool = False,
+) -> ExportStats:
+    stats = ExportStats()
+    sink = gzip.GzipFile(fileobj=out, mode="wb") if compress else out
+    try:
+        for chunk in iter_ndjson(db, filters, entities=entities, batch_size=batch_size, stats=stats):
+            sink.write(chunk)
+    finally:
+        if compress:
+            sink.close()
+    return stats
+
+
+def _parquet_schema(entity: str):
+    ts = pa.timestamp("us")
+    if entity == "users":
+        fields = [("id", pa.string()), ("source", pa.string()), ("external_id", pa.string()), ("created_at", ts)]
+    elif entity == "conversations":
+        fields = [
+            ("id", pa.string()),
+            ("user_id", pa.string()),
+            ("status", pa.string()),
+            ("created_at", ts),
+            ("message_count", pa.int32()),
+            ("summary", pa.string()),
+            ("summary_updated_at", ts),
+        ]
+    else:
+        fields = [
+            ("id", pa.string()),
+            ("conversation_id", pa.string()),
+            ("role", pa.string()),
+            ("content", pa.string()),
+            ("created_at", ts),
+        ]
+    return pa.schema(fields)
+
+
+def write_parquet(
+    db: Session,
+    out_dir: Path,
+    filters: ExportFilters,
+    entities: tuple[str, ...] = ENTITIES,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    compression: str = "zstd",
+) -> ExportStats:
+    """
+    One Parquet file per entity (<out_dir>/<entity>.parquet), one row group per batch.
+    """
+    _require_pyarrow()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stats = ExportStats()
+
+    for entity in entities:
+        schema = _parquet_schema(entity)
+        writer = pq.ParquetWriter(str(out_dir / f"{entity}.parquet"), schema, compression=compression)
+        try:
+            for batch in iter_entity_batches(db, entity, filters, batch_size=batch_size):
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                stats.rows[entity] += len(batch)
+        finally:
+            writer.close()
+        logger.info("export entity done entity=%s rows=%s rows_per_s=%.1f", entity, stats.rows[entity], stats.rows_per_s)
+
+    return stats
+
+
+instrument_module_functions(globals(), include_private=False)
@@ -1,6 +1,36 @@
+import base64
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import select, tuple_
 from sqlalchemy.orm import Session
 from app.db.models import Message, Conversation
 
+MAX_PAGE_SIZE = 200
+
+
+@dataclass
+class HistoryPage:
+    rows: list          # Row(id, role, content, created_at), oldest -> newest
+    has_more: bool      # more rows exist in the direction of travel
+    prev_cursor: str | None
+    next_cursor: str | None
+
+
+def encode_cursor(created_at: datetime, message_id: str) -> str:
+    raw = f"{created_at.isoformat()}|{message_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        ts, message_id = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8").split("|", 1)
+        return datetime.fromisoformat(ts), message_id
+    except Exception as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
 def get_chat_history(db: Session, conversation_id: str, limit: int = 50, offset: int = 0):
     """
     Returns messages for a conversation ordered oldest -> newest.
@@ -14,11 +44,84 @@ def get_chat_history(db: Session, conversation_id: str, limit: int = 50, offset:
     )
     return q.all()
 
+
+def get_chat_history_page(
+    db: Session,
+    conversation_id: str,
+    limit: int = 50,
+    *,
+    before: str | None = None,
+    after: str | None = None,
+    newest_first: bool = False,
+) -> HistoryPage:
+    """
+    Keyset page over (created_at, id); column-only rows, no ORM hydration.
+
+    - before: messages older than the cursor (closest first)
+    - after: messages newer than the cursor (closest first)
+    - neither: the oldest page, or the newest page when newest_first is set
+    Rows are always returned oldest -> newest.
+    """
+    if before and after:
+        raise ValueError("Use either before or after, not both")
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+
+    key = tuple_(Message.created_at, Message.id)
+    stmt = select(Message.id, Message.role, Message.content, Message.created_at).where(
+        Message.conversation_id == conversation_id
+    )
+
+    descending = bool(before) or (newest_first and not after)
+    if before:
+        stmt = stmt.where(key < tuple_(*decode_cursor(before)))
+    elif after:
+        stmt = stmt.where(key > tuple_(*decode_cursor(after)))
+
+    if descending:
+        stmt = stmt.order_by(Message.created_at.desc(), Message.id.desc())
+    else:
+        stmt = stmt.order_by(Message.created_at.asc(), Message.id.asc())
+
+    rows = db.execute(stmt.limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if descending:
+        rows.reverse()
+
+    return HistoryPage(
+        rows=rows,
+        has_more=has_more,
+        prev_cursor=encode_cursor(rows[0].created_at, rows[0].id) if rows else None,
+        next_cursor=encode_cursor(rows[-1].created_at, rows[-1].id) if rows else None,
+    )
+
+
+def get_history_head(db: Session, conversation_id: str) -> tuple[int | None, str | None]:
+    """
+    (message_count, latest_message_id) in one round trip; used for totals and ETags.
+    """
+    latest_id = (
+        select(Message.id)
+        .where(Message.conversation_id == conversation_id)
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    row = db.execute(
+        select(Conversation.message_count, latest_id).where(Conversation.id == conversation_id)
+    ).first()
+    if not row:
+        return None, None
+    return (int(row[0]) if row[0] is not None else None), row[1]
+
+
 def get_latest_active_conversation_id(db: Session, user_id: str):
-    convo = (
-        db.query(Conversation)
+    convo_id = (
+        db.query(Conversation.id)
         .filter(Conversation.user_id == user_id, Conversation.status == "active")
         .order_by(Conversation.created_at.desc())
-        .first()
+        .limit(1)
+        .scalar()
     )
-    return convo.id if convo else None
+    return convo_id
+
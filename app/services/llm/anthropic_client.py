@@ -1,6 +1,7 @@
-from anthropic import AsyncAnthropic
+import threading
+
 from app.core.config import settings
-from llm.base import LLMClient
+from app.services.llm.base import LLMClient
 
 MODEL = settings.ANTHROPIC_MODEL or "claude-3-5-sonnet-latest"
 
@@ -12,8 +13,28 @@ SYSTEM_PROMPT = """You are MEDI, a calm meditation and mental-wellness assistant
 Tone: calm, brief, kind.
 """
 
+_sync_client = None
+_sync_client_lock = threading.Lock()
+
+
+def get_anthropic_client():
+    """Shared sync Anthropic client (connection pool reused across calls), created on first use."""
+    global _sync_client
+    if _sync_client is None:
+        with _sync_client_lock:
+            if _sync_client is None:
+                from anthropic import Anthropic
+
+                if not settings.ANTHROPIC_API_KEY:
+                    raise RuntimeError("ANTHROPIC_API_KEY not set")
+                _sync_client = Anthropic(api_key=settings.ANTHROPIC_API_KEY)
+    return _sync_client
+
+
 class AnthropicClient(LLMClient):
     def __init__(self):
+        from anthropic import AsyncAnthropic
+
         api_key = settings.ANTHROPIC_API_KEY
         if not api_key:
             raise RuntimeError("ANTHROPIC_API_KEY not set")
@@ -1,4 +1,4 @@
-from llm.anthropic_client import AnthropicClient
+from app.services.llm.anthropic_client import AnthropicClient
 from app.core.config import settings
 
 def get_llm():
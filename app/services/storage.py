@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import mimetypes
+import os
+import tempfile
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from urllib.parse import quote
+
+from app.core.config import BASE_DIR, settings
+from app.core.observability import instrument_module_functions
+
+logger = logging.getLogger(__name__)
+
+# Storage paths are "<scheme>:<key>". Reads dispatch on the scheme, so paths
+# written by one backend stay readable after STORAGE_BACKEND changes; writes
+# go to the configured backend. Raw keys without a scheme are Azure (legacy).
+
+
+def _split(storage_path: str) -> tuple[str, str]:
+    if not storage_path:
+        raise ValueError("Empty storage_path")
+    scheme, sep, key = storage_path.partition(":")
+    if not sep or scheme not in _BACKENDS:
+        return "azure", storage_path.lstrip("/")
+    key = key.lstrip("/")
+    if not key:
+        raise ValueError("Invalid storage_path")
+    return scheme, key
+
+
+def _safe_name(filename: str | None) -> str:
+    return (filename or "voice").replace("/", "_").replace("\\", "_")
+
+
+def _safe_prefix(prefix: str | None) -> str:
+    return (prefix or "voices").strip().strip("/") or "voices"
+
+
+class StorageBackend(ABC):
+    scheme: str
+
+    def storage_path(self, key: str) -> str:
+        return f"{self.scheme}:{key.lstrip('/')}"
+
+    @abstractmethod
+    def put(self, key: str, data: bytes, content_type: str) -> str:
+        """Write to an exact key (overwrites). Returns the storage path."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def upload(self, data: bytes, content_type: str, filename: str, prefix: str) -> str:
+        """Write under a new unique key. Returns the storage path."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def upload_stream(self, chunks, content_type: str, filename: str, prefix: str) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def download(self, key: str) -> bytes:
+        raise NotImplementedError
+
+    async def download_async(self, key: str) -> bytes:
+        return await asyncio.to_thread(self.download, key)
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def read_url(self, key: str, expiry_seconds: int | None = None) -> str:
+        """Time-limited URL a browser or Twilio can fetch."""
+        raise NotImplementedError
+
+
+class AzureStorage(StorageBackend):
+    """The existing Azure Blob implementation (app.services.azure_blob)."""
+
+    scheme = "azure"
+
+    def put(self, key: str, data: bytes, content_type: str) -> str:
+        from app.services.azure_blob import put_blob
+
+        return put_blob(key, data, content_type)
+
+    def upload(self, data: bytes, content_type: str, filename: str, prefix: str) -> str:
+        from app.services.azure_blob import upload_audio_bytes
+
+        return upload_audio_bytes(data=data, content_type=content_type, filename=filename, prefix=prefix)
+
+    async def upload_stream(self, chunks, content_type: str, filename: str, prefix: str) -> str:
+        from app.services.azure_blob import upload_stream_async
+
+        return await upload_stream_async(chunks, content_type=content_type, filename=filename, prefix=prefix)
+
+    def download(self, key: str) -> bytes:
+        from app.services.azure_blob import download_audio_bytes
+
+        return download_audio_bytes(self.storage_path(key))
+
+    async def download_async(self, key: str) -> bytes:
+        from app.services.azure_blob import download_audio_bytes_async
+
+        return await download_audio_bytes_async(self.storage_path(key))
+
+    def exists(self, key: str) -> bool:
+        from app.services.azure_blob import blob_exists
+
+        return blob_exists(self.storage_path(key))
+
+    def delete(self, key: str) -> None:
+        from app.services.azure_blob import delete_audio
+
+        delete_audio(self.storage_path(key))
+
+    def read_url(self, key: str, expiry_seconds: int | None = None) -> str:
+        from app.services.azure_blob import build_blob_read_url
+
+        return build_blob_read_url(self.storage_path(key), expiry_seconds=expiry_seconds)
+
+
+class LocalStorage(StorageBackend):
+    """
+    Files under LOCAL_STORAGE_DIR, for single-node and dev deployments.
+
+    Every write goes to a temp file in the target directory and is renamed
+    into place, so readers never see a partial file. Uploads get a unique
+    key (<prefix>/<uuid>/<name>, as in Azure): they are temporary inputs that
+    each job deletes when done, so two jobs must never share one. Content
+    addressed outputs (TTS cache, catalog) are written with put() under their
+    own keys. Files are served by the signed /media route.
+    """
+
+    scheme = "local"
+
+    def __init__(self, root: str | Path | None = None) -> None:
+        root = Path(root or settings.LOCAL_STORAGE_DIR)
+        self.root = (root if root.is_absolute() else BASE_DIR / root).resolve()
+
+    def path_for(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if path != self.root and self.root not in path.parents:
+            raise ValueError("storage key escapes the storage root")
+        return path
+
+    def _temp_in(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return tempfile.NamedTemporaryFile(dir=path.parent, prefix=".tmp-", delete=False)
+
+    def put(self, key: str, data: bytes, content_type: str) -> str:
+        path = self.path_for(key)
+        with self._temp_in(path) as tmp:
+            tmp.write(data)
+        os.replace(tmp.name, path)
+        logger.info("local storage write done key=%s bytes=%s", key, len(data))
+        return self.storage_path(key)
+
+    def _unique_key(self, filename: str, prefix: str) -> str:
+        return f"{_safe_prefix(prefix)}/{uuid.uuid4().hex}/{_safe_name(filename)}"
+
+    def upload(self, data: bytes, content_type: str, filename: str, prefix: str) -> str:
+        return self.put(self._unique_key(filename, prefix), data, content_type)
+
+    async def upload_stream(self, chunks, content_type: str, filename: str, prefix: str) -> str:
+        # Stream to a staging file, then rename it into place.
+        staging_dir = self.root / _safe_prefix(prefix)
+        staging = self._temp_in(staging_dir / "_")
+        total = 0
+        try:
+            async for chunk in chunks:
+                total += len(chunk)
+                await asyncio.to_thread(staging.write, chunk)
+            staging.close()
+            key = self._unique_key(filename, prefix)
+            path = self.path_for(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(staging.name, path)
+        except BaseException:
+            staging.close()
+            Path(staging.name).unlink(missing_ok=True)
+            raise
+        logger.info("local storage streamed write done key=%s bytes=%s", key, total)
+        return self.storage_path(key)
+
+    def download(self, key: str) -> bytes:
+        return self.path_for(key).read_bytes()
+
+    def exists(self, key: str) -> bool:
+        return self.path_for(key).is_file()
+
+    def delete(self, key: str) -> None:
+        try:
+            self.path_for(key).unlink(missing_ok=True)
+        except Exception as exc:
+            logger.warning("local storage delete skipped key=%s error=%s", key, exc)
+
+    def read_url(self, key: str, expiry_seconds: int | None = None) -> str:
+        ttl = max(60, int(expiry_seconds or settings.AZURE_BLOB_URL_TTL_SECONDS))
+        expires = int(time.time()) + ttl
+        base = (settings.PUBLIC_BASE_URL or "").rstrip("/")
+        return f"{base}/media/{quote(key)}?exp={expires}&sig={sign_media_key(key, expires)}"
+
+
+def _signing_key() -> bytes:
+    secret = settings.STORAGE_SIGNING_KEY
+    if not secret:
+        raise RuntimeError("Missing STORAGE_SIGNING_KEY (required to sign local media URLs)")
+    return secret.encode("utf-8")
+
+
+def sign_media_key(key: str, expires: int) -> str:
+    return hmac.new(_signing_key(), f"{key}\n{int(expires)}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def verify_media_signature(key: str, expires: int, signature: str) -> bool:
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(sign_media_key(key, expires), signature or "")
+
+
+def media_type_for(key: str) -> str:
+    return mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+
+_BACKENDS: dict[str, type[StorageBackend]] = {"azure": AzureStorage, "local": LocalStorage}
+_instances: dict[str, StorageBackend] = {}
+_instances_lock = threading.Lock()
+
+
+def get_backend(scheme: str) -> StorageBackend:
+    backend = _instances.get(scheme)
+    if backend is None:
+        with _instances_lock:
+            backend = _instances.get(scheme)
+            if backend is None:
+                backend = _BACKENDS[scheme]()
+                _instances[scheme] = backend
+    return backend
+
+
+def default_backend() -> StorageBackend:
+    """Where new objects are written (STORAGE_BACKEND)."""
+    return get_backend((settings.STORAGE_BACKEND or "azure").strip().lower())
+
+
+def local_backend() -> LocalStorage:
+    return get_backend("local")  # type: ignore[return-value]
+
+
+# --- storage-path API used by the services ---
+
+
+def put_object(key: str, data: bytes, content_type: str) -> str:
+    return default_backend().put(key, data, content_type)
+
+
+def upload_bytes(data: bytes, content_type: str, filename: str, *, prefix: str = "voices") -> str:
+    return default_backend().upload(data, content_type, filename, prefix)
+
+
+async def upload_stream(chunks, content_type: str, filename: str, *, prefix: str = "voices") -> str:
+    return await default_backend().upload_stream(chunks, content_type, filename, prefix)
+
+
+def download_bytes(storage_path: str) -> bytes:
+    scheme, key = _split(storage_path)
+    return get_backend(scheme).download(key)
+
+
+async def download_bytes_async(storage_path: str) -> bytes:
+    scheme, key = _split(storage_path)
+    return await get_backend(scheme).download_async(key)
+
+
+def object_exists(storage_path: str) -> bool:
+    scheme, key = _split(storage_path)
+    return get_backend(scheme).exists(key)
+
+
+def delete_object(storage_path: str | None) -> None:
+    """Best-effort cleanup for temporary uploads."""
+    if not storage_path:
+        return
+    try:
+        scheme, key = _split(storage_path)
+        get_backend(scheme).delete(key)
+    except Exception as exc:
+        logger.warning("storage delete skipped path=%s error=%s", storage_path, exc)
+
+
+def build_read_url(storage_path: str, expiry_seconds: int | None = None) -> str:
+    scheme, key = _split(storage_path)
+    return get_backend(scheme).read_url(key, expiry_seconds=expiry_seconds)
+
+
+def default_storage_path(key: str) -> str:
+    """Storage path `key` would have if written now."""
+    return default_backend().storage_path(key)
+
+
+instrument_module_functions(globals(), include_private=False)
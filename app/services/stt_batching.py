@@ -0,0 +1,185 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from app.core import metrics
+from app.core.config import settings
+from app.services.language_service import normalize_language
+
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+# Whisper's encoder sees a fixed 30 s window; longer clips take the normal path.
+_WINDOW_SAMPLES = 30 * SAMPLE_RATE
+
+
+def _speech_present(audio) -> bool:
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    return bool(get_speech_timestamps(audio, VadOptions()))
+
+
+def transcribe_batch(audios: list, language_hints: list[str | None] | None = None) -> list[tuple[str, str | None]]:
+    """
+    Batched transcription of several <=30 s clips. Clips are grouped by their
+    decode plan (model and beam size); each group gets one encoder pass, one
+    batched language detection for clips without a hint, and one batched
+    decode. Results come back per clip in input order.
+    """
+    from app.services.stt_service import plan_decode
+
+    hints = language_hints or [None] * len(audios)
+    results: list[tuple[str, str | None]] = [("", None)] * len(audios)
+    groups: dict[tuple[str, int], list[int]] = {}
+    plans = []
+    for i, audio in enumerate(audios):
+        plan = plan_decode(len(audio) / SAMPLE_RATE, hints[i])
+        plans.append(plan)
+        groups.setdefault((plan.model_size, plan.beam_size), []).append(i)
+
+    for (model_size, beam_size), indexes in groups.items():
+        started = time.perf_counter()
+        voiced = [i for i in indexes if _speech_present(audios[i])]
+        if voiced:
+            texts = _decode_group(model_size, beam_size, [audios[i] for i in voiced], [plans[i].language for i in voiced])
+            for i, result in zip(voiced, texts):
+                results[i] = result
+        # Per-clip share of the group's time, so route latency stays comparable with the single path.
+        share_ms = (time.perf_counter() - started) * 1000.0 / len(indexes)
+        from app.services.stt_service import observe_route
+
+        for i in indexes:
+            observe_route(plans[i], share_ms, len(audios[i]) / SAMPLE_RATE)
+    return results
+
+
+def _decode_group(model_size: str, beam_size: int, audios: list, languages: list[str | None]) -> list[tuple[str, str | None]]:
+    from faster_whisper.audio import pad_or_trim
+    from faster_whisper.tokenizer import Tokenizer
+    import numpy as np
+
+    from app.services.stt_service import get_whisper_model
+
+    model = get_whisper_model(size=model_size)
+    features = np.stack([pad_or_trim(model.feature_extractor(audio)) for audio in audios])
+    encoder_output = model.encode(features)
+
+    languages = list(languages)
+    if not model.model.is_multilingual:
+        languages = ["en"] * len(audios)
+    elif any(lang is None for lang in languages):
+        detected = model.model.detect_language(encoder_output)
+        languages = [lang or detected[i][0][0][2:-2] for i, lang in enumerate(languages)]
+
+    prompts = []
+    tokenizers = []
+    for language in languages:
+        tokenizer = Tokenizer(model.hf_tokenizer, model.model.is_multilingual, task="transcribe", language=language)
+        tokenizers.append(tokenizer)
+        prompts.append(list(tokenizer.sot_sequence) + [tokenizer.no_timestamps])
+
+    generated = model.model.generate(
+        encoder_output,
+        prompts,
+        beam_size=beam_size,
+        max_length=448,
+        suppress_blank=True,
+        suppress_tokens=[-1],
+    )
+    return [
+        (tokenizers[i].decode(generated[i].sequences_ids[0]).strip(), normalize_language(languages[i]))
+        for i in range(len(audios))
+    ]
+
+
+class SttBatcher:
+    """
+    Collects clips submitted by concurrent jobs and transcribes them together.
+
+    A clip arriving while the model is idle and no other clip arrived in the
+    last window is run immediately on the normal path, so idle latency is
+    unchanged. Under a burst, the collector waits up to the window for more
+    clips (max_size per batch) and clips queue naturally while a batch runs.
+    """
+
+    def __init__(self, max_size: int | None = None, window_ms: float | None = None) -> None:
+        self.max_size = max(1, int(max_size or settings.STT_BATCH_MAX_SIZE))
+        self.window_s = float(window_ms if window_ms is not None else settings.STT_BATCH_WINDOW_MS) / 1000.0
+        self._queue: "queue.Queue[tuple[object, str | None, Future, bool]]" = queue.Queue()
+        self._last_arrival = 0.0
+        self._thread = threading.Thread(target=self._loop, name="medi-stt-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, audio, language_hint: str | None = None) -> Future:
+        future: Future = Future()
+        now = time.monotonic()
+        burst = now - self._last_arrival < self.window_s
+        self._last_arrival = now
+        self._queue.put((audio, language_hint, future, burst))
+        return future
+
+    def transcribe(self, audio, language_hint: str | None = None) -> tuple[str, str | None]:
+        if len(audio) > _WINDOW_SAMPLES:
+            from app.services.stt_service import transcribe_array
+
+            return transcribe_array(audio, language_hint=language_hint)
+        return self.submit(audio, language_hint=language_hint).result()
+
+    def _collect(self) -> list[tuple[object, str | None, Future, bool]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window_s if batch[0][3] else None
+        while len(batch) < self.max_size:
+            try:
+                if deadline is None:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self) -> None:
+        from app.services.stt_service import transcribe_array
+
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            audios = [item[0] for item in batch]
+            hints = [item[1] for item in batch]
+            try:
+                if len(batch) == 1:
+                    results = [transcribe_array(audios[0], language_hint=hints[0])]
+                else:
+                    try:
+                        results = transcribe_batch(audios, hints)
+                    except Exception:
+                        logger.exception("stt batch failed size=%s; transcribing individually", len(batch))
+                        results = [transcribe_array(a, language_hint=h) for a, h in zip(audios, hints)]
+                for (_audio, _hint, future, _burst), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as exc:
+                for _audio, _hint, future, _burst in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+            metrics.observe("stt_batch.size", len(batch))
+            metrics.observe("stt_batch.run_ms", (time.perf_counter() - started) * 1000.0)
+
+
+_batcher: SttBatcher | None = None
+_batcher_lock = threading.Lock()
+
+
+def get_stt_batcher() -> SttBatcher:
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = SttBatcher()
+                logger.info("stt batcher started max_size=%s window_ms=%s", _batcher.max_size, _batcher.window_s * 1000)
+    return _batcher
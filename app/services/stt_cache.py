@@ -0,0 +1,155 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.observability import instrument_module_functions
+from app.db.models import TranscriptCache
+from app.services.language_service import normalize_language
+
+
+logger = logging.getLogger(__name__)
+
+# Bump when transcription changes in a way the settings below do not capture.
+STT_CACHE_VERSION = "1"
+
+_lock = threading.Lock()
+_known: "OrderedDict[str, tuple[str, str | None, int]]" = OrderedDict()  # key -> (text, language, elapsed_ms)
+
+
+def _config_fingerprint() -> str:
+    """Every setting that changes the transcript for the same bytes."""
+    return "|".join(
+        str(v)
+        for v in (
+            STT_CACHE_VERSION,
+            settings.WHISPER_MODEL_SIZE,
+            settings.WHISPER_SHORT_MODEL_SIZE,
+            settings.STT_SHORT_CLIP_SECONDS,
+            settings.STT_BEAM_SIZE,
+            settings.STT_SHORT_BEAM_SIZE,
+            settings.MAX_AUDIO_SECONDS,
+        )
+    )
+
+
+def transcript_cache_key(audio_bytes: bytes, language_hint: str | None = None) -> str:
+    """sha256 over the decode config, the language hint (it changes decoding) and the audio bytes."""
+    digest = hashlib.sha256()
+    digest.update(_config_fingerprint().encode("utf-8"))
+    digest.update(b"\0")
+    digest.update((normalize_language(language_hint) or "").encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(audio_bytes)
+    return digest.hexdigest()
+
+
+def _remember(key: str, value: tuple[str, str | None, int]) -> None:
+    capacity = max(0, int(settings.STT_CACHE_LRU_SIZE))
+    if capacity == 0:
+        return
+    with _lock:
+        _known[key] = value
+        _known.move_to_end(key)
+        while len(_known) > capacity:
+            _known.popitem(last=False)
+
+
+def _record_hit(kind: str, elapsed_ms: int) -> None:
+    metrics.incr(f"stt_cache.hit_{kind}")
+    metrics.incr("stt_cache.saved_ms", int(elapsed_ms))
+    metrics.observe("stt_cache.saved_ms_per_hit", float(elapsed_ms))
+
+
+def lookup_transcript(db: Session, key: str) -> tuple[str, str | None] | None:
+    """(transcript, language) for previously transcribed audio, or None. Memory first, then Postgres."""
+    if not settings.STT_CACHE_ENABLED:
+        return None
+
+    with _lock:
+        cached = _known.get(key)
+        if cached is not None:
+            _known.move_to_end(key)
+    if cached is not None:
+        _record_hit("memory", cached[2])
+        return cached[0], cached[1]
+
+    try:
+        row = db.execute(
+            update(TranscriptCache)
+            .where(TranscriptCache.key == key)
+            .values(hits=TranscriptCache.hits + 1, last_hit_at=func.now())
+            .returning(TranscriptCache.transcript, TranscriptCache.language, TranscriptCache.elapsed_ms)
+            .execution_options(synchronize_session=False)
+        ).first()
+        db.commit()
+    except Exception as exc:
+        logger.warning("stt cache lookup failed key=%s error=%s", key[:12], exc)
+        db.rollback()
+        row = None
+    if row is None:
+        metrics.incr("stt_cache.miss")
+        return None
+
+    transcript, language, elapsed_ms = row
+    _record_hit("db", elapsed_ms or 0)
+    _remember(key, (transcript, language, int(elapsed_ms or 0)))
+    return transcript, language
+
+
+def store_transcript(db: Session, key: str, transcript: str, language: str | None, elapsed_ms: float) -> None:
+    if not settings.STT_CACHE_ENABLED:
+        return
+    value = (transcript or "", language, int(elapsed_ms))
+    _remember(key, value)
+    try:
+        db.execute(
+            pg_insert(TranscriptCache)
+            .values(key=key, transcript=value[0], language=language, elapsed_ms=value[2])
+            .on_conflict_do_nothing(index_elements=[TranscriptCache.key])
+        )
+        db.commit()
+    except Exception as exc:
+        logger.warning("stt cache store failed key=%s error=%s", key[:12], exc)
+        db.rollback()
+
+
+def purge_transcript_cache(db: Session, older_than_days: int | None = None) -> int:
+    """Drop entries not hit within the retention window."""
+    days = int(older_than_days if older_than_days is not None else settings.STT_CACHE_RETENTION_DAYS)
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    result = db.execute(
+        delete(TranscriptCache).where(func.coalesce(TranscriptCache.last_hit_at, TranscriptCache.created_at) < cutoff)
+    )
+    db.commit()
+    return int(result.rowcount or 0)
+
+
+def clear_local_cache() -> None:
+    with _lock:
+        _known.clear()
+
+
+def cache_stats(db: Session) -> dict:
+    """Table size plus this process's hit rate and time saved (from the metrics counters)."""
+    rows, hits = db.execute(select(func.count(), func.coalesce(func.sum(TranscriptCache.hits), 0))).one()
+    counters = metrics.snapshot()["counters"]
+    hit = counters.get("stt_cache.hit_memory", 0.0) + counters.get("stt_cache.hit_db", 0.0)
+    lookups = hit + counters.get("stt_cache.miss", 0.0)
+    return {
+        "entries": int(rows),
+        "hits_total": int(hits),
+        "memory_entries": len(_known),
+        "hit_rate": round(hit / lookups, 4) if lookups else None,
+        "saved_ms": counters.get("stt_cache.saved_ms", 0.0),
+    }
+
+
+instrument_module_functions(globals(), include_private=False)
@@ -0,0 +1,176 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from app.core import metrics
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class SttOverloaded(RuntimeError):
+    """Raised when the pool's pending queue stays full past the submit timeout."""
+
+
+def _pool_init(cpu_threads: int, num_workers: int) -> None:
+    # Keep OpenMP/BLAS inside the thread share this process was given.
+    if cpu_threads > 0:
+        os.environ["OMP_NUM_THREADS"] = str(cpu_threads)
+    from app.services.stt_service import get_whisper_model
+
+    get_whisper_model(cpu_threads=cpu_threads, num_workers=num_workers)
+    if settings.WHISPER_SHORT_MODEL_SIZE:
+        get_whisper_model(cpu_threads=cpu_threads, num_workers=num_workers, size=settings.WHISPER_SHORT_MODEL_SIZE)
+
+
+def _pool_transcribe(
+    audio_bytes: bytes, language_hint: str | None = None
+) -> tuple[str, str | None, list[tuple[str, float]]]:
+    from app.services.stt_service import collecting_route_samples, transcribe_local
+
+    # Metrics recorded here would stay in this child; return them to the parent instead.
+    with collecting_route_samples() as samples:
+        text, language = transcribe_local(audio_bytes, language_hint=language_hint)
+    return text, language, samples
+
+
+def _pool_ping() -> int:
+    return os.getpid()
+
+
+class SttPool:
+    """
+    Fixed set of processes, each holding one Whisper model, so CTranslate2
+    threads never exceed processes x cpu_threads. Submissions beyond
+    max_pending block (backpressure) and fail with SttOverloaded on timeout.
+    """
+
+    def __init__(
+        self,
+        processes: int,
+        cpu_threads: int = 0,
+        num_workers: int = 1,
+        max_pending: int | None = None,
+        submit_timeout: float | None = None,
+    ) -> None:
+        self.processes = max(1, int(processes))
+        self.cpu_threads = int(cpu_threads)
+        self.num_workers = max(1, int(num_workers))
+        self.max_pending = max(self.processes, int(max_pending or settings.STT_POOL_MAX_PENDING))
+        self.submit_timeout = float(
+            submit_timeout if submit_timeout is not None else settings.STT_POOL_SUBMIT_TIMEOUT_SECONDS
+        )
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor_lock = threading.Lock()
+        self._executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn: children must not inherit the parent's threads, DB pool or locks.
+        return ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_pool_init,
+            initargs=(self.cpu_threads, self.num_workers),
+        )
+
+    def _replace_broken(self, broken: ProcessPoolExecutor) -> None:
+        """
+        A child died (OOM kill while loading Whisper, segfault), which breaks
+        the whole executor for good. Swap in a fresh one, once per breakage.
+        """
+        with self._executor_lock:
+            if self._executor is not broken:
+                return
+            self._executor = self._new_executor()
+        metrics.incr("stt_pool.restarted")
+        logger.warning("stt pool broken; started a new one processes=%s", self.processes)
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _submit_to_executor(self, audio_bytes: bytes, language_hint: str | None) -> tuple[ProcessPoolExecutor, Future]:
+        executor = self._executor
+        try:
+            return executor, executor.submit(_pool_transcribe, audio_bytes, language_hint)
+        except BrokenProcessPool:
+            self._replace_broken(executor)
+            executor = self._executor
+            return executor, executor.submit(_pool_transcribe, audio_bytes, language_hint)
+
+    def warm_up(self) -> set[int]:
+        """Start every process and load its model; returns the worker pids seen."""
+        futures = [self._executor.submit(_pool_ping) for _ in range(self.processes * 2)]
+        return {f.result() for f in futures}
+
+    def submit(self, audio_bytes: bytes, language_hint: str | None = None) -> Future:
+        return self._submit(audio_bytes, language_hint)[1]
+
+    def _submit(self, audio_bytes: bytes, language_hint: str | None) -> tuple[ProcessPoolExecutor, Future]:
+        waited = time.perf_counter()
+        if not self._slots.acquire(timeout=self.submit_timeout):
+            metrics.incr("stt_pool.rejected")
+            raise SttOverloaded(f"STT pool busy: {self.max_pending} jobs pending")
+        metrics.observe("stt_pool.queue_wait_ms", (time.perf_counter() - waited) * 1000.0)
+        try:
+            executor, future = self._submit_to_executor(audio_bytes, language_hint)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _f: self._slots.release())
+        return executor, future
+
+    def transcribe(self, audio_bytes: bytes, language_hint: str | None = None) -> tuple[str, str | None]:
+        started = time.perf_counter()
+        try:
+            executor, future = self._submit(audio_bytes, language_hint)
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                # The pool broke while this clip was queued or running; retry it once on a fresh pool.
+                self._replace_broken(executor)
+                result = self._submit(audio_bytes, language_hint)[1].result()
+            text, language, samples = result
+            for name, value in samples:
+                metrics.observe(name, value)
+            return text, language
+        finally:
+            metrics.observe("stt_pool.transcribe_ms", (time.perf_counter() - started) * 1000.0)
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._executor_lock:
+            executor = self._executor
+        executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_pool: SttPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_stt_pool() -> SttPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = SttPool(
+                    processes=settings.STT_POOL_PROCESSES,
+                    cpu_threads=settings.STT_CPU_THREADS,
+                    num_workers=settings.STT_NUM_WORKERS,
+                )
+                logger.info(
+                    "stt pool started processes=%s cpu_threads=%s max_pending=%s",
+                    _pool.processes,
+                    _pool.cpu_threads,
+                    _pool.max_pending,
+                )
+    return _pool
+
+
+def shutdown_stt_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
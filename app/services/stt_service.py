@@ -1,96 +1,241 @@
 import logging
-import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator
 
 import httpx
-import numpy as np
-from faster_whisper import WhisperModel
 
+from app.core import metrics, stage_timer
 from app.core.observability import trace_call
 from app.core.config import settings
-from app.services.language_service import normalize_language
+from app.services.audio_codec import decode_to_pcm_f32
+from app.services.audio_sniff import SNIFF_BYTES, AudioRejected, check_audio_head, max_audio_bytes
+from app.services.language_service import SUPPORTED_LANGUAGES, normalize_language
 
 # Required env/settings:
 # settings.WHISPER_MODEL_SIZE (default "small")
 # settings.WHISPER_DEVICE (default "cpu")
 # settings.WHISPER_COMPUTE_TYPE (default "int8")
-_model = WhisperModel(
-    getattr(settings, "WHISPER_MODEL_SIZE", "small"),
-    device=getattr(settings, "WHISPER_DEVICE", "cpu"),
-    compute_type=getattr(settings, "WHISPER_COMPUTE_TYPE", "int8"),
-)
-
-MAX_AUDIO_MB = int(getattr(settings, "MAX_AUDIO_MB", 8))
-MAX_AUDIO_SECONDS = int(getattr(settings, "MAX_AUDIO_SECONDS", 180))
+# Models (and numpy/faster_whisper) load on first use or via warm-up,
+# so API workers that never transcribe never pay for them.
+_models: dict[str, object] = {}
+_model_lock = threading.Lock()
+
+MAX_AUDIO_MB = int(settings.MAX_AUDIO_MB)
+MAX_AUDIO_SECONDS = int(settings.MAX_AUDIO_SECONDS)
+SAMPLE_RATE = 16000
+# faster-whisper's default temperature fallback ladder.
+_FALLBACK_TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
 logger = logging.getLogger(__name__)
 
+# Set inside STT pool processes: route samples go back to the parent with the
+# result, since /admin/metrics only reads the parent's registry.
+_route_samples: ContextVar["list[tuple[str, float]] | None"] = ContextVar("medi_stt_route_samples", default=None)
+
+
+@dataclass
+class DecodePlan:
+    route: str  # "short" | "default"
+    model_size: str
+    language: str | None  # None = let Whisper detect
+    beam_size: int
+    temperature: tuple[float, ...]
+
+
+def plan_decode(duration_s: float, language_hint: str | None = None) -> DecodePlan:
+    """
+    Short clips ("yes", "thanks") decode greedily without temperature fallback,
+    optionally on a smaller model; longer ones keep beam search and fallback.
+    A supported language hint skips Whisper's language detection.
+    """
+    hint = normalize_language(language_hint)
+    language = hint if hint in SUPPORTED_LANGUAGES else None
+    if duration_s <= float(settings.STT_SHORT_CLIP_SECONDS):
+        return DecodePlan(
+            route="short",
+            model_size=settings.WHISPER_SHORT_MODEL_SIZE or settings.WHISPER_MODEL_SIZE,
+            language=language,
+            beam_size=max(1, int(settings.STT_SHORT_BEAM_SIZE)),
+            temperature=(0.0,),
+        )
+    return DecodePlan(
+        route="default",
+        model_size=settings.WHISPER_MODEL_SIZE,
+        language=language,
+        beam_size=max(1, int(settings.STT_BEAM_SIZE)),
+        temperature=_FALLBACK_TEMPERATURES,
+    )
+
+
+def get_whisper_model(cpu_threads: int | None = None, num_workers: int | None = None, size: str | None = None):
+    """
+    Process-wide model per size. cpu_threads/num_workers only apply when a model
+    is first loaded (STT pool processes pass their share of the cores); 0 keeps
+    CTranslate2's default.
+    """
+    size = size or settings.WHISPER_MODEL_SIZE
+    model = _models.get(size)
+    if model is None:
+        with _model_lock:
+            model = _models.get(size)
+            if model is None:
+                from faster_whisper import WhisperModel
+
+                threads = int(cpu_threads if cpu_threads is not None else settings.STT_CPU_THREADS)
+                workers = int(num_workers if num_workers is not None else settings.STT_NUM_WORKERS)
+                model = WhisperModel(
+                    size,
+                    device=settings.WHISPER_DEVICE,
+                    compute_type=settings.WHISPER_COMPUTE_TYPE,
+                    cpu_threads=max(0, threads),
+                    num_workers=max(1, workers),
+                )
+                _models[size] = model
+                logger.info(
+                    "stt: whisper model loaded size=%s cpu_threads=%s num_workers=%s",
+                    size,
+                    threads,
+                    workers,
+                )
+    return model
+
 
 @trace_call
-def _ffmpeg_to_pcm_f32(audio_bytes: bytes) -> bytes:
-    cmd = [
-        "ffmpeg",
-        "-hide_banner",
-        "-loglevel",
-        "error",
-        "-i",
-        "pipe:0",
-        "-t",
-        str(MAX_AUDIO_SECONDS),
-        "-ac",
-        "1",
-        "-ar",
-        "16000",
-        "-f",
-        "f32le",
-        "pipe:1",
-    ]
-    logger.info("stt: ffmpeg decode start bytes=%s max_seconds=%s", len(audio_bytes), MAX_AUDIO_SECONDS)
-    proc = subprocess.run(cmd, input=audio_bytes, capture_output=True)
-    if proc.returncode != 0:
-        stderr = proc.stderr.decode("utf-8", errors="ignore")
-        raise RuntimeError(f"ffmpeg failed: {stderr[:2000]}")
-    logger.info("stt: ffmpeg decode completed pcm_bytes=%s", len(proc.stdout))
-    return proc.stdout
+def _decode_to_pcm_f32(audio_bytes: bytes) -> bytes:
+    logger.info("stt: decode start bytes=%s max_seconds=%s", len(audio_bytes), MAX_AUDIO_SECONDS)
+    with stage_timer.stage("stt.decode"):
+        pcm = decode_to_pcm_f32(audio_bytes, sample_rate=SAMPLE_RATE, max_seconds=MAX_AUDIO_SECONDS)
+    stage_timer.set_value("audio_s", len(pcm) / 4.0 / SAMPLE_RATE)
+    logger.info("stt: decode completed pcm_bytes=%s", len(pcm))
+    return pcm
 
 
 @trace_call
-def _transcribe_pcm_f32_with_language(pcm_bytes: bytes) -> tuple[str, str | None]:
+def _transcribe_pcm_f32_with_language(pcm_bytes: bytes, language_hint: str | None = None) -> tuple[str, str | None]:
     if not pcm_bytes:
         return "", None
 
+    import numpy as np
+
     audio = np.frombuffer(pcm_bytes, dtype=np.float32)
-    segments, info = _model.transcribe(
+    if settings.STT_BATCHING:
+        from app.services.stt_batching import get_stt_batcher
+
+        return get_stt_batcher().transcribe(audio, language_hint=language_hint)
+    return transcribe_array(audio, language_hint=language_hint)
+
+
+def transcribe_array(audio, language_hint: str | None = None) -> tuple[str, str | None]:
+    """Transcribe one 16 kHz mono float32 array using the decode plan for its length."""
+    duration_s = len(audio) / SAMPLE_RATE
+    plan = plan_decode(duration_s, language_hint)
+    started = time.perf_counter()
+    segments, info = get_whisper_model(size=plan.model_size).transcribe(
         audio,
+        language=plan.language,
+        beam_size=plan.beam_size,
+        temperature=list(plan.temperature),
         vad_filter=True,
         word_timestamps=False,
     )
     text = " ".join(s.text.strip() for s in segments).strip()
-    lang = normalize_language(getattr(info, "language", None))
+    elapsed_ms = (time.perf_counter() - started) * 1000.0
+    stage_timer.add_stage("stt.whisper", elapsed_ms)
+    observe_route(plan, elapsed_ms, duration_s)
+    lang = plan.language or normalize_language(getattr(info, "language", None))
     return text, lang
 
 
+@contextmanager
+def collecting_route_samples() -> Iterator[list[tuple[str, float]]]:
+    """Collect observe_route samples into a list instead of this process's metrics."""
+    samples: list[tuple[str, float]] = []
+    token = _route_samples.set(samples)
+    try:
+        yield samples
+    finally:
+        _route_samples.reset(token)
+
+
+def observe_route(plan: DecodePlan, elapsed_ms: float, duration_s: float) -> None:
+    route = f"stt.route.{plan.route}.{'hinted' if plan.language else 'detect'}"
+    samples = [(f"{route}.ms", elapsed_ms)]
+    if duration_s > 0:
+        samples.append((f"{route}.rtf", elapsed_ms / 1000.0 / duration_s))
+    sink = _route_samples.get()
+    if sink is not None:
+        sink.extend(samples)
+    else:
+        for name, value in samples:
+            metrics.observe(name, value)
+    logger.info(
+        "stt: transcribed route=%s model=%s beam=%s audio_s=%.1f elapsed_ms=%.0f",
+        route,
+        plan.model_size,
+        plan.beam_size,
+        duration_s,
+        elapsed_ms,
+    )
+
+
 @trace_call
-def transcribe_audio_bytes(audio_bytes: bytes) -> str:
-    text, _lang = transcribe_audio_bytes_with_language(audio_bytes)
+def transcribe_audio_bytes(audio_bytes: bytes, language_hint: str | None = None) -> str:
+    text, _lang = transcribe_audio_bytes_with_language(audio_bytes, language_hint=language_hint)
     return text
 
 
 @trace_call
-def transcribe_audio_bytes_with_language(audio_bytes: bytes) -> tuple[str, str | None]:
+def transcribe_audio_bytes_with_language(
+    audio_bytes: bytes,
+    language_hint: str | None = None,
+) -> tuple[str, str | None]:
     if len(audio_bytes) > MAX_AUDIO_MB * 1024 * 1024:
-        raise ValueError("Audio too large")
+        raise AudioRejected("Audio too large")
+
+    if settings.STT_POOL_PROCESSES > 0:
+        from app.services.stt_pool import get_stt_pool
 
-    pcm = _ffmpeg_to_pcm_f32(audio_bytes)
-    return _transcribe_pcm_f32_with_language(pcm)
+        return get_stt_pool().transcribe(audio_bytes, language_hint=language_hint)
+    return transcribe_local(audio_bytes, language_hint=language_hint)
+
+
+@trace_call
+def transcribe_local(audio_bytes: bytes, language_hint: str | None = None) -> tuple[str, str | None]:
+    """Decode and transcribe in this process (also what each STT pool process runs)."""
+    pcm = _decode_to_pcm_f32(audio_bytes)
+    return _transcribe_pcm_f32_with_language(pcm, language_hint=language_hint)
 
 
 @trace_call
 def download_twilio_media(media_url: str) -> bytes:
+    """
+    Streamed download that stops as soon as the size cap is crossed (or the
+    Content-Length already exceeds it) and checks the container header's
+    duration from the first chunk, before the rest is transferred.
+    """
     logger.info("stt: downloading twilio media")
+    limit = max_audio_bytes()
     with httpx.Client(timeout=60, follow_redirects=True) as client:
-        r = client.get(media_url, auth=(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN))
-        r.raise_for_status()
-        data = r.content
-    if len(data) > MAX_AUDIO_MB * 1024 * 1024:
-        raise ValueError("Audio too large")
+        with client.stream("GET", media_url, auth=(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)) as r:
+            r.raise_for_status()
+            declared = r.headers.get("content-length")
+            total = int(declared) if declared and declared.isdigit() else None
+            if total is not None and total > limit:
+                raise AudioRejected("Audio too large")
+
+            data = bytearray()
+            checked = False
+            for chunk in r.iter_bytes(chunk_size=int(settings.AUDIO_STREAM_CHUNK_BYTES)):
+                data += chunk
+                if len(data) > limit:
+                    raise AudioRejected("Audio too large")
+                if not checked and len(data) >= SNIFF_BYTES:
+                    check_audio_head(bytes(data[:SNIFF_BYTES]), total)
+                    checked = True
+            if not checked:
+                check_audio_head(bytes(data), len(data))
     logger.info("stt: downloaded twilio media bytes=%s", len(data))
-    return data
+    return bytes(data)
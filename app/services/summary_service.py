@@ -1,22 +1,32 @@
-from datetime import datetime
-from sqlalchemy import func
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func, or_, select, update
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.db.models import Conversation, Message
+from app.services.llm.anthropic_client import get_anthropic_client
 
-SUMMARY_EVERY_N_USER_MESSAGES = 6
 SUMMARY_MAX_CHARS = 1200
 RECENT_MESSAGE_LIMIT = 20
 
+# Rough chars-per-token ratio used to enforce the budget without a tokenizer.
+_CHARS_PER_TOKEN = 4
 
-def _get_new_user_message_count(db: Session, conversation_id: str, cutoff: datetime | None) -> int:
-    q = db.query(func.count(Message.id)).filter(
-        Message.conversation_id == conversation_id,
-        Message.role == "user",
+logger = logging.getLogger(__name__)
+
+_summary_due = threading.Event()
+
+
+def _get_user_msgs_since_summary(db: Session, conversation_id: str) -> int:
+    value = (
+        db.query(Conversation.user_msgs_since_summary)
+        .filter(Conversation.id == conversation_id)
+        .scalar()
     )
-    if cutoff:
-        q = q.filter(Message.created_at > cutoff)
-    return int(q.scalar() or 0)
+    return int(value or 0)
 
 
 def _get_messages_since(db: Session, conversation_id: str, cutoff: datetime | None) -> list[Message]:
@@ -47,22 +57,199 @@ def build_summary(existing_summary: str | None, new_messages: list[Message]) ->
     return combined
 
 
-def maybe_update_summary(db: Session, conversation_id: str) -> bool:
+def _clip_to_budget(summary: str, max_tokens: int) -> str:
+    max_chars = max(1, max_tokens) * _CHARS_PER_TOKEN
+    summary = summary.strip()
+    if len(summary) <= max_chars:
+        return summary
+    clipped = summary[:max_chars]
+    # Prefer ending on a sentence boundary over a cut-off word.
+    end = max(clipped.rfind(". "), clipped.rfind("\n"))
+    if end > max_chars // 2:
+        clipped = clipped[: end + 1]
+    return clipped.rstrip()
+
+
+def build_summary_llm(existing_summary: str | None, new_messages: list[Message]) -> str:
+    """
+    Fold new messages into the running summary with Claude.
+    Only the messages since the last summary are sent, never the full history.
+    """
+    existing = (existing_summary or "").strip()
+    lines = [
+        f"{m.role}: {(m.content or '').strip()}"
+        for m in new_messages
+        if m.role in ("user", "assistant") and (m.content or "").strip()
+    ]
+    if not lines:
+        return existing
+
+    max_tokens = int(settings.SUMMARY_MAX_TOKENS)
+    system_prompt = (
+        "You maintain a running memory of a meditation and wellness chat between a user and MEDI.\n"
+        "Merge the new messages into the existing summary.\n"
+        "- Keep what matters for future replies: the user's concerns, goals, preferences, "
+        "exercises tried and how they went, and the language they use.\n"
+        "- Drop greetings, menu choices and anything already covered.\n"
+        "- Third person, plain sentences, no lists, no citations.\n"
+        f"- Stay under {max_tokens} tokens; compress older details first.\n"
+        "Return only the updated summary."
+    )
+    user_prompt = (
+        "=== Existing summary ===\n"
+        f"{existing or '(none)'}\n\n"
+        "=== New messages ===\n"
+        + "\n".join(lines)
+    )
+
+    response = get_anthropic_client().messages.create(
+        model=settings.SUMMARY_MODEL or settings.ANTHROPIC_MODEL or "claude-sonnet-4-20250514",
+        max_tokens=max_tokens,
+        temperature=0.2,
+        system=system_prompt,
+        messages=[{"role": "user", "content": user_prompt}],
+    )
+    text = "".join(block.text for block in response.content if block.type == "text").strip()
+    if not text:
+        return existing
+    return _clip_to_budget(text, max_tokens)
+
+
+def summarize_conversation(db: Session, conversation_id: str) -> bool:
+    """
+    Fold messages newer than summary_updated_at into the summary and advance
+    the cutoff to the newest message consumed.
+
+    The write is conditional on the cutoff not having moved, so concurrent
+    summarizers (one per API worker) cannot clobber each other's result.
+    """
     convo = db.query(Conversation).filter(Conversation.id == conversation_id).first()
     if not convo:
         return False
 
     cutoff = convo.summary_updated_at
-    new_user_count = _get_new_user_message_count(db, conversation_id, cutoff)
-    if new_user_count < SUMMARY_EVERY_N_USER_MESSAGES:
+    existing = convo.summary
+    new_messages = _get_messages_since(db, conversation_id, cutoff)
+    if not new_messages:
+        # Counter drifted (e.g. messages archived); clear it so it stops looking due.
+        convo.user_msgs_since_summary = 0
+        db.commit()
         return False
 
-    new_messages = _get_messages_since(db, conversation_id, cutoff)
-    convo.summary = build_summary(convo.summary, new_messages)
-    convo.summary_updated_at = datetime.utcnow()
+    use_llm = bool(settings.USE_LLM and settings.ANTHROPIC_API_KEY)
+    summary = None
+    if use_llm:
+        try:
+            summary = build_summary_llm(existing, new_messages)
+        except Exception:
+            logger.exception("llm summary failed conversation_id=%s; using placeholder", conversation_id)
+    if summary is None:
+        summary = build_summary(existing, new_messages)
+
+    consumed_user = sum(1 for m in new_messages if m.role == "user")
+    new_cutoff = max(m.created_at for m in new_messages)
+
+    cond = Conversation.summary_updated_at.is_(None) if cutoff is None else Conversation.summary_updated_at == cutoff
+    result = db.execute(
+        update(Conversation)
+        .where(Conversation.id == conversation_id, cond)
+        .values(
+            summary=summary,
+            summary_updated_at=new_cutoff,
+            user_msgs_since_summary=func.greatest(Conversation.user_msgs_since_summary - consumed_user, 0),
+            summary_claimed_until=None,
+        )
+        .execution_options(synchronize_session=False)
+    )
     db.commit()
-    db.refresh(convo)
-    return True
+    updated = bool(result.rowcount)
+    logger.info(
+        "summary updated conversation_id=%s messages=%s chars=%s llm=%s applied=%s",
+        conversation_id,
+        len(new_messages),
+        len(summary or ""),
+        use_llm,
+        updated,
+    )
+    return updated
+
+
+def claim_due_conversation_ids(db: Session, limit: int) -> list[str]:
+    """
+    Lease up to `limit` due conversations to the caller for SUMMARY_CLAIM_SECONDS.
+    Every API worker runs a summary loop; SKIP LOCKED plus the lease keeps them
+    on disjoint conversations, so each one is sent to the LLM once.
+    """
+    if limit <= 0:
+        return []
+    picked = (
+        select(Conversation.id)
+        .where(
+            Conversation.user_msgs_since_summary >= int(settings.SUMMARY_EVERY_N_USER_MESSAGES),
+            or_(
+                Conversation.summary_claimed_until.is_(None),
+                Conversation.summary_claimed_until < func.now(),
+            ),
+        )
+        .order_by(Conversation.user_msgs_since_summary.desc())
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .cte("picked")
+    )
+    rows = db.execute(
+        update(Conversation)
+        .where(Conversation.id.in_(select(picked.c.id)))
+        .values(summary_claimed_until=func.now() + timedelta(seconds=int(settings.SUMMARY_CLAIM_SECONDS)))
+        .returning(Conversation.id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    return [r[0] for r in rows]
+
+
+def release_summary_claim(db: Session, conversation_id: str) -> None:
+    """Drop the lease so a failed or skipped conversation can be picked up again."""
+    db.execute(
+        update(Conversation)
+        .where(Conversation.id == conversation_id, Conversation.summary_claimed_until.isnot(None))
+        .values(summary_claimed_until=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def wake_summary_worker() -> None:
+    _summary_due.set()
+
+
+def wait_for_due_summaries(timeout: float) -> bool:
+    """Block the summary worker until a conversation crosses the threshold or timeout."""
+    fired = _summary_due.wait(timeout)
+    _summary_due.clear()
+    return fired
+
+
+def maybe_update_summary(db: Session, conversation_id: str, user_msgs_since_summary: int | None = None) -> bool:
+    """
+    Pass the counter returned by chat_repo.save_message to skip the lookup;
+    otherwise it is read from the conversation row (PK lookup, no COUNT).
+
+    With SUMMARY_BACKGROUND enabled this only wakes the summary worker and
+    returns False; the reply path never waits on summarization.
+    """
+    if user_msgs_since_summary is None:
+        user_msgs_since_summary = _get_user_msgs_since_summary(db, conversation_id)
+    if user_msgs_since_summary < int(settings.SUMMARY_EVERY_N_USER_MESSAGES):
+        return False
+
+    if settings.SUMMARY_BACKGROUND:
+        wake_summary_worker()
+        return False
+
+    started = time.perf_counter()
+    updated = summarize_conversation(db, conversation_id)
+    logger.info("inline summary conversation_id=%s elapsed_ms=%.1f", conversation_id, (time.perf_counter() - started) * 1000.0)
+    return updated
 
 
 def get_summary_and_recent_messages(db: Session, conversation_id: str, last_n: int = 12) -> tuple[str, list[Message]]:
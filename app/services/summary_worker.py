@@ -0,0 +1,99 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.summary_service import (
+    claim_due_conversation_ids,
+    release_summary_claim,
+    summarize_conversation,
+    wait_for_due_summaries,
+    wake_summary_worker,
+)
+
+
+logger = logging.getLogger(__name__)
+
+_thread: threading.Thread | None = None
+_stop = threading.Event()
+
+
+def _summarize_one(conversation_id: str) -> bool:
+    db = SessionLocal()
+    try:
+        return summarize_conversation(db, conversation_id)
+    except Exception:
+        logger.exception("summary worker failed conversation_id=%s", conversation_id)
+        db.rollback()
+        return False
+    finally:
+        try:
+            release_summary_claim(db, conversation_id)
+        except Exception:
+            # The lease expires on its own after SUMMARY_CLAIM_SECONDS.
+            logger.exception("summary claim release failed conversation_id=%s", conversation_id)
+            db.rollback()
+        db.close()
+
+
+def run_summary_batch(pool: ThreadPoolExecutor | None = None) -> int:
+    """
+    Summarize one batch of due conversations. Returns how many were updated.
+    """
+    db = SessionLocal()
+    try:
+        ids = claim_due_conversation_ids(db, limit=int(settings.SUMMARY_BATCH_SIZE))
+    finally:
+        db.close()
+
+    if not ids:
+        return 0
+
+    if pool is None:
+        results = [_summarize_one(cid) for cid in ids]
+    else:
+        results = list(pool.map(_summarize_one, ids))
+
+    updated = sum(1 for r in results if r)
+    logger.info("summary batch done due=%s updated=%s", len(ids), updated)
+    return updated
+
+
+def _loop() -> None:
+    interval = float(settings.SUMMARY_WORKER_INTERVAL_SECONDS)
+    with ThreadPoolExecutor(
+        max_workers=max(1, int(settings.SUMMARY_WORKER_CONCURRENCY)),
+        thread_name_prefix="medi-summary",
+    ) as pool:
+        while not _stop.is_set():
+            try:
+                # Drain full batches back to back; go idle once a batch comes back short.
+                while not _stop.is_set() and run_summary_batch(pool) >= int(settings.SUMMARY_BATCH_SIZE):
+                    pass
+            except Exception:
+                logger.exception("summary worker batch failed")
+            wait_for_due_summaries(interval)
+
+
+def start_summary_worker() -> None:
+    global _thread
+    if not settings.SUMMARY_BACKGROUND:
+        return
+    if _thread is not None and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_loop, name="medi-summary-worker", daemon=True)
+    _thread.start()
+    logger.info("summary worker started interval=%ss", settings.SUMMARY_WORKER_INTERVAL_SECONDS)
+
+
+def stop_summary_worker(timeout: float = 5.0) -> None:
+    global _thread
+    if _thread is None:
+        return
+    _stop.set()
+    wake_summary_worker()
+    _thread.join(timeout=timeout)
+    _thread = None
+    logger.info("summary worker stopped")
@@ -0,0 +1,80 @@
+import logging
+import threading
+from collections import OrderedDict
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.observability import instrument_module_functions
+from app.services.storage import default_storage_path, object_exists, put_object
+
+
+logger = logging.getLogger(__name__)
+
+# Synthesized replies are stored once under tts/<key>.<ext>, where key hashes
+# the text and every voice setting, so identical replies reuse the same blob.
+CACHE_PREFIX = "tts"
+
+_lock = threading.Lock()
+_known: "OrderedDict[str, str]" = OrderedDict()  # blob path -> storage path
+
+
+def cache_blob_path(key: str, ext: str) -> str:
+    return f"{CACHE_PREFIX}/{key}.{ext}"
+
+
+def _remember(blob_path: str, storage_path: str) -> None:
+    capacity = max(0, int(settings.TTS_CACHE_LRU_SIZE))
+    if capacity == 0:
+        return
+    with _lock:
+        _known[blob_path] = storage_path
+        _known.move_to_end(blob_path)
+        while len(_known) > capacity:
+            _known.popitem(last=False)
+
+
+def lookup_tts_audio(key: str, ext: str) -> str | None:
+    """
+    Storage path of previously synthesized audio, or None. Hot clips are
+    answered from the in-process LRU without touching storage.
+    """
+    if not settings.TTS_CACHE_ENABLED:
+        return None
+
+    blob_path = cache_blob_path(key, ext)
+    with _lock:
+        storage_path = _known.get(blob_path)
+        if storage_path is not None:
+            _known.move_to_end(blob_path)
+    if storage_path is not None:
+        metrics.incr("tts_cache.hit_memory")
+        return storage_path
+
+    storage_path = default_storage_path(blob_path)
+    try:
+        exists = object_exists(storage_path)
+    except Exception as exc:
+        logger.warning("tts cache lookup failed path=%s error=%s", blob_path, exc)
+        exists = False
+    if not exists:
+        metrics.incr("tts_cache.miss")
+        return None
+
+    metrics.incr("tts_cache.hit_blob")
+    _remember(blob_path, storage_path)
+    return storage_path
+
+
+def store_tts_audio(key: str, ext: str, data: bytes, content_type: str) -> str:
+    blob_path = cache_blob_path(key, ext)
+    storage_path = put_object(blob_path, data, content_type)
+    _remember(blob_path, storage_path)
+    return storage_path
+
+
+def clear_local_cache() -> None:
+    with _lock:
+        _known.clear()
+
+
+instrument_module_functions(globals(), include_private=False)
@@ -0,0 +1,97 @@
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.observability import instrument_module_functions
+from app.services.storage import build_read_url, default_storage_path, download_bytes, put_object
+from app.services.tts_piper import PiperTTS, TTSOut, Target, _mime_for_target
+from app.services.tts_text import format_for_tts
+
+
+logger = logging.getLogger(__name__)
+
+# Pre-rendered rule-based replies. Entries are keyed by the TTS content key,
+# which covers text, language, target and voice settings, so a voice change
+# makes old entries miss instead of serving the wrong voice.
+MANIFEST_KEY = "tts/catalog/manifest.json"
+TARGETS: tuple[Target, ...] = ("web", "whatsapp")
+# Re-read the manifest now and then so a redeploy's catalog is picked up.
+_MANIFEST_TTL_SECONDS = 600.0
+
+_lock = threading.Lock()
+_manifest: dict | None = None
+_loaded_at = 0.0
+
+
+def build_tts_catalog(tts: PiperTTS | None = None) -> dict:
+    """
+    Synthesize every rule-based reply for every language and target, then
+    upload the manifest. Already-rendered clips are reused via the TTS cache.
+    """
+    from app.services.chat_service import rule_based_reply_catalog
+
+    tts = tts or PiperTTS()
+    entries: dict[str, dict] = {}
+    for language, replies in rule_based_reply_catalog().items():
+        for name, reply in replies.items():
+            text = format_for_tts(reply)
+            for target in TARGETS:
+                out = tts.synthesize(text=text, target=target, language=language)
+                entries[tts.cache_key(text, target, language=language)] = {
+                    "name": name,
+                    "language": language,
+                    "target": target,
+                    "storage_path": out.storage_path,
+                    "mime": out.mime_type,
+                }
+                logger.info("tts catalog rendered name=%s language=%s target=%s", name, language, target)
+
+    manifest = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "entries": entries,
+    }
+    put_object(MANIFEST_KEY, json.dumps(manifest, indent=2).encode("utf-8"), "application/json")
+    _set_manifest(manifest)
+    return manifest
+
+
+def _set_manifest(manifest: dict | None) -> None:
+    global _manifest, _loaded_at
+    with _lock:
+        _manifest = manifest
+        _loaded_at = time.monotonic()
+
+
+def load_tts_catalog(force: bool = False) -> dict:
+    if not force and _manifest is not None and time.monotonic() - _loaded_at < _MANIFEST_TTL_SECONDS:
+        return _manifest
+    try:
+        manifest = json.loads(download_bytes(default_storage_path(MANIFEST_KEY)))
+    except Exception as exc:
+        logger.warning("tts catalog manifest unavailable error=%s", exc)
+        manifest = {"entries": {}}
+    _set_manifest(manifest)
+    return manifest
+
+
+def lookup_prerendered(tts: PiperTTS, text: str, target: Target, language: str | None) -> TTSOut | None:
+    """Pre-rendered clip for this exact reply, with a fresh read URL; None if not in the catalog."""
+    if not settings.TTS_CATALOG_ENABLED:
+        return None
+    entry = load_tts_catalog()["entries"].get(tts.cache_key(text, target, language=language))
+    if not entry:
+        return None
+    metrics.incr("tts_catalog.hit")
+    return TTSOut(
+        public_url=build_read_url(entry["storage_path"], expiry_seconds=tts.url_ttl_seconds),
+        mime_type=entry.get("mime") or _mime_for_target(target),
+        storage_path=entry["storage_path"],
+        file_path=None,
+    )
+
+
+instrument_module_functions(globals(), include_private=False)
@@ -1,23 +1,31 @@
+import contextlib
 import hashlib
-import io
 import logging
 import os
 import re
-import subprocess
 import threading
-import wave
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Literal
+from typing import Iterator, Literal
 from xml.sax.saxutils import escape as xml_escape
 
 import httpx
 
+from app.core import metrics, stage_timer
+from app.core.config import BASE_DIR, settings
 from app.core.observability import instrument_module_functions
-from app.services.azure_blob import build_blob_read_url, upload_audio_bytes
+from app.services.audio_codec import encode_pcm_s16, encode_wav
+from app.services.storage import build_read_url
 from app.services.language_service import normalize_language
+from app.services.tts_cache import lookup_tts_audio, store_tts_audio
+from app.services.tts_text import split_sentences
 
 Target = Literal["web", "whatsapp"]
 
+# Bump to invalidate every cached clip (e.g. after an encoder change).
+TTS_CACHE_VERSION = "1"
+
 
 @dataclass
 class TTSOut:
@@ -25,6 +33,7 @@ class TTSOut:
     mime_type: str
     storage_path: str
     file_path: str | None = None
+    data: bytes | None = None  # set when freshly synthesized (not on cache hits)
 
 
 def _output_format_for_target(target: Target) -> str:
@@ -69,16 +78,90 @@ def _env_int(name: str, default: int) -> int:
         return default
 
 
-def _flatten_samples(obj) -> list[float]:
-    if isinstance(obj, (list, tuple)):
-        out: list[float] = []
-        for item in obj:
-            out.extend(_flatten_samples(item))
-        return out
+def _parse_piper_voices(value: str | None) -> dict[str, str]:
+    """Parse PIPER_VOICES ("en=path.onnx,fr=...") to {language: model path}; relative paths are from the repo root."""
+    voices: dict[str, str] = {}
+    for item in (value or "").split(","):
+        if "=" not in item:
+            continue
+        lang, path = (part.strip() for part in item.split("=", 1))
+        lang = normalize_language(lang) or ""
+        if lang and path:
+            voices[lang] = path if os.path.isabs(path) else str(BASE_DIR / path)
+    return voices
+
+
+def _piper_available(model_path: str) -> bool:
+    if not os.path.exists(model_path):
+        return False
+    try:
+        import piper  # noqa: F401
+    except Exception:
+        return False
+    return True
+
+
+def _load_piper_voice(model_path: str):
+    """
+    Build the PiperVoice around our own onnxruntime session so intra-op
+    threads are capped (PIPER_INTRA_OP_THREADS) instead of grabbing every core.
+    """
+    import json
+
+    import onnxruntime
+    from piper import PiperVoice
+    from piper.config import PiperConfig
+
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+    options.inter_op_num_threads = 1
+    if settings.PIPER_INTRA_OP_THREADS > 0:
+        options.intra_op_num_threads = int(settings.PIPER_INTRA_OP_THREADS)
+
+    session = onnxruntime.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+    with open(f"{model_path}.json", encoding="utf-8") as fh:
+        config = PiperConfig.from_dict(json.load(fh))
+    logger.info("piper voice loaded model=%s sample_rate=%s", os.path.basename(model_path), config.sample_rate)
+    return PiperVoice(session=session, config=config)
+
+
+_torch_threads_configured = False
+
+
+def _configure_torch_threads() -> None:
+    """Apply CHATTERBOX_TORCH_THREADS/_INTEROP_THREADS once, before the first model load."""
+    global _torch_threads_configured
+    if _torch_threads_configured:
+        return
+    _torch_threads_configured = True
+    try:
+        import torch
+    except Exception:
+        return
+    if settings.CHATTERBOX_TORCH_THREADS > 0:
+        torch.set_num_threads(int(settings.CHATTERBOX_TORCH_THREADS))
+    if settings.CHATTERBOX_TORCH_INTEROP_THREADS > 0:
+        try:
+            torch.set_num_interop_threads(int(settings.CHATTERBOX_TORCH_INTEROP_THREADS))
+        except RuntimeError as exc:
+            # Only allowed before any inter-op parallel work has started.
+            logger.warning("torch inter-op threads not applied error=%s", exc)
+    logger.info(
+        "torch threads intra=%s interop=%s",
+        torch.get_num_threads(),
+        torch.get_num_interop_threads(),
+    )
+
+
+def _torch_inference_context():
+    if not settings.CHATTERBOX_INFERENCE_MODE:
+        return contextlib.nullcontext()
     try:
-        return [float(obj)]
+        import torch
     except Exception:
-        return []
+        return contextlib.nullcontext()
+    return torch.inference_mode()
 
 
 _AZURE_TTS_VOICE_BY_LANGUAGE = {
@@ -93,14 +176,21 @@ logger = logging.getLogger(__name__)
 class PiperTTS:
     """
     Kept class name for compatibility with existing imports.
-    Backend selection:
+    Backend selection, per language:
     - Azure Neural TTS if AZURE_SPEECH_KEY and AZURE_SPEECH_REGION are set correctly
+    - Piper (ONNX, CPU) if PIPER_VOICES has a model for the language and piper-tts is installed
     - Chatterbox fallback otherwise
     """
 
     _chatterbox_model = None
     _chatterbox_device: str | None = None
     _chatterbox_lock = threading.Lock()
+    # One generate() at a time; transcode/upload of a finished segment overlaps the next.
+    _chatterbox_generate_lock = threading.Lock()
+
+    # One onnxruntime session per Piper voice, shared by every instance in the process.
+    _piper_voices: dict[str, object] = {}
+    _piper_lock = threading.Lock()
 
     def __init__(self):
         self.speech_key = (os.getenv("AZURE_SPEECH_KEY") or "").strip()
@@ -119,11 +209,13 @@ class PiperTTS:
         self.chatterbox_trim_threshold = _env_float("CHATTERBOX_TRIM_THRESHOLD", 0.005)
         self.chatterbox_trim_pad_ms = _env_int("CHATTERBOX_TRIM_PAD_MS", 180)
 
+        self.piper_models = _parse_piper_voices(settings.PIPER_VOICES)
+
         ttl_raw = (os.getenv("AZURE_BLOB_URL_TTL_SECONDS") or "86400").strip()
         self.url_ttl_seconds = int(ttl_raw or "86400")
         logger.info(
             "tts backend initialized backend=%s chatterbox_device=%s trim_threshold=%.4f trim_pad_ms=%s",
-            "azure" if self.use_azure else "chatterbox",
+            self._backend_for(None),
             self.chatterbox_device or "auto",
             self.chatterbox_trim_threshold,
             self.chatterbox_trim_pad_ms,
@@ -131,7 +223,36 @@ class PiperTTS:
 
     def _key(self, text: str, target: Target, voice: str, language: str | None) -> str:
         lang = normalize_language(language) or "en"
-        return hashlib.sha256(f"{voice}|{lang}|{target}|{text}".encode("utf-8")).hexdigest()[:32]
+        # Everything that changes the rendered audio is part of the key, so a
+        # voice/prosody/backend change never serves stale cached clips.
+        backend_name = self._backend_for(language)
+        if backend_name == "azure":
+            backend = f"azure|{self._azure_voice_for_language(language)}|{self.style}|{self.rate}|{self.pitch}"
+        elif backend_name == "piper":
+            backend = f"piper|{os.path.basename(self.piper_models[lang])}"
+        else:
+            backend = (
+                f"chatterbox|{self.chatterbox_exaggeration}|{self.chatterbox_cfg_weight}|"
+                f"{self.chatterbox_temperature}|{self.chatterbox_trim_threshold}|{self.chatterbox_trim_pad_ms}|"
+                f"{settings.CHATTERBOX_TARGET_RMS_DBFS}|{settings.CHATTERBOX_OUTPUT_SAMPLE_RATE}"
+            )
+        material = f"{TTS_CACHE_VERSION}|{backend}|{voice}|{lang}|{target}|{text}"
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()[:32]
+
+    def _backend_for(self, language: str | None) -> str:
+        if self.use_azure:
+            return "azure"
+        lang = normalize_language(language) or "en"
+        if lang in self.piper_models and _piper_available(self.piper_models[lang]):
+            return "piper"
+        return "chatterbox"
+
+    def cache_key(self, text: str, target: Target, language: str | None = None, voice: str = "default") -> str:
+        """Content key synthesize() stores this text under (see tts_cache)."""
+        return self._key((text or "").strip(), target, voice, language=language)
+
+    def is_cached(self, text: str, target: Target, language: str | None = None, voice: str = "default") -> bool:
+        return lookup_tts_audio(self.cache_key(text, target, language=language, voice=voice), _ext_for_target(target)) is not None
 
     def _azure_voice_for_language(self, language: str | None) -> str:
         lang = normalize_language(language) or "en"
@@ -219,143 +340,79 @@ class PiperTTS:
 
         with self._chatterbox_lock:
             if self._chatterbox_model is None or self._chatterbox_device != device:
-                self._chatterbox_model = ChatterboxTTS.from_pretrained(device=device)
-                self._chatterbox_device = device
+                _configure_torch_threads()
+                started = time.perf_counter()
+                # Class attributes: the loaded model is shared by every PiperTTS instance.
+                PiperTTS._chatterbox_model = ChatterboxTTS.from_pretrained(device=device)
+                PiperTTS._chatterbox_device = device
+                logger.info(
+                    "chatterbox model loaded device=%s elapsed_ms=%.0f",
+                    device,
+                    (time.perf_counter() - started) * 1000.0,
+                )
 
         return self._chatterbox_model
 
-    def _trim_silence_numpy(self, arr, sample_rate: int):
-        import numpy as np
-
-        if arr.size == 0:
-            return arr
-
-        threshold = max(float(self.chatterbox_trim_threshold), 1e-6)
-        active = np.flatnonzero(np.abs(arr) > threshold)
-        if active.size == 0:
-            logger.warning("chatterbox silence trim found no active samples, keeping original audio")
-            return arr
-
-        pad_samples = max(0, int(sample_rate * (self.chatterbox_trim_pad_ms / 1000.0)))
-        start = max(0, int(active[0]) - pad_samples)
-        end = min(arr.shape[0], int(active[-1]) + pad_samples + 1)
-        trimmed = arr[start:end]
-
-        if trimmed.shape[0] != arr.shape[0]:
-            before_s = arr.shape[0] / float(sample_rate)
-            after_s = trimmed.shape[0] / float(sample_rate)
-            logger.info(
-                "chatterbox silence trimmed duration_before=%.2fs duration_after=%.2fs removed=%.2fs",
-                before_s,
-                after_s,
-                max(0.0, before_s - after_s),
+    def _chatterbox_generate(self, text: str):
+        model = self._get_chatterbox_model()
+        with self._chatterbox_generate_lock, _torch_inference_context():
+            return model.generate(
+                text,
+                exaggeration=self.chatterbox_exaggeration,
+                cfg_weight=self.chatterbox_cfg_weight,
+                temperature=self.chatterbox_temperature,
             )
-        return trimmed
-
-    def _wav_tensor_to_bytes(self, wav_tensor, sample_rate: int) -> bytes:
-        # Fast path with numpy if available.
-        try:
-            import numpy as np
 
-            try:
-                import torch
-
-                if isinstance(wav_tensor, torch.Tensor):
-                    arr = wav_tensor.detach().cpu().numpy()
-                else:
-                    arr = np.asarray(wav_tensor)
-            except Exception:
-                arr = np.asarray(wav_tensor)
-
-            arr = np.asarray(arr, dtype=np.float32).squeeze()
-            if arr.ndim == 0:
-                arr = np.asarray([float(arr)], dtype=np.float32)
-            elif arr.ndim > 1:
-                arr = arr.reshape(-1)
-
-            arr = np.clip(arr, -1.0, 1.0)
-            arr = self._trim_silence_numpy(arr, sample_rate=sample_rate)
-            pcm_bytes = (arr * 32767.0).astype(np.int16).tobytes()
-        except Exception:
-            # Fallback path without numpy.
-            try:
-                import torch
+    def warm_up_chatterbox(self) -> None:
+        """Load the model and run one short generation so the first reply does not pay for either."""
+        started = time.perf_counter()
+        self._chatterbox_generate("Hello.")
+        logger.info("chatterbox warm-up done elapsed_ms=%.0f", (time.perf_counter() - started) * 1000.0)
 
-                if isinstance(wav_tensor, torch.Tensor):
-                    samples = wav_tensor.detach().cpu().flatten().tolist()
-                else:
-                    samples = _flatten_samples(wav_tensor)
-            except Exception:
-                samples = _flatten_samples(wav_tensor)
-
-            pcm = bytearray()
-            for s in samples:
-                if s > 1.0:
-                    s = 1.0
-                elif s < -1.0:
-                    s = -1.0
-                iv = int(s * 32767.0)
-                if iv > 32767:
-                    iv = 32767
-                elif iv < -32768:
-                    iv = -32768
-                pcm.extend(int(iv).to_bytes(2, byteorder="little", signed=True))
-            pcm_bytes = bytes(pcm)
-
-        buf = io.BytesIO()
-        with wave.open(buf, "wb") as wf:
-            wf.setnchannels(1)
-            wf.setsampwidth(2)
-            wf.setframerate(int(sample_rate))
-            wf.writeframes(pcm_bytes)
-        return buf.getvalue()
+    def _wav_tensor_to_bytes(self, wav_tensor, sample_rate: int) -> bytes:
+        from app.services.audio_buffer import render_wav
+
+        target_dbfs = settings.CHATTERBOX_TARGET_RMS_DBFS
+        return render_wav(
+            wav_tensor,
+            sample_rate,
+            trim_threshold=self.chatterbox_trim_threshold,
+            trim_pad_ms=self.chatterbox_trim_pad_ms,
+            target_rms_dbfs=target_dbfs if target_dbfs < 0 else None,
+            out_sample_rate=settings.CHATTERBOX_OUTPUT_SAMPLE_RATE or None,
+        )
 
     def _transcode_wav_bytes(self, wav_bytes: bytes, target: Target) -> bytes:
-        if target == "web":
-            cmd = [
-                "ffmpeg",
-                "-y",
-                "-hide_banner",
-                "-loglevel",
-                "error",
-                "-i",
-                "pipe:0",
-                "-codec:a",
-                "libmp3lame",
-                "-q:a",
-                "4",
-                "-f",
-                "mp3",
-                "pipe:1",
-            ]
+        with stage_timer.stage("tts.transcode"):
+            return encode_wav(wav_bytes, "mp3" if target == "web" else "ogg")
+
+    def _get_piper_voice(self, model_path: str):
+        voice = self._piper_voices.get(model_path)
+        if voice is not None:
+            return voice
+        with self._piper_lock:
+            voice = self._piper_voices.get(model_path)
+            if voice is None:
+                voice = _load_piper_voice(model_path)
+                self._piper_voices[model_path] = voice
+        return voice
+
+    def _synthesize_piper_pcm(self, text: str, language: str | None) -> tuple[bytes, int]:
+        """Raw mono int16 PCM and its sample rate."""
+        lang = normalize_language(language) or "en"
+        voice = self._get_piper_voice(self.piper_models[lang])
+        if hasattr(voice, "synthesize_stream_raw"):  # piper-tts < 1.3
+            pcm = b"".join(voice.synthesize_stream_raw(text))
         else:
-            cmd = [
-                "ffmpeg",
-                "-y",
-                "-hide_banner",
-                "-loglevel",
-                "error",
-                "-i",
-                "pipe:0",
-                "-c:a",
-                "libopus",
-                "-b:a",
-                "24k",
-                "-vbr",
-                "on",
-                "-application",
-                "voip",
-                "-f",
-                "ogg",
-                "pipe:1",
-            ]
-
-        proc = subprocess.run(cmd, input=wav_bytes, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
-        if proc.returncode != 0 or not proc.stdout:
-            err = proc.stderr.decode("utf-8", errors="ignore")
-            raise RuntimeError(f"ffmpeg failed: {err}")
+            pcm = b"".join(chunk.audio_int16_bytes for chunk in voice.synthesize(text))
+        return pcm, int(voice.config.sample_rate)
 
-        return proc.stdout
+    def _synthesize_piper(self, text: str, target: Target, language: str | None = None) -> bytes:
+        pcm, sample_rate = self._synthesize_piper_pcm(text, language)
+        if not pcm:
+            raise RuntimeError("Piper returned empty audio")
+        with stage_timer.stage("tts.transcode"):
+            return encode_pcm_s16(pcm, sample_rate, "mp3" if target == "web" else "ogg")
 
     def _synthesize_chatterbox(self, text: str, target: Target) -> bytes:
         model = self._get_chatterbox_model()
@@ -367,12 +424,7 @@ class PiperTTS:
             self.chatterbox_cfg_weight,
             self.chatterbox_temperature,
         )
-        wav = model.generate(
-            text,
-            exaggeration=self.chatterbox_exaggeration,
-            cfg_weight=self.chatterbox_cfg_weight,
-            temperature=self.chatterbox_temperature,
-        )
+        wav = self._chatterbox_generate(text)
         sr = int(getattr(model, "sr", 24000))
         wav_bytes = self._wav_tensor_to_bytes(wav, sample_rate=sr)
         return self._transcode_wav_bytes(wav_bytes, target=target)
@@ -392,28 +444,72 @@ class PiperTTS:
         ext = _ext_for_target(target)
         key = self._key(text, target, voice, language=language)
 
-        if self.use_azure:
-            logger.info("tts synthesis using azure target=%s language=%s", target, normalize_language(language))
-            audio_bytes = self._synthesize_azure(text=text, target=target, language=language)
+        audio_bytes: bytes | None = None
+        storage_path = lookup_tts_audio(key, ext)
+        if storage_path:
+            logger.info("tts cache hit key=%s target=%s", key, target)
         else:
-            logger.info("tts synthesis using chatterbox target=%s", target)
-            audio_bytes = self._synthesize_chatterbox(text=text, target=target)
+            backend = self._backend_for(language)
+            with stage_timer.stage("tts.render"):
+                if backend == "azure":
+                    logger.info("tts synthesis using azure target=%s language=%s", target, normalize_language(language))
+                    audio_bytes = self._synthesize_azure(text=text, target=target, language=language)
+                elif backend == "piper":
+                    logger.info("tts synthesis using piper target=%s language=%s", target, normalize_language(language))
+                    audio_bytes = self._synthesize_piper(text=text, target=target, language=language)
+                else:
+                    logger.info("tts synthesis using chatterbox target=%s", target)
+                    audio_bytes = self._synthesize_chatterbox(text=text, target=target)
 
-        storage_path = upload_audio_bytes(
-            data=audio_bytes,
-            content_type=mime,
-            filename=f"{key}.{ext}",
-            prefix="tts",
-        )
+            with stage_timer.stage("tts.upload"):
+                storage_path = store_tts_audio(key, ext, audio_bytes, mime)
 
-        public_url = build_blob_read_url(storage_path, expiry_seconds=self.url_ttl_seconds)
+        public_url = build_read_url(storage_path, expiry_seconds=self.url_ttl_seconds)
 
         return TTSOut(
             public_url=public_url,
             mime_type=mime,
             storage_path=storage_path,
             file_path=None,
+            data=audio_bytes,
         )
 
+    def iter_segments(
+        self,
+        text: str,
+        target: Target,
+        voice: str = "default",
+        language: str | None = None,
+    ) -> Iterator[TTSOut]:
+        """
+        Sentence-pipelined synthesis: segments render concurrently (Azure) or
+        overlapped with transcode/upload (Chatterbox) and are yielded in order
+        as soon as each one and all before it are ready.
+        """
+        segments = split_sentences(
+            text,
+            max_chars=settings.TTS_SEGMENT_MAX_CHARS,
+            min_chars=settings.TTS_SEGMENT_MIN_CHARS,
+        )
+        if not segments:
+            raise ValueError("Empty text")
+
+        # Azure and Piper render independent segments in parallel; Chatterbox pipelines behind its lock.
+        backend = self._backend_for(language)
+        workers = max(1, int(settings.TTS_SEGMENT_CONCURRENCY)) if backend != "chatterbox" else 2
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(workers, len(segments)), thread_name_prefix="medi-tts-seg") as pool:
+            futures = [
+                pool.submit(self.synthesize, text=segment, target=target, voice=voice, language=language)
+                for segment in segments
+            ]
+            for index, future in enumerate(futures):
+                out = future.result()
+                if index == 0:
+                    metrics.observe("tts.first_segment_ms", (time.perf_counter() - started) * 1000.0)
+                yield out
+        metrics.observe("tts.segmented_total_ms", (time.perf_counter() - started) * 1000.0)
+        metrics.observe("tts.segments", len(segments))
+
 
 instrument_module_functions(globals(), include_private=True)
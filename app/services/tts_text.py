@@ -53,4 +53,36 @@ def format_for_tts(text: str) -> str:
     t = re.sub(r"\n{3,}", "\n\n", t)      # collapse huge gaps
     t = re.sub(r"[ \t]{2,}", " ", t)      # collapse extra spaces
 
-    return t
\ No newline at end of file
+    return t
+
+# Sentence ends in the supported languages (Latin, Japanese, Arabic) plus line breaks.
+_SENTENCE_END = re.compile(r"(?<=[.!?。！？؟])\s+|\n+")
+
+
+def split_sentences(text: str, max_chars: int = 300, min_chars: int = 40) -> list[str]:
+    """
+    Split TTS text into sentence-aligned segments for pipelined synthesis.
+    Fragments shorter than min_chars are merged with the next one (a lone
+    "First:" sounds clipped); segments never exceed max_chars unless a single
+    sentence does.
+    """
+    parts = [p.strip() for p in _SENTENCE_END.split(text or "") if p and p.strip()]
+    segments: list[str] = []
+    current = ""
+    for part in parts:
+        candidate = f"{current} {part}".strip() if current else part
+        if current and len(current) >= min_chars and len(candidate) > max_chars:
+            segments.append(current)
+            current = part
+        else:
+            current = candidate
+        if len(current) >= min_chars and not segments:
+            # Ship the first segment as soon as it is long enough: it sets time-to-first-audio.
+            segments.append(current)
+            current = ""
+    if current:
+        if segments and len(current) < min_chars and len(segments[-1]) + len(current) < max_chars:
+            segments[-1] = f"{segments[-1]} {current}"
+        else:
+            segments.append(current)
+    return segments
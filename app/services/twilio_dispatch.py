@@ -0,0 +1,279 @@
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import httpx
+
+from app.core import metrics
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+API_BASE = "https://api.twilio.com"
+TYPING_URL = "https://messaging.twilio.com/v2/Indicators/Typing.json"
+
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+_TYPING_DEDUPE_MAX = 4096
+
+
+class TwilioSendError(RuntimeError):
+    """
+    A send that did not succeed. With maybe_sent the request may have reached
+    Twilio (timed out waiting for the answer), so it must not be sent again.
+    """
+
+    def __init__(
+        self,
+        message: str,
+        status: int | None = None,
+        code: int | None = None,
+        maybe_sent: bool = False,
+    ) -> None:
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.maybe_sent = maybe_sent
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, at most `burst` banked."""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = max(0.01, float(rate))
+        self.capacity = max(1.0, float(burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        """Take one token, sleeping until one is available. Returns the wait in seconds."""
+        async with self._lock:  # FIFO: waiters are served in arrival order
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = 0.0
+            if self.tokens < 1.0:
+                wait = (1.0 - self.tokens) / self.rate
+                await asyncio.sleep(wait)
+                self.tokens = 1.0
+                self.updated = time.monotonic()
+            self.tokens -= 1.0
+            return wait
+
+
+def _retry_after(response: httpx.Response) -> float | None:
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    if value.isdigit():
+        return float(value)
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, parsed.timestamp() - time.time())
+
+
+def _backoff(attempt: int) -> float:
+    base = float(settings.TWILIO_SEND_RETRY_BASE_SECONDS)
+    ceiling = min(float(settings.TWILIO_SEND_RETRY_MAX_SECONDS), base * (2 ** attempt))
+    return random.uniform(ceiling / 2.0, ceiling)
+
+
+class TwilioDispatcher:
+    """
+    Outbound Twilio REST calls on one background event loop.
+
+    All sends share a pooled httpx.AsyncClient (keep-alive, HTTP/1.1 pool
+    sized to TWILIO_SEND_MAX_CONCURRENCY). Each sender number has a token
+    bucket, so a burst of replies queues behind it at the configured rate
+    instead of tripping Twilio's 429s; any 429/5xx that still comes back is
+    retried with backoff, honouring Retry-After. Callers on worker threads
+    get a concurrent Future; the sync wrappers in twilio_sender block on it.
+
+    The buckets and the typing dedupe are per process: API workers and voice
+    queue workers sending from one number each get the full rate, so size
+    TWILIO_SEND_RATE_PER_SECOND as Twilio's limit divided by the process count.
+    Typing indicators bypass the buckets, so they never delay a reply.
+    """
+
+    def __init__(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._client: httpx.AsyncClient | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._buckets: dict[str, TokenBucket] = {}
+        self._typing_seen: "OrderedDict[str, float]" = OrderedDict()
+        self._typing_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="medi-twilio-dispatch", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        concurrency = max(1, int(settings.TWILIO_SEND_MAX_CONCURRENCY))
+        self._client = httpx.AsyncClient(
+            auth=(settings.TWILIO_ACCOUNT_SID or "", settings.TWILIO_AUTH_TOKEN or ""),
+            timeout=httpx.Timeout(15.0, connect=5.0),
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        )
+        self._slots = asyncio.Semaphore(concurrency)
+        self._ready.set()
+        self._loop.run_forever()
+
+    def submit(self, coro) -> Future:
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def close(self) -> None:
+        if self._loop.is_closed():
+            return
+        if self._client is not None:
+            try:
+                self.submit(self._client.aclose()).result(timeout=5)
+            except Exception as exc:
+                logger.warning("twilio dispatcher close failed error=%s", exc)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+    def _bucket(self, sender: str) -> TokenBucket:
+        bucket = self._buckets.get(sender)
+        if bucket is None:
+            bucket = TokenBucket(settings.TWILIO_SEND_RATE_PER_SECOND, settings.TWILIO_SEND_BURST)
+            self._buckets[sender] = bucket
+        return bucket
+
+    async def _post(self, kind: str, url: str, data, sender: str | None) -> dict:
+        """POST with per-sender rate limiting (none when sender is None) and retries. Returns the JSON body."""
+        enqueued = time.perf_counter()
+        bucket = self._bucket(sender) if sender is not None else None
+        if bucket is not None and await bucket.acquire() > 0:
+            metrics.incr("twilio.throttled")
+        max_retries = max(0, int(settings.TWILIO_SEND_MAX_RETRIES))
+        attempt = 0
+        while True:
+            async with self._slots:
+                if attempt == 0:
+                    metrics.observe("twilio.queue_wait_ms", (time.perf_counter() - enqueued) * 1000.0)
+                started = time.perf_counter()
+                try:
+                    response = await self._client.post(url, data=data)
+                except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as exc:
+                    # The request never reached Twilio, so a retry cannot duplicate the message.
+                    response, error = None, exc
+                except httpx.TransportError as exc:
+                    # Read timeouts and dropped connections after the request went out:
+                    # the message may already be queued there, so neither retry nor report it unsent.
+                    metrics.observe(f"twilio.{kind}.ms", (time.perf_counter() - started) * 1000.0)
+                    metrics.incr(f"twilio.{kind}.failed")
+                    raise TwilioSendError(f"twilio {kind} outcome unknown: {exc!r}", maybe_sent=True) from exc
+                else:
+                    error = None
+                metrics.observe(f"twilio.{kind}.ms", (time.perf_counter() - started) * 1000.0)
+
+            if response is not None and response.status_code < 400:
+                metrics.incr(f"twilio.{kind}.sent")
+                return response.json() if response.content else {}
+
+            retryable = response is None or response.status_code in _RETRY_STATUSES
+            if response is not None and response.status_code == 429:
+                metrics.incr("twilio.rate_limited")
+            if not retryable or attempt >= max_retries:
+                metrics.incr(f"twilio.{kind}.failed")
+                if response is None:
+                    raise TwilioSendError(f"twilio {kind} failed: {error}") from error
+                try:
+                    body = response.json()
+                except ValueError:
+                    body = {}
+                raise TwilioSendError(
+                    f"twilio {kind} failed status={response.status_code} {body.get('message') or response.text[:200]}",
+                    status=response.status_code,
+                    code=body.get("code"),
+                )
+
+            delay = _backoff(attempt)
+            if response is not None:
+                delay = max(delay, _retry_after(response) or 0.0)
+            attempt += 1
+            metrics.incr("twilio.retries")
+            logger.warning(
+                "twilio %s retry attempt=%s delay_s=%.2f status=%s error=%s",
+                kind,
+                attempt,
+                delay,
+                response.status_code if response is not None else None,
+                error,
+            )
+            await asyncio.sleep(delay)
+            if bucket is not None:
+                await bucket.acquire()
+
+    async def send_message(
+        self,
+        from_: str,
+        to: str,
+        body: str | None = None,
+        media_url: list[str] | None = None,
+        content_sid: str | None = None,
+        kind: str = "message",
+    ) -> str:
+        data: dict[str, str | list[str]] = {"From": from_, "To": to}
+        if body is not None:
+            data["Body"] = body
+        if media_url:
+            data["MediaUrl"] = list(media_url)  # repeated form field
+        if content_sid:
+            data["ContentSid"] = content_sid
+        url = f"{API_BASE}/2010-04-01/Accounts/{settings.TWILIO_ACCOUNT_SID}/Messages.json"
+        result = await self._post(kind, url, data, sender=from_)
+        return result.get("sid", "")
+
+    def claim_typing(self, message_sid: str) -> bool:
+        """
+        True the first time a MessageSid is seen within TWILIO_TYPING_DEDUPE_SECONDS
+        in this process (inline voice jobs run next to the webhook that already
+        sent one). A separate queue worker skips its own request by job age instead.
+        """
+        now = time.monotonic()
+        window = float(settings.TWILIO_TYPING_DEDUPE_SECONDS)
+        with self._typing_lock:
+            seen = self._typing_seen.get(message_sid)
+            if seen is not None and now - seen < window:
+                return False
+            self._typing_seen[message_sid] = now
+            self._typing_seen.move_to_end(message_sid)
+            while len(self._typing_seen) > _TYPING_DEDUPE_MAX:
+                self._typing_seen.popitem(last=False)
+        return True
+
+    async def send_typing(self, message_sid: str) -> None:
+        # Not rate limited with replies: a queued indicator is useless and would hold a reply's token.
+        await self._post("typing", TYPING_URL, {"messageId": message_sid, "channel": "whatsapp"}, sender=None)
+
+
+_dispatcher: TwilioDispatcher | None = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher() -> TwilioDispatcher:
+    """Shared dispatcher, started on first use."""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = TwilioDispatcher()
+    return _dispatcher
+
+
+def close_dispatcher() -> None:
+    global _dispatcher
+    with _dispatcher_lock:
+        dispatcher, _dispatcher = _dispatcher, None
+    if dispatcher is not None:
+        dispatcher.close()
@@ -1,15 +1,45 @@
 import logging
+from concurrent.futures import TimeoutError as FutureTimeout
+from functools import partial
 
-import requests
-from twilio.rest import Client
-
+from app.core import metrics
 from app.core.observability import instrument_module_functions
 from app.core.config import settings
+from app.services.twilio_dispatch import TwilioSendError, get_dispatcher
 
 
-_client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
 logger = logging.getLogger(__name__)
 
+# Sends go through the shared TwilioDispatcher (pooled async session, per-sender
+# rate limit, retries); these wrappers keep the blocking call style for worker threads.
+
+
+def _late_outcome(what: str, future) -> None:
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is None:
+        metrics.incr(f"twilio.{what}.sent_late")
+        logger.warning("twilio %s completed after the caller timed out", what)
+    else:
+        logger.warning("twilio %s failed after the caller timed out error=%s", what, error)
+
+
+def _wait(future, what: str):
+    timeout = float(settings.TWILIO_SEND_TIMEOUT_SECONDS)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout as exc:
+        # The POST may already be at Twilio; cancelling cannot take it back and
+        # would lose it if it was still queued. Let it finish and report the
+        # outcome as unknown, so callers neither resend nor treat it as failed.
+        metrics.incr(f"twilio.{what}.timed_out")
+        future.add_done_callback(partial(_late_outcome, what))
+        raise TwilioSendError(
+            f"twilio {what} still pending after {timeout:g}s; it may already be delivered",
+            maybe_sent=True,
+        ) from exc
+
 
 def _normalize_whatsapp_to(to_number: str) -> str:
     value = (to_number or "").strip().replace(" ", "")
@@ -33,10 +63,17 @@ def send_whatsapp_menu(to_number: str) -> None:
     Requires: MENU_TEMPLATE_SID (HX...)
     """
     to_value = _normalize_whatsapp_to(to_number)
-    _client.messages.create(
-        from_=settings.TWILIO_WHATSAPP_NUMBER,
-        to=to_value,
-        content_sid=settings.MENU_TEMPLATE_SID,
+    dispatcher = get_dispatcher()
+    _wait(
+        dispatcher.submit(
+            dispatcher.send_message(
+                from_=settings.TWILIO_WHATSAPP_NUMBER,
+                to=to_value,
+                content_sid=settings.MENU_TEMPLATE_SID,
+                kind="menu",
+            )
+        ),
+        "menu",
     )
     logger.info("twilio menu sent to=%s", to_value)
 
@@ -46,49 +83,51 @@ def send_whatsapp_text(to_number: str, body: str) -> None:
     Send a normal WhatsApp text message via Twilio REST.
     """
     to_value = _normalize_whatsapp_to(to_number)
-    _client.messages.create(
-        from_=settings.TWILIO_WHATSAPP_NUMBER,
-        to=to_value,
-        body=body,
+    dispatcher = get_dispatcher()
+    _wait(
+        dispatcher.submit(
+            dispatcher.send_message(from_=settings.TWILIO_WHATSAPP_NUMBER, to=to_value, body=body, kind="text")
+        ),
+        "text",
     )
     logger.info("twilio text sent to=%s chars=%s", to_value, len(body or ""))
 
 
 def send_whatsapp_audio(to_e164: str, ogg_url: str) -> str:
-    account_sid = settings.TWILIO_ACCOUNT_SID
-    auth_token = settings.TWILIO_AUTH_TOKEN
     from_whatsapp = settings.TWILIO_WHATSAPP_NUMBER  # e.g. "whatsapp:+14155238886"
     to_value = _normalize_whatsapp_to(to_e164)
 
-    client = Client(account_sid, auth_token)
-    msg = client.messages.create(
-        from_=from_whatsapp,
-        # to=f"whatsapp:{to_e164}",
-        to=to_value,
-
-        media_url=[ogg_url],
+    dispatcher = get_dispatcher()
+    sid = _wait(
+        dispatcher.submit(dispatcher.send_message(from_=from_whatsapp, to=to_value, media_url=[ogg_url], kind="audio")),
+        "audio",
     )
     logger.info("twilio audio sent to=%s", to_value)
-    return msg.sid
+    return sid
+
+
+def _log_typing_result(message_sid: str, future) -> None:
+    exc = future.exception()
+    if exc is not None:
+        logger.warning("twilio typing indicator failed sid=%s error=%s", message_sid, exc)
+    else:
+        logger.info("twilio typing indicator sent sid=%s", message_sid)
 
 
 def send_whatsapp_typing_indicator(message_sid: str) -> None:
     """
     Triggers WhatsApp typing indicator for up to ~25s or until you send a message.
     Twilio WhatsApp Typing Indicators API (public beta).
+
+    Fire-and-forget: queued on the dispatcher without waiting, and skipped if
+    this MessageSid already got one within TWILIO_TYPING_DEDUPE_SECONDS.
     """
-    account_sid = settings.TWILIO_ACCOUNT_SID
-    auth_token = settings.TWILIO_AUTH_TOKEN
-
-    url = "https://messaging.twilio.com/v2/Indicators/Typing.json"
-    data = {
-        "messageId": message_sid,
-        "channel": "whatsapp",
-    }
-
-    r = requests.post(url, data=data, auth=(account_sid, auth_token), timeout=10)
-    r.raise_for_status()
-    logger.info("twilio typing indicator sent sid=%s", message_sid)
+    dispatcher = get_dispatcher()
+    if not dispatcher.claim_typing(message_sid):
+        metrics.incr("twilio.typing.deduped")
+        return
+    future = dispatcher.submit(dispatcher.send_typing(message_sid))
+    future.add_done_callback(lambda f: _log_typing_result(message_sid, f))
 
 
 instrument_module_functions(globals(), include_private=False)
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+
+from sqlalchemy.engine import make_url
+
+from app.core import metrics
+from app.core.config import settings
+from app.services.voice_jobs import EVENTS_CHANNEL
+
+
+logger = logging.getLogger(__name__)
+
+
+class VoiceJobEventHub:
+    """
+    One LISTEN connection per process, fanned out to in-process subscribers.
+
+    A daemon thread waits on the connection socket and hands each
+    notification to the asyncio queues subscribed to that job id, on their
+    own event loop. The connection is opened directly (not from the engine
+    pool) because LISTEN needs a session-level connection, which PgBouncer's
+    transaction pooling does not provide; see VOICE_EVENTS_LISTEN_URL.
+    """
+
+    def __init__(self, dsn: str) -> None:
+        self.dsn = dsn
+        self.connected = False
+        self._subscribers: dict[str, set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="medi-voice-events", daemon=True)
+        self._thread.start()
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        entry = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers.setdefault(job_id, set()).add(entry)
+        metrics.incr("voice_events.subscribed")
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue) -> None:
+        with self._lock:
+            entries = self._subscribers.get(job_id)
+            if not entries:
+                return
+            entries.difference_update({e for e in entries if e[1] is queue})
+            if not entries:
+                del self._subscribers[job_id]
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _dispatch(self, payload: str) -> None:
+        try:
+            event = json.loads(payload)
+            job_id = event["id"]
+        except Exception:
+            logger.warning("voice event payload ignored payload=%r", payload[:200])
+            return
+        with self._lock:
+            entries = list(self._subscribers.get(job_id, ()))
+        for loop, queue in entries:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                pass  # subscriber's loop already closed
+        metrics.incr("voice_events.received")
+
+    def _listen(self) -> None:
+        import psycopg2
+        import psycopg2.extensions
+
+        conn = psycopg2.connect(self.dsn, application_name=f"{settings.APP_NAME}-events")
+        try:
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {EVENTS_CHANNEL}")
+            self.connected = True
+            logger.info("voice events listening channel=%s", EVENTS_CHANNEL)
+            while not self._stop.is_set():
+                if select.select([conn], [], [], 5.0) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    self._dispatch(conn.notifies.pop(0).payload)
+        finally:
+            self.connected = False
+            conn.close()
+
+    def _run(self) -> None:
+        backoff = 1.0
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self._listen()
+            except Exception as exc:
+                logger.warning("voice events listener disconnected error=%s", exc)
+                metrics.incr("voice_events.reconnects")
+            if time.monotonic() - started > 60.0:
+                backoff = 1.0
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2.0, 30.0)
+
+
+def _listen_dsn() -> str:
+    url = make_url(settings.VOICE_EVENTS_LISTEN_URL or settings.DATABASE_URL)
+    return url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+_hub: VoiceJobEventHub | None = None
+_hub_lock = threading.Lock()
+
+
+def get_event_hub() -> VoiceJobEventHub | None:
+    """Shared hub, started on first use; None when the database is not Postgres."""
+    global _hub
+    if _hub is None:
+        if not (settings.VOICE_EVENTS_LISTEN_URL or settings.DATABASE_URL).startswith("postgresql"):
+            return None
+        with _hub_lock:
+            if _hub is None:
+                _hub = VoiceJobEventHub(_listen_dsn())
+    return _hub
+
+
+def _load_job(job_id: str) -> dict | None:
+    # Primary, not the replica: a lagging replica could miss the transition we were just told about.
+    from app.db.session import SessionLocal
+    from app.services.voice_jobs import get_voice_job_public_dict
+
+    db = SessionLocal()
+    try:
+        return get_voice_job_public_dict(db, job_id)
+    finally:
+        db.close()
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _fingerprint(job: dict) -> tuple:
+    return (job["stage"], job["reply_audio_path"], len(job["reply_audio_segments"]), job["attempts"])
+
+
+async def stream_job_events(job_id: str):
+    """
+    Server-sent events for one job: the current state first, then one
+    "status" event per transition (including stage=text_ready and each new
+    audio segment) until the job finishes. Between notifications it sends
+    keep-alive comments and re-reads the row as a safety net, which is also
+    the whole mechanism when LISTEN is unavailable.
+    """
+    from app.services.voice_jobs import FINISHED_STATUSES
+
+    hub = get_event_hub()
+    queue = hub.subscribe(job_id) if hub is not None else None
+    deadline = time.monotonic() + float(settings.VOICE_EVENTS_MAX_SECONDS)
+    last = None
+    try:
+        while True:
+            job = await asyncio.to_thread(_load_job, job_id)
+            if job is None:
+                yield _sse("error", {"id": job_id, "error": "not found"})
+                return
+            if _fingerprint(job) != last:
+                last = _fingerprint(job)
+                yield _sse("status", job)
+            if job["status"] in FINISHED_STATUSES:
+                return
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                yield _sse("timeout", {"id": job_id})
+                return
+            wait_s = min(float(settings.VOICE_EVENTS_KEEPALIVE_SECONDS), remaining)
+            if queue is None:
+                await asyncio.sleep(wait_s)
+                yield ": keep-alive\n\n"
+                continue
+            try:
+                await asyncio.wait_for(queue.get(), timeout=wait_s)
+                while not queue.empty():  # collapse a burst into one read
+                    queue.get_nowait()
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+    finally:
+        if queue is not None:
+            hub.unsubscribe(job_id, queue)
@@ -1,14 +1,63 @@
+import json
 import logging
+import random
+from dataclasses import dataclass
+from datetime import timedelta
 
+from sqlalchemy import func, select, text, update
 from sqlalchemy.orm import Session
 
+from app.core import metrics
+from app.core.config import settings
 from app.core.observability import instrument_module_functions
 from app.db.models import VoiceJob
-from app.services.azure_blob import build_blob_read_url
+from app.services.storage import build_read_url, delete_object
 
 
 logger = logging.getLogger(__name__)
 
+# Terminal statuses; "dead" = gave up after VOICE_JOB_MAX_ATTEMPTS.
+FINISHED_STATUSES = ("done", "failed", "dead")
+
+# Postgres NOTIFY channel carrying {"id", "event"} for every job state change;
+# see voice_job_events for the listening side.
+EVENTS_CHANNEL = "voice_job_events"
+
+
+def notify_job_event(db: Session, job_id: str, event: str) -> None:
+    """
+    Queue a NOTIFY in the caller's transaction; Postgres delivers it on commit,
+    so listeners never see a state that was rolled back.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    db.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": EVENTS_CHANNEL, "payload": json.dumps({"id": job_id, "event": event})},
+    )
+
+
+class LeaseLost(RuntimeError):
+    """The worker's lease on a job expired and the job was recovered; its owner is elsewhere now."""
+
+
+class PermanentJobError(RuntimeError):
+    """A failure no retry can fix (bad job data); the queue worker dead-letters it at once."""
+
+
+@dataclass
+class ClaimedJob:
+    id: str
+    source: str
+    user_id: str
+    attempts: int
+    preferred_language: str | None
+
+    @property
+    def final_attempt(self) -> bool:
+        return self.attempts >= int(settings.VOICE_JOB_MAX_ATTEMPTS)
+
+
 def create_voice_job(
     db: Session,
     source: str,
@@ -16,6 +65,7 @@ def create_voice_job(
     twilio_media_url: str | None,
     audio_blob_path: str | None,
     twilio_message_sid: str | None = None,
+    preferred_language: str | None = None,
 ) -> str:
     job = VoiceJob(
         source=source,
@@ -23,37 +73,412 @@ def create_voice_job(
         twilio_media_url=twilio_media_url,
         audio_blob_path=audio_blob_path,
         twilio_message_sid=twilio_message_sid,
+        preferred_language=preferred_language,
         status="queued",
     )
     db.add(job)
     db.commit()
     db.refresh(job)
+    metrics.incr("voice_queue.enqueued")
     return job.id
 
-def mark_processing(db: Session, job_id: str) -> None:
-    job = db.query(VoiceJob).filter(VoiceJob.id == job_id).one_or_none()
+
+def _lease_interval(seconds: int | None = None):
+    return timedelta(seconds=int(seconds or settings.VOICE_JOB_LEASE_SECONDS))
+
+
+def claim_voice_jobs(db: Session, worker_id: str, limit: int) -> list[ClaimedJob]:
+    """
+    Atomically move up to `limit` due jobs from queued to processing and lease
+    them to `worker_id`. SKIP LOCKED lets concurrent workers claim disjoint rows
+    without waiting on each other.
+    """
+    if limit <= 0:
+        return []
+    picked = (
+        select(VoiceJob.id)
+        .where(VoiceJob.status == "queued", VoiceJob.available_at <= func.now())
+        .order_by(VoiceJob.available_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .cte("picked")
+    )
+    stmt = (
+        update(VoiceJob)
+        .where(VoiceJob.id.in_(select(picked.c.id)))
+        .values(
+            status="processing",
+            attempts=VoiceJob.attempts + 1,
+            locked_by=worker_id,
+            lease_expires_at=func.now() + _lease_interval(),
+            updated_at=func.now(),
+        )
+        .returning(
+            VoiceJob.id,
+            VoiceJob.source,
+            VoiceJob.user_id,
+            VoiceJob.attempts,
+            VoiceJob.preferred_language,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    rows = db.execute(stmt).all()
+    db.commit()
+    if rows:
+        metrics.incr("voice_queue.claimed", len(rows))
+    return [ClaimedJob(*row) for row in rows]
+
+
+def heartbeat_voice_job(db: Session, job_id: str, worker_id: str) -> bool:
+    """Extend the lease. False means the job is no longer ours (recovered or finished)."""
+    result = db.execute(
+        update(VoiceJob)
+        .where(VoiceJob.id == job_id, VoiceJob.status == "processing", VoiceJob.locked_by == worker_id)
+        .values(lease_expires_at=func.now() + _lease_interval())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return bool(result.rowcount)
+
+
+def retry_delay_seconds(attempts: int) -> float:
+    """Exponential backoff with full jitter, capped at VOICE_JOB_RETRY_MAX_SECONDS."""
+    base = float(settings.VOICE_JOB_RETRY_BASE_SECONDS)
+    cap = float(settings.VOICE_JOB_RETRY_MAX_SECONDS)
+    ceiling = min(cap, base * (2 ** max(0, attempts - 1)))
+    return random.uniform(ceiling / 2.0, ceiling)
+
+
+def schedule_retry(db: Session, job_id: str, worker_id: str, attempts: int, error: str) -> float:
+    """Release a failed attempt back to the queue after a backoff. Returns the delay."""
+    delay = retry_delay_seconds(attempts)
+    db.execute(
+        update(VoiceJob)
+        .where(VoiceJob.id == job_id, VoiceJob.locked_by == worker_id)
+        .values(
+            status="queued",
+            available_at=func.now() + timedelta(seconds=delay),
+            locked_by=None,
+            lease_expires_at=None,
+            # The reply text is kept: the next attempt reuses it instead of re-running the chat
+            # (which would store the exchange twice). Audio segments are rendered again.
+            reply_audio_segments=None,
+            error=(error or "")[:8000],
+        )
+        .execution_options(synchronize_session=False)
+    )
+    notify_job_event(db, job_id, "queued")
+    db.commit()
+    metrics.incr("voice_queue.retried")
+    return delay
+
+
+def mark_dead(db: Session, job_id: str, error: str, worker_id: str | None = None) -> bool:
+    """Dead-letter the job. With a worker_id, only while that worker holds the lease."""
+    owned = (VoiceJob.locked_by == worker_id,) if worker_id is not None else ()
+    row = db.execute(
+        update(VoiceJob)
+        .where(VoiceJob.id == job_id, *owned)
+        .values(status="dead", locked_by=None, lease_expires_at=None, error=(error or "")[:8000])
+        .returning(VoiceJob.audio_blob_path)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is None:
+        db.rollback()
+        return False
+    notify_job_event(db, job_id, "dead")
+    db.commit()
+    metrics.incr("voice_queue.dead")
+    # Kept for retries until now; a dead job is never retried.
+    delete_object(row[0])
+    return True
+
+
+def recover_stale_voice_jobs(db: Session) -> tuple[int, list[ClaimedJob]]:
+    """
+    Processing jobs whose lease ran out (worker crashed or was killed) go back
+    to the queue, or to dead if they already used every attempt.
+    Returns (requeued count, dead-lettered jobs).
+    """
+    max_attempts = int(settings.VOICE_JOB_MAX_ATTEMPTS)
+    expired = (VoiceJob.status == "processing", VoiceJob.lease_expires_at < func.now())
+
+    requeued = db.execute(
+        update(VoiceJob)
+        .where(*expired, VoiceJob.attempts < max_attempts)
+        .values(
+            status="queued",
+            available_at=func.now(),
+            locked_by=None,
+            lease_expires_at=None,
+            reply_audio_segments=None,
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    dead_rows = db.execute(
+        update(VoiceJob)
+        .where(*expired, VoiceJob.attempts >= max_attempts)
+        .values(status="dead", locked_by=None, lease_expires_at=None, error="lease expired on final attempt")
+        .returning(
+            VoiceJob.id,
+            VoiceJob.source,
+            VoiceJob.user_id,
+            VoiceJob.attempts,
+            VoiceJob.preferred_language,
+            VoiceJob.audio_blob_path,
+        )
+        .execution_options(synchronize_session=False)
+    ).all()
+    for row in dead_rows:
+        notify_job_event(db, row[0], "dead")
+    db.commit()
+    for row in dead_rows:
+        delete_object(row[5])
+
+    if requeued or dead_rows:
+        metrics.incr("voice_queue.recovered", requeued or 0)
+        metrics.incr("voice_queue.dead", len(dead_rows))
+        logger.warning("voice queue recovered stale jobs requeued=%s dead=%s", requeued, len(dead_rows))
+    return int(requeued or 0), [ClaimedJob(*row[:5]) for row in dead_rows]
+
+
+def queue_depth(db: Session) -> dict[str, int]:
+    rows = db.execute(
+        select(VoiceJob.status, func.count())
+        .where(VoiceJob.status.in_(("queued", "processing")))
+        .group_by(VoiceJob.status)
+    ).all()
+    return {status: int(n) for status, n in rows}
+
+def _owned_job(db: Session, job_id: str, worker_id: str | None) -> VoiceJob | None:
+    """
+    The job row, locked for this transaction. With a worker_id, only while that
+    worker still holds the lease (locked_by = worker_id, as in schedule_retry);
+    otherwise the caller's pending changes are rolled back and None returned,
+    so a worker whose lease was recovered cannot overwrite the new owner's state.
+    """
+    query = db.query(VoiceJob).filter(VoiceJob.id == job_id)
+    if worker_id is not None:
+        query = query.filter(VoiceJob.locked_by == worker_id)
+    job = query.with_for_update().one_or_none()
+    if job is None:
+        db.rollback()
+        if worker_id is not None:
+            metrics.incr("voice_queue.lease_lost_writes")
+            logger.warning("voice job write skipped, lease lost job_id=%s worker=%s", job_id, worker_id)
+    return job
+
+def mark_processing(db: Session, job_id: str, worker_id: str | None = None) -> bool:
+    job = _owned_job(db, job_id, worker_id)
     if not job:
-        return
+        return False
     job.status = "processing"
+    notify_job_event(db, job_id, "processing")
     db.commit()
+    return True
 
-def mark_done(db: Session, job_id: str, transcript: str, reply_text: str) -> None:
-    job = db.query(VoiceJob).filter(VoiceJob.id == job_id).one_or_none()
+def mark_text_ready(
+    db: Session,
+    job_id: str,
+    transcript: str,
+    reply_text: str,
+    transcript_language: str | None = None,
+    worker_id: str | None = None,
+    reply_language: str | None = None,
+) -> bool:
+    """
+    Save the transcript and reply as soon as the chat step is done. Web clients
+    show the text while the audio renders (status stays processing); retries
+    resume from here instead of transcribing and calling the chat again.
+    """
+    job = _owned_job(db, job_id, worker_id)
     if not job:
-        return
+        return False
+    job.transcript = transcript
+    job.transcript_language = transcript_language
+    job.reply_text = reply_text
+    job.reply_language = reply_language
+    notify_job_event(db, job_id, "text_ready")
+    db.commit()
+    return True
+
+def mark_segments_ready(db: Session, job_id: str, paths: list[str], worker_id: str | None = None) -> bool:
+    """Publish the reply audio segments rendered so far (a playlist for web clients)."""
+    job = _owned_job(db, job_id, worker_id)
+    if not job:
+        return False
+    job.reply_audio_segments = list(paths)
+    notify_job_event(db, job_id, "segment")
+    db.commit()
+    return True
+
+def mark_delivered(db: Session, job_id: str, delivered: bool = True, worker_id: str | None = None) -> bool:
+    """Set (before sending) or clear (after a definite rejection) the WhatsApp delivery marker."""
+    job = _owned_job(db, job_id, worker_id)
+    if not job:
+        return False
+    job.delivered_at = func.now() if delivered else None
+    db.commit()
+    return True
+
+def mark_done(
+    db: Session,
+    job_id: str,
+    transcript: str,
+    reply_text: str,
+    transcript_language: str | None = None,
+    timings: dict | None = None,
+    worker_id: str | None = None,
+) -> bool:
+    job = _owned_job(db, job_id, worker_id)
+    if not job:
+        return False
     job.status = "done"
     job.transcript = transcript
+    job.transcript_language = transcript_language
     job.reply_text = reply_text
     job.error = None
+    if timings is not None:
+        job.timings = timings
+    job.locked_by = None
+    job.lease_expires_at = None
+    notify_job_event(db, job_id, "done")
     db.commit()
+    return True
 
-def mark_failed(db: Session, job_id: str, error: str) -> None:
-    job = db.query(VoiceJob).filter(VoiceJob.id == job_id).one_or_none()
+def mark_failed(
+    db: Session,
+    job_id: str,
+    error: str,
+    timings: dict | None = None,
+    worker_id: str | None = None,
+) -> bool:
+    job = _owned_job(db, job_id, worker_id)
     if not job:
-        return
+        return False
     job.status = "failed"
     job.error = (error or "")[:8000]
+    if timings is not None:
+        job.timings = timings
+    job.locked_by = None
+    job.lease_expires_at = None
+    notify_job_event(db, job_id, "failed")
     db.commit()
+    return True
+
+def record_timings(db: Session, job_id: str, timings: dict, worker_id: str | None = None) -> None:
+    """Store the stage timings of an attempt that is about to be retried."""
+    owned = (VoiceJob.locked_by == worker_id,) if worker_id is not None else ()
+    db.execute(
+        update(VoiceJob)
+        .where(VoiceJob.id == job_id, *owned)
+        .values(timings=timings)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+# Top-level numbers in the timings map that the report summarises next to the stages.
+_TIMING_VALUES = ("total_ms", "queue_ms", "audio_s", "rtf", "stt_rtf", "bytes_in", "bytes_out")
+
+
+def stage_timing_report(
+    db: Session,
+    hours: float = 24.0,
+    source: str | None = None,
+    status: str | None = None,
+) -> dict:
+    """
+    Nearest-rank p50/p95/p99 per stage (and per top-level value) over jobs
+    created in the last `hours`, slowest p95 first.
+    """
+    params: dict = {"hours": float(hours)}
+    filters = ["j.timings IS NOT NULL", "j.created_at >= now() - make_interval(secs => :hours * 3600)"]
+    if source:
+        filters.append("j.source = :source")
+        params["source"] = source
+    if status:
+        filters.append("j.status = :status")
+        params["status"] = status
+    where = " AND ".join(filters)
+    aggregates = """
+        count(*) AS n,
+        avg(v) AS avg,
+        percentile_disc(0.5) WITHIN GROUP (ORDER BY v) AS p50,
+        percentile_disc(0.95) WITHIN GROUP (ORDER BY v) AS p95,
+        percentile_disc(0.99) WITHIN GROUP (ORDER BY v) AS p99,
+        max(v) AS max
+    """
+
+    jobs = db.execute(text(f"SELECT count(*) FROM voice_jobs j WHERE {where}"), params).scalar_one()
+    stage_rows = db.execute(
+        text(
+            f"""
+            SELECT name, {aggregates}
+            FROM (
+                SELECT s.key AS name, (s.value #>> '{{}}')::float8 AS v
+                FROM voice_jobs j, jsonb_each(j.timings -> 'stages') s
+                WHERE {where} AND jsonb_typeof(s.value) = 'number'
+            ) t
+            GROUP BY name
+            ORDER BY p95 DESC
+            """
+        ),
+        params,
+    ).all()
+    value_rows = db.execute(
+        text(
+            f"""
+            SELECT name, {aggregates}
+            FROM (
+                SELECT s.key AS name, (s.value #>> '{{}}')::float8 AS v
+                FROM voice_jobs j, jsonb_each(j.timings) s
+                WHERE {where} AND s.key = ANY(:value_names) AND jsonb_typeof(s.value) = 'number'
+            ) t
+            GROUP BY name
+            """
+        ),
+        {**params, "value_names": list(_TIMING_VALUES)},
+    ).all()
+
+    def _summary(row) -> dict:
+        return {
+            "count": int(row.n),
+            "avg": round(float(row.avg), 3),
+            "p50": round(float(row.p50), 3),
+            "p95": round(float(row.p95), 3),
+            "p99": round(float(row.p99), 3),
+            "max": round(float(row.max), 3),
+        }
+
+    return {
+        "hours": float(hours),
+        "source": source,
+        "status": status,
+        "jobs": int(jobs),
+        "stages": {row.name: _summary(row) for row in stage_rows},
+        "values": {row.name: _summary(row) for row in value_rows},
+    }
+
+
+def get_recent_transcript_language(db: Session, user_id: str) -> str | None:
+    """Language of the user's latest transcribed voice note, used as an STT hint."""
+    row = db.execute(
+        select(VoiceJob.transcript_language)
+        .where(
+            VoiceJob.user_id == user_id,
+            VoiceJob.status == "done",
+            VoiceJob.transcript_language.is_not(None),
+        )
+        .order_by(VoiceJob.created_at.desc())
+        .limit(1)
+    ).first()
+    return row[0] if row else None
+
+def job_stage(status: str, reply_text: str | None) -> str:
+    if status == "processing" and reply_text:
+        return "text_ready"
+    return status
 
 def get_voice_job_public_dict(db: Session, job_id: str) -> dict | None:
     job = db.query(VoiceJob).filter(VoiceJob.id == job_id).one_or_none()
@@ -66,21 +491,34 @@ def get_voice_job_public_dict(db: Session, job_id: str) -> dict | None:
     # Prefer a fresh SAS URL from stored blob path if available.
     if reply_audio_path:
         try:
-            reply_audio_url = build_blob_read_url(reply_audio_path)
+            reply_audio_url = build_read_url(reply_audio_path)
         except Exception as exc:
             logger.warning("voice job audio url generation failed job_id=%s error=%s", job_id, exc)
 
+    # Progressive playlist: segments can be played while later ones are still rendering.
+    reply_audio_segments = []
+    for path in job.reply_audio_segments or []:
+        try:
+            reply_audio_segments.append(build_read_url(path))
+        except Exception as exc:
+            logger.warning("voice job segment url generation failed job_id=%s error=%s", job_id, exc)
+            break
+
     return {
         "id": job.id,
         "source": job.source,
         "user_id": job.user_id,
         "status": job.status,
+        # Finer-grained progress for clients: text_ready = reply text available, audio pending.
+        "stage": job_stage(job.status, job.reply_text),
         "transcript": job.transcript,
         "reply_text": job.reply_text,
         "reply_audio_url": reply_audio_url,
         "reply_audio_mime": reply_audio_mime,
         "reply_audio_path": reply_audio_path,
+        "reply_audio_segments": reply_audio_segments,
         "error": job.error,
+        "attempts": job.attempts,
         "created_at": job.created_at.isoformat() if job.created_at else None,
         "updated_at": job.updated_at.isoformat() if job.updated_at else None,
     }
@@ -0,0 +1,207 @@
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+import httpx
+
+from app.core import metrics
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.audio_sniff import AudioRejected
+from app.services.twilio_dispatch import TwilioSendError
+from app.services.voice_jobs import (
+    ClaimedJob,
+    LeaseLost,
+    PermanentJobError,
+    claim_voice_jobs,
+    heartbeat_voice_job,
+    mark_dead,
+    recover_stale_voice_jobs,
+    schedule_retry,
+)
+from app.services.voice_worker import notify_voice_job_failed, process_voice_job
+
+
+logger = logging.getLogger(__name__)
+
+# How often each worker sweeps for jobs whose lease ran out.
+_RECOVERY_INTERVAL_SECONDS = 30.0
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class _Heartbeat:
+    """Extends a job's lease every third of the lease period while it runs."""
+
+    def __init__(self, job_id: str, worker_id: str) -> None:
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"medi-voice-hb-{job_id[:8]}", daemon=True)
+
+    def __enter__(self) -> "_Heartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join(timeout=5.0)
+
+    def _run(self) -> None:
+        interval = max(1.0, float(settings.VOICE_JOB_LEASE_SECONDS) / 3.0)
+        while not self._stop.wait(interval):
+            db = SessionLocal()
+            try:
+                if not heartbeat_voice_job(db, self.job_id, self.worker_id):
+                    self.lost = True
+                    logger.warning("voice job lease lost job_id=%s worker=%s", self.job_id, self.worker_id)
+                    return
+            except Exception:
+                logger.exception("voice job heartbeat failed job_id=%s", self.job_id)
+                db.rollback()
+            finally:
+                db.close()
+
+
+def _permanent_client_error(status: int | None) -> bool:
+    return status is not None and 400 <= status < 500 and status not in (408, 429)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    False for failures another attempt cannot fix: audio over the size or
+    duration limits, bad job data, and 4xx answers from Twilio (media gone,
+    invalid number). Those are dead-lettered on the first attempt instead of
+    re-downloading the media VOICE_JOB_MAX_ATTEMPTS times.
+    """
+    if isinstance(exc, (AudioRejected, PermanentJobError)):
+        return False
+    if isinstance(exc, TwilioSendError):
+        # maybe_sent retries are safe: delivered_at stays set, so the send is skipped.
+        return not _permanent_client_error(exc.status)
+    if isinstance(exc, httpx.HTTPStatusError):
+        return not _permanent_client_error(exc.response.status_code)
+    return True
+
+
+def run_claimed_job(job: ClaimedJob, worker_id: str) -> bool:
+    """Process one claimed job; on failure retry with backoff or dead-letter. Returns success."""
+    started = time.perf_counter()
+    try:
+        with _Heartbeat(job.id, worker_id):
+            process_voice_job(
+                {"job_id": job.id, "preferred_language": job.preferred_language, "worker_id": worker_id},
+                raise_errors=True,
+            )
+        metrics.incr("voice_queue.succeeded")
+        return True
+    except LeaseLost:
+        # Recovered by recover_stale and possibly claimed by another worker; the job is theirs now.
+        metrics.incr("voice_queue.lease_lost")
+        logger.warning("voice job abandoned after lease loss job_id=%s worker=%s", job.id, worker_id)
+        return False
+    except Exception as exc:
+        db = SessionLocal()
+        try:
+            retryable = is_retryable(exc)
+            if not retryable:
+                metrics.incr("voice_queue.permanent_failures")
+            if job.final_attempt or not retryable:
+                if mark_dead(db, job.id, error=str(exc), worker_id=worker_id):
+                    logger.error(
+                        "voice job dead-lettered job_id=%s attempts=%s retryable=%s",
+                        job.id,
+                        job.attempts,
+                        retryable,
+                    )
+                    notify_voice_job_failed(job.source, job.user_id)
+            else:
+                delay = schedule_retry(db, job.id, worker_id, job.attempts, error=str(exc))
+                logger.warning(
+                    "voice job retry scheduled job_id=%s attempts=%s delay=%.1fs",
+                    job.id,
+                    job.attempts,
+                    delay,
+                )
+        except Exception:
+            logger.exception("voice job failure handling failed job_id=%s", job.id)
+        finally:
+            db.close()
+        return False
+    finally:
+        metrics.observe("voice_queue.job_ms", (time.perf_counter() - started) * 1000.0)
+
+
+def recover_stale() -> int:
+    db = SessionLocal()
+    try:
+        requeued, dead = recover_stale_voice_jobs(db)
+    finally:
+        db.close()
+    for job in dead:
+        try:
+            notify_voice_job_failed(job.source, job.user_id)
+        except Exception:
+            logger.exception("voice job dead-letter notification failed job_id=%s", job.id)
+    return requeued
+
+
+def run_voice_worker(
+    stop: threading.Event,
+    *,
+    worker_id: str | None = None,
+    concurrency: int | None = None,
+    poll_seconds: float | None = None,
+) -> None:
+    """
+    Claim-and-process loop. Never holds more than `concurrency` jobs, so a busy
+    worker leaves queued rows for its peers. Returns once `stop` is set and
+    in-flight jobs have finished.
+    """
+    worker_id = worker_id or default_worker_id()
+    concurrency = max(1, int(concurrency or settings.VOICE_WORKER_CONCURRENCY))
+    poll_seconds = float(poll_seconds if poll_seconds is not None else settings.VOICE_WORKER_POLL_SECONDS)
+    in_flight: set[Future] = set()
+    last_recovery = 0.0
+
+    logger.info("voice worker started worker=%s concurrency=%s", worker_id, concurrency)
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="medi-voice") as pool:
+        while not stop.is_set():
+            in_flight = {f for f in in_flight if not f.done()}
+
+            now = time.monotonic()
+            if now - last_recovery >= _RECOVERY_INTERVAL_SECONDS:
+                last_recovery = now
+                try:
+                    recover_stale()
+                except Exception:
+                    logger.exception("voice worker stale recovery failed")
+
+            jobs: list[ClaimedJob] = []
+            free = concurrency - len(in_flight)
+            if free > 0:
+                db = SessionLocal()
+                try:
+                    jobs = claim_voice_jobs(db, worker_id, limit=free)
+                except Exception:
+                    logger.exception("voice worker claim failed")
+                    db.rollback()
+                finally:
+                    db.close()
+
+            for job in jobs:
+                in_flight.add(pool.submit(run_claimed_job, job, worker_id))
+
+            if len(in_flight) >= concurrency:
+                wait(in_flight, timeout=poll_seconds, return_when=FIRST_COMPLETED)
+            elif not jobs:
+                stop.wait(poll_seconds)
+
+        logger.info("voice worker stopping worker=%s in_flight=%s", worker_id, len(in_flight))
+    logger.info("voice worker stopped worker=%s", worker_id)
@@ -1,22 +1,43 @@
 import logging
+import time
+from datetime import datetime, timezone
 
 from sqlalchemy.orm import Session
 
+from app.core import stage_timer
+from app.core.config import settings
 from app.core.observability import trace_call
 from app.db.models import VoiceJob
 from app.db.session import SessionLocal
-from app.services.azure_blob import delete_audio, download_audio_bytes
+from app.services.audio_codec import join_mp3
+from app.services.audio_sniff import SNIFF_BYTES, probe_audio
+from app.services.storage import build_read_url, delete_object, download_bytes
 from app.services.chat_service import handle_incoming_message
 from app.services.language_service import resolve_language
+from app.services.stt_cache import lookup_transcript, store_transcript, transcript_cache_key
 from app.services.stt_service import download_twilio_media, transcribe_audio_bytes_with_language
-from app.services.tts_piper import PiperTTS
+from app.services.tts_catalog import lookup_prerendered
+from app.services.tts_cache import store_tts_audio
+from app.services.tts_piper import PiperTTS, TTSOut
 from app.services.tts_text import format_for_tts
+from app.services.twilio_dispatch import TwilioSendError
 from app.services.twilio_sender import (
     send_whatsapp_audio,
     send_whatsapp_text,
     send_whatsapp_typing_indicator,
 )
-from app.services.voice_jobs import mark_done, mark_failed, mark_processing
+from app.services.voice_jobs import (
+    LeaseLost,
+    PermanentJobError,
+    get_recent_transcript_language,
+    mark_delivered,
+    mark_done,
+    mark_failed,
+    mark_processing,
+    mark_segments_ready,
+    mark_text_ready,
+    record_timings,
+)
 
 
 logger = logging.getLogger(__name__)
@@ -43,13 +64,85 @@ def _try_store_web_audio_fields(job: VoiceJob, audio_url: str, mime: str, storag
 
 
 @trace_call
-def process_voice_job(payload: dict) -> None:
+def _should_segment(tts: PiperTTS, text: str, target: str, language: str | None) -> bool:
+    if not settings.TTS_SEGMENTED or len(text) < int(settings.TTS_SEGMENT_THRESHOLD_CHARS):
+        return False
+    # A whole-reply clip already in the cache beats any pipelining.
+    return not tts.is_cached(text, target, language=language)
+
+
+@trace_call
+def _synthesize_web_segmented(
+    db: Session,
+    job: VoiceJob,
+    tts: PiperTTS,
+    text: str,
+    language: str | None,
+    worker_id: str | None = None,
+) -> TTSOut:
+    """
+    Publish each segment on the job as it is ready (clients poll or subscribe
+    to reply_audio_segments as a playlist), then store the joined MP3 as the
+    regular reply audio. Each segment is a complete MP3 file, so their ID3 and
+    Info headers are stripped before the frames are joined.
+    """
+    parts: list[bytes] = []
+    paths: list[str] = []
+    for segment in tts.iter_segments(text=text, target="web", language=language):
+        paths.append(segment.storage_path)
+        if not mark_segments_ready(db, job.id, paths, worker_id=worker_id) and worker_id is not None:
+            raise LeaseLost(f"lease on voice job {job.id} lost by {worker_id}")
+        parts.append(segment.data if segment.data is not None else download_bytes(segment.storage_path))
+
+    storage_path = store_tts_audio(tts.cache_key(text, "web", language=language), "mp3", join_mp3(parts), "audio/mpeg")
+    return TTSOut(
+        public_url=build_read_url(storage_path, expiry_seconds=tts.url_ttl_seconds),
+        mime_type="audio/mpeg",
+        storage_path=storage_path,
+    )
+
+
+def _count_bytes_out(timer: stage_timer.StageTimer, out: TTSOut) -> None:
+    if out.data is not None:
+        timer.incr("bytes_out", len(out.data))
+
+
+def _finish_timings(timer: stage_timer.StageTimer, job: VoiceJob) -> dict:
+    """Derived ratios, metrics export and the JSON stored on the job."""
+    audio_s = timer.values.get("audio_s")
+    if audio_s:
+        timer.set("rtf", timer.elapsed_ms() / 1000.0 / audio_s)
+        if "stt" in timer.stages and not timer.values.get("stt_cached"):
+            timer.set("stt_rtf", timer.stages["stt"] / 1000.0 / audio_s)
+    timer.observe(f"voice_job.{job.source}")
+    return timer.as_dict()
+
+
+@trace_call
+def notify_voice_job_failed(source: str, user_id: str) -> None:
+    if source == "whatsapp":
+        send_whatsapp_text(
+            to_number=user_id,
+            body="Sorry - I couldn't process that voice note. Please try again.",
+        )
+
+
+@trace_call
+def process_voice_job(payload: dict, *, raise_errors: bool = False) -> None:
     """
     Background worker entrypoint.
-    payload: { "job_id": "<id>", "preferred_language": "en|fr|ja|ar" (optional) }
+    payload: { "job_id": "<id>", "preferred_language": "en|fr|ja|ar" (optional),
+               "worker_id": "<queue worker holding the lease>" (optional) }
+
+    With raise_errors the job is left for the caller (the queue worker) to
+    retry or dead-letter instead of being marked failed here. With a
+    worker_id, state writes only land while that worker still holds the
+    lease; otherwise LeaseLost is raised. Every attempt stores its stage
+    timings on the job (VoiceJob.timings).
     """
     job_id = payload["job_id"]
     preferred_language = payload.get("preferred_language")
+    worker_id = payload.get("worker_id")
     db: Session = SessionLocal()
     logger.info("voice job start job_id=%s preferred_language=%s", job_id, preferred_language)
 
@@ -59,23 +152,122 @@ def process_voice_job(payload: dict) -> None:
             logger.warning("voice job not found job_id=%s", job_id)
             return
 
-        if job.source == "whatsapp" and job.twilio_message_sid:
-            try:
+        with stage_timer.recording() as timer:
+            _run_voice_job(db, job, preferred_language, timer, worker_id=worker_id, raise_errors=raise_errors)
+
+    finally:
+        db.close()
+        logger.info("voice job end job_id=%s", job_id)
+
+
+def _run_voice_job(
+    db: Session,
+    job: VoiceJob,
+    preferred_language: str | None,
+    timer: stage_timer.StageTimer,
+    *,
+    worker_id: str | None,
+    raise_errors: bool,
+) -> None:
+    """
+    Steps that completed in an earlier attempt are not repeated: a saved reply
+    skips download, STT and chat (which stores the exchange in the
+    conversation), and a set delivered_at skips the WhatsApp send.
+    """
+    job_id = job.id
+    source_path = job.audio_blob_path
+    delivered = job.delivered_at is not None
+
+    def _owned(written: bool) -> None:
+        if not written and worker_id is not None:
+            raise LeaseLost(f"lease on voice job {job_id} lost by {worker_id}")
+
+    def _fail(error: str) -> None:
+        written = mark_failed(db, job_id, error=error, timings=_finish_timings(timer, job), worker_id=worker_id)
+        _owned(written)
+        if written:
+            delete_object(source_path)
+
+    queued_s = None
+    if job.created_at is not None:
+        queued_s = (datetime.now(timezone.utc) - job.created_at).total_seconds()
+        timer.set("queue_ms", queued_s * 1000.0)
+    timer.set("attempt", job.attempts)
+
+    # The webhook sent an indicator when it queued the job; only renew it once that one may have lapsed.
+    # (The dispatcher's own dedupe only covers this process.)
+    typing_fresh = queued_s is not None and queued_s < float(settings.TWILIO_TYPING_DEDUPE_SECONDS)
+    if job.source == "whatsapp" and job.twilio_message_sid and not delivered and not typing_fresh:
+        try:
+            with timer.stage("send"):
                 send_whatsapp_typing_indicator(job.twilio_message_sid)
-            except Exception:
-                logger.exception("failed to send typing indicator sid=%s", job.twilio_message_sid)
+        except Exception:
+            logger.exception("failed to send typing indicator sid=%s", job.twilio_message_sid)
 
-        mark_processing(db, job_id)
+    _owned(mark_processing(db, job_id, worker_id=worker_id))
 
+    # WhatsApp sends are at most once per job: the marker is set before the
+    # first send and only cleared when Twilio definitely did not accept it.
+    delivery = {"pending": False, "sent": 0}
+
+    def _send(send, **kwargs) -> None:
+        if not delivery["pending"]:
+            _owned(mark_delivered(db, job_id, worker_id=worker_id))
+            delivery["pending"] = True
         try:
-            if job.source == "whatsapp":
-                audio_bytes = download_twilio_media(job.twilio_media_url)
-            elif job.source == "web":
-                audio_bytes = download_audio_bytes(job.audio_blob_path)
-            else:
-                raise RuntimeError(f"Unknown voice job source: {job.source}")
+            with timer.stage("send"):
+                send(**kwargs)
+        except TwilioSendError as exc:
+            if not delivery["sent"] and not exc.maybe_sent:
+                _owned(mark_delivered(db, job_id, delivered=False, worker_id=worker_id))
+                delivery["pending"] = False
+            raise
+        delivery["sent"] += 1
 
-            transcript, detected_language = transcribe_audio_bytes_with_language(audio_bytes)
+    try:
+        if job.reply_text is not None:
+            transcript = job.transcript
+            transcript_language = job.transcript_language
+            reply = job.reply_text
+            reply_language = job.reply_language or transcript_language or "en"
+            timer.set("resumed", True)
+            logger.info("voice job resuming from saved reply job_id=%s attempt=%s", job_id, job.attempts)
+        else:
+            with timer.stage("download"):
+                if job.source == "whatsapp":
+                    audio_bytes = download_twilio_media(job.twilio_media_url)
+                elif job.source == "web":
+                    audio_bytes = download_bytes(source_path)
+                else:
+                    raise PermanentJobError(f"Unknown voice job source: {job.source}")
+            timer.set("bytes_in", len(audio_bytes))
+            # Header estimate; replaced by the decoded length when STT decodes in this process.
+            probe = probe_audio(audio_bytes[:SNIFF_BYTES], len(audio_bytes))
+            if probe.duration_s is not None:
+                timer.set("audio_s", probe.duration_s)
+
+            with timer.stage("stt"):
+                stt_hint = preferred_language
+                if not stt_hint and settings.STT_HINT_FROM_HISTORY:
+                    stt_hint = get_recent_transcript_language(db, job.user_id)
+                cache_key = transcript_cache_key(audio_bytes, stt_hint)
+                cached = lookup_transcript(db, cache_key)
+                if cached is not None:
+                    transcript, detected_language = cached
+                    timer.set("stt_cached", True)
+                    logger.info("voice job transcript cache hit job_id=%s", job_id)
+                else:
+                    started = time.perf_counter()
+                    transcript, detected_language = transcribe_audio_bytes_with_language(
+                        audio_bytes, language_hint=stt_hint
+                    )
+                    store_transcript(
+                        db,
+                        cache_key,
+                        transcript,
+                        detected_language,
+                        elapsed_ms=(time.perf_counter() - started) * 1000.0,
+                    )
             transcript_language = resolve_language(
                 transcript,
                 language_hint=preferred_language,
@@ -90,85 +282,152 @@ def process_voice_job(payload: dict) -> None:
                 transcript_language,
             )
 
-            # Optional cleanup for uploaded source audio blob.
-            delete_audio(job.audio_blob_path)
-
             if not transcript:
                 reply = _voice_transcription_failure_text(reply_language)
             else:
-                result = handle_incoming_message(
-                    db=db,
-                    source=job.source,
-                    external_id=job.user_id,
-                    text=transcript,
-                    language_hint=preferred_language,
-                )
+                with timer.stage("chat"):
+                    result = handle_incoming_message(
+                        db=db,
+                        source=job.source,
+                        external_id=job.user_id,
+                        text=transcript,
+                        language_hint=preferred_language,
+                    )
                 reply = result["reply"]
                 reply_language = result.get("language", reply_language)
-            tts_ready = False
-
-            try:
-                tts = PiperTTS()
+            if not transcript:
+                transcript_language = None
 
-                if job.source == "whatsapp":
-                    tts_text = format_for_tts(reply)
-                    out = tts.synthesize(
-                        text=tts_text,
-                        target="whatsapp",
-                        language=reply_language,
-                    )
-                    send_whatsapp_audio(to_e164=job.user_id, ogg_url=out.public_url)
-                    logger.info(
-                        "voice job whatsapp audio sent job_id=%s storage_path=%s",
-                        job_id,
-                        out.storage_path,
-                    )
-                    tts_ready = True
+            # Saved for retries; web clients can also show the reply text while the audio renders.
+            _owned(
+                mark_text_ready(
+                    db,
+                    job_id,
+                    transcript=transcript,
+                    reply_text=reply,
+                    transcript_language=transcript_language,
+                    reply_language=reply_language,
+                    worker_id=worker_id,
+                )
+            )
+        tts_ready = False
 
-                elif job.source == "web":
-                    tts_text = format_for_tts(reply)
-                    out = tts.synthesize(
-                        text=tts_text,
-                        target="web",
-                        language=reply_language,
-                    )
-                    _try_store_web_audio_fields(
-                        job,
-                        audio_url=out.public_url,
-                        mime=out.mime_type,
-                        storage_path=out.storage_path,
-                    )
-                    logger.info(
-                        "voice job web audio ready job_id=%s storage_path=%s",
-                        job_id,
-                        out.storage_path,
-                    )
-                    tts_ready = True
+        try:
+            tts = PiperTTS()
 
-            except Exception as exc:
-                logger.exception("TTS/audio delivery failed job_id=%s", job_id)
-                if job.source == "web":
-                    mark_failed(db, job_id, error=f"TTS failed: {exc}")
-                    return
-                if job.source == "whatsapp":
-                    send_whatsapp_text(to_number=job.user_id, body=reply)
-                    tts_ready = True
+            if job.source == "whatsapp" and delivered:
+                logger.info("voice job reply already delivered job_id=%s", job_id)
+                tts_ready = True
 
-            if job.source == "web" and not tts_ready:
-                mark_failed(db, job_id, error="TTS did not complete")
-                return
+            elif job.source == "whatsapp":
+                tts_text = format_for_tts(reply)
+                with timer.stage("tts"):
+                    out = lookup_prerendered(tts, tts_text, "whatsapp", reply_language)
+                    segmented = out is None and _should_segment(tts, tts_text, "whatsapp", reply_language)
+                if segmented:
+                    # One voice message per segment; the first goes out while the rest render.
+                    segments = tts.iter_segments(text=tts_text, target="whatsapp", language=reply_language)
+                    while True:
+                        with timer.stage("tts"):
+                            segment = next(segments, None)
+                        if segment is None:
+                            break
+                        out = segment
+                        _count_bytes_out(timer, out)
+                        _send(send_whatsapp_audio, to_e164=job.user_id, ogg_url=out.public_url)
+                else:
+                    if out is None:
+                        with timer.stage("tts"):
+                            out = tts.synthesize(
+                                text=tts_text,
+                                target="whatsapp",
+                                language=reply_language,
+                            )
+                    _count_bytes_out(timer, out)
+                    _send(send_whatsapp_audio, to_e164=job.user_id, ogg_url=out.public_url)
+                logger.info(
+                    "voice job whatsapp audio sent job_id=%s storage_path=%s",
+                    job_id,
+                    out.storage_path,
+                )
+                tts_ready = True
 
-            mark_done(db, job_id, transcript=transcript, reply_text=reply)
+            elif job.source == "web":
+                tts_text = format_for_tts(reply)
+                with timer.stage("tts"):
+                    out = lookup_prerendered(tts, tts_text, "web", reply_language)
+                    if out is None and _should_segment(tts, tts_text, "web", reply_language):
+                        out = _synthesize_web_segmented(db, job, tts, tts_text, reply_language, worker_id=worker_id)
+                    else:
+                        out = out or tts.synthesize(
+                            text=tts_text,
+                            target="web",
+                            language=reply_language,
+                        )
+                _count_bytes_out(timer, out)
+                _try_store_web_audio_fields(
+                    job,
+                    audio_url=out.public_url,
+                    mime=out.mime_type,
+                    storage_path=out.storage_path,
+                )
+                logger.info(
+                    "voice job web audio ready job_id=%s storage_path=%s",
+                    job_id,
+                    out.storage_path,
+                )
+                tts_ready = True
 
+        except LeaseLost:
+            raise
         except Exception as exc:
-            logger.exception("voice job processing failed job_id=%s error=%s", job_id, exc)
-            mark_failed(db, job_id, error=str(exc))
+            logger.exception("TTS/audio delivery failed job_id=%s", job_id)
+            if job.source == "web":
+                if raise_errors:
+                    # Azure/Piper/storage errors are often transient; let the queue retry or dead-letter.
+                    raise
+                _fail(f"TTS failed: {exc}")
+                return
             if job.source == "whatsapp":
-                send_whatsapp_text(
-                    to_number=job.user_id,
-                    body="Sorry - I couldn't process that voice note. Please try again.",
-                )
+                if delivery["pending"]:
+                    # Audio may already have reached the user; a text fallback could duplicate it.
+                    raise
+                _send(send_whatsapp_text, to_number=job.user_id, body=reply)
+                tts_ready = True
 
-    finally:
-        db.close()
-        logger.info("voice job end job_id=%s", job_id)
+        if job.source == "web" and not tts_ready:
+            if raise_errors:
+                raise RuntimeError("TTS did not complete")
+            _fail("TTS did not complete")
+            return
+
+        _owned(
+            mark_done(
+                db,
+                job_id,
+                transcript=transcript,
+                reply_text=reply,
+                transcript_language=transcript_language,
+                timings=_finish_timings(timer, job),
+                worker_id=worker_id,
+            )
+        )
+        # The uploaded source audio is only needed until the job can no longer be retried.
+        delete_object(source_path)
+        logger.info("voice job timings job_id=%s stages=%s", job_id, timer.as_dict()["stages"])
+
+    except LeaseLost:
+        raise
+    except Exception as exc:
+        logger.exception("voice job processing failed job_id=%s error=%s", job_id, exc)
+        if raise_errors:
+            db.rollback()
+            try:
+                record_timings(db, job_id, _finish_timings(timer, job), worker_id=worker_id)
+            except Exception:
+                logger.exception("failed to store voice job timings job_id=%s", job_id)
+                db.rollback()
+            raise
+        _fail(str(exc))
+        if not delivery["pending"]:
+            notify_voice_job_failed(job.source, job.user_id)